@@ -0,0 +1,251 @@
+import asyncio
+import json
+import logging
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Large enough for a long NDJSON line from a model
+STREAM_LIMIT = 1024 * 1024
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    409: 'Conflict',
+    429: 'Too Many Requests',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable'
+}
+
+class HTTPError(Exception):
+    """Raised when a server answers with a non-2xx status."""
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status}: {body[:200]!r}")
+        self.status = status
+        self.body = body
+
+class ConnectionPool:
+    """A pool of keep-alive HTTP/1.1 connections to a single host.
+
+    At most max_connections are open at once; callers wait for a free slot.
+    """
+
+    def __init__(self, base_url, max_connections=8, connect_timeout=5.0):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', ''):
+            raise ValueError(f"Only plain http URLs are supported: {base_url}")
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 80
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self.opened = 0
+        self.reused = 0
+
+    async def acquire(self):
+        """Return an open (reader, writer) pair, reusing an idle connection when possible."""
+        connection, _ = await self.checkout()
+        return connection
+
+    async def checkout(self, reuse=True):
+        """Return (connection, reused): an idle connection if reuse allows and one is open, else a new one."""
+        await self._slots.acquire()
+        while reuse and self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                self.reused += 1
+                return (reader, writer), True
+            writer.close()
+        try:
+            connection = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, limit=STREAM_LIMIT),
+                self.connect_timeout
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        self.opened += 1
+        return connection, False
+
+    def release(self, connection, reusable=True):
+        """Return a connection to the pool, or close it if it cannot be reused."""
+        reader, writer = connection
+        if reusable and not writer.is_closing() and not reader.at_eof():
+            self._idle.append(connection)
+        else:
+            writer.close()
+        self._slots.release()
+
+    async def close(self):
+        """Close every idle connection."""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+def _encode_request(host, method, path, payload):
+    body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+    head = (f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            f"Connection: keep-alive\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+async def _read_head(reader):
+    """Read a status line or request line plus headers; returns (first line, headers)."""
+    first = await reader.readline()
+    if not first:
+        return None, None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return first.decode('latin-1').rstrip('\r\n'), headers
+
+async def _iter_body(reader, headers):
+    """Yield body chunks according to Transfer-Encoding / Content-Length."""
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                # Trailer section ends with an empty line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            chunk = await reader.readexactly(size)
+            await reader.readexactly(2)
+            yield chunk
+    elif 'content-length' in headers:
+        length = int(headers['content-length'])
+        if length:
+            yield await reader.readexactly(length)
+    else:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                return
+            yield chunk
+
+def _reusable(headers):
+    return (headers.get('connection', '').lower() != 'close'
+            and ('content-length' in headers
+                 or headers.get('transfer-encoding', '').lower() == 'chunked'))
+
+async def _send(pool, method, path, payload, head_timeout=None):
+    """Send a request and read the response head; returns (connection, status, headers).
+
+    A server may close an idle keep-alive connection just as a request goes
+    out on it. When a reused connection is closed before any answer, the
+    request is sent again once on a new connection.
+    """
+    reuse = True
+    while True:
+        connection, reused = await pool.checkout(reuse)
+        try:
+            reader, writer = connection
+            writer.write(_encode_request(pool.host, method, path, payload))
+            await writer.drain()
+            status_line, headers = await asyncio.wait_for(_read_head(reader), head_timeout)
+            if status_line is None:
+                raise ConnectionError("Server closed the connection")
+        except ConnectionError:
+            pool.release(connection, False)
+            if not reused:
+                raise
+            logger.debug("Idle connection to %s:%s was closed, retrying on a new one", pool.host, pool.port)
+            reuse = False
+            continue
+        except BaseException:
+            pool.release(connection, False)
+            raise
+        return connection, int(status_line.split()[1]), headers
+
+async def request(pool, method, path, payload=None, timeout=None):
+    """Send a JSON request over a pooled connection and return (status, body bytes)."""
+    async def _exchange():
+        connection, status, headers = await _send(pool, method, path, payload)
+        reusable = False
+        try:
+            body = b''.join([chunk async for chunk in _iter_body(connection[0], headers)])
+            reusable = _reusable(headers)
+            return status, body
+        finally:
+            pool.release(connection, reusable)
+
+    return await asyncio.wait_for(_exchange(), timeout)
+
+async def stream_lines(pool, method, path, payload=None, read_timeout=None):
+    """Send a JSON request and yield the response body line by line as it arrives.
+
+    Use with contextlib.aclosing() so an abandoned stream closes its connection.
+    """
+    connection, status, headers = await _send(pool, method, path, payload, read_timeout)
+    reader = connection[0]
+    reusable = False
+    try:
+        if status >= 300:
+            body = b''.join([chunk async for chunk in _iter_body(reader, headers)])
+            reusable = _reusable(headers)
+            raise HTTPError(status, body)
+
+        buffer = b''
+        body = _iter_body(reader, headers)
+        while True:
+            try:
+                chunk = await asyncio.wait_for(body.__anext__(), read_timeout)
+            except StopAsyncIteration:
+                break
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        reusable = _reusable(headers)
+    finally:
+        pool.release(connection, reusable)
+
+async def read_request(reader):
+    """Read one HTTP request; returns (method, path, headers, body) or None at EOF."""
+    request_line, headers = await _read_head(reader)
+    if request_line is None:
+        return None
+    method, path, _ = request_line.split(' ', 2)
+    body = b''.join([chunk async for chunk in _iter_body(reader, headers)]) \
+        if ('content-length' in headers or 'transfer-encoding' in headers) else b''
+    return method, path, headers, body
+
+def encode_response(status, body, content_type='application/json', keep_alive=True):
+    """Encode a complete HTTP response with a Content-Length."""
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+def encode_chunked_head(status, content_type='application/x-ndjson'):
+    """Encode the head of a chunked (streamed) HTTP response."""
+    return (f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Transfer-Encoding: chunked\r\n"
+            f"Connection: keep-alive\r\n\r\n").encode('latin-1')
+
+def encode_chunk(data):
+    """Encode one chunk of a chunked response; an empty chunk ends the body."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return f"{len(data):x}\r\n".encode('latin-1') + data + b'\r\n'
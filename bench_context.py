@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from ollama_client import AsyncOllamaClient
+from ollama_stub import StubServerThread
+from process_form import load_form_template
+from suggestions import DEFAULT_CONCURRENCY, ContextChain, SuggestionEngine
+
+logging.basicConfig(level=logging.WARNING)
+
+def load_answers(json_file):
+    """Return field -> answer from a saved response file."""
+    with open(json_file, 'r') as f:
+        data = json.load(f)
+    return {field: entry.get('answer') for field, entry in data.get('responses', {}).items()}
+
+async def run_form(url, model, questions, answers, reuse_context):
+    """Fetch every field's suggestion in form order; returns per-field (latency, prompt tokens)."""
+    async with AsyncOllamaClient(url, max_connections=1) as client:
+        engine = SuggestionEngine(client, model, concurrency=1)
+        chain = ContextChain() if reuse_context else None
+        results = []
+        try:
+            for field, question in questions.items():
+                start = time.perf_counter()
+                await engine.stream(field, question, answers, lambda token: None, chain=chain)
+                results.append((time.perf_counter() - start,
+                                engine.metrics[field]["prompt_eval_count"]))
+        finally:
+            await engine.scheduler.close()
+        return results
+
+async def prefetch_form(url, model, questions, answers, reuse_context, concurrency=DEFAULT_CONCURRENCY):
+    """Prefetch every field the way SuggestionPrefetcher does; returns (seconds until each field is ready, prompt tokens).
+
+    Without context reuse all fields are requested at once (at most
+    concurrency in flight); with it they are chained one after another.
+    """
+    async with AsyncOllamaClient(url, max_connections=concurrency) as client:
+        engine = SuggestionEngine(client, model, concurrency=concurrency)
+        start = time.perf_counter()
+        ready = {}
+
+        async def one(field, question, chain=None):
+            await engine.stream(field, question, answers, lambda token: None, chain=chain)
+            ready[field] = time.perf_counter() - start
+
+        try:
+            if reuse_context:
+                chain = ContextChain()
+                for field, question in questions.items():
+                    await one(field, question, chain)
+            else:
+                await asyncio.gather(*(one(field, question) for field, question in questions.items()))
+        finally:
+            await engine.scheduler.close()
+        tokens = sum(metrics["prompt_eval_count"] or 0 for metrics in engine.metrics.values())
+        return sorted(ready.values()), tokens
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare per-field suggestion latency with full prompts and with a shared Ollama context.")
+    parser.add_argument('--answers', default='test_data.json', help="saved responses used as background")
+    parser.add_argument('--template', default='day1form.md')
+    parser.add_argument('--url', help="benchmark a real Ollama server instead of the stub")
+    parser.add_argument('--model', default='llama3.2:latest')
+    parser.add_argument('--prompt-tps', type=float, default=200.0, help="stub prompt evaluation tokens per second")
+    parser.add_argument('--tps', type=float, default=0.0, help="stub generated tokens per second")
+    parser.add_argument('--parallel', type=int, default=4,
+                        help="stub generations served at once (like OLLAMA_NUM_PARALLEL)")
+    args = parser.parse_args()
+
+    questions = load_form_template(args.template)["questions"]
+    answers = load_answers(args.answers)
+
+    def run(url):
+        full = asyncio.run(run_form(url, args.model, questions, answers, reuse_context=False))
+        chained = asyncio.run(run_form(url, args.model, questions, answers, reuse_context=True))
+        prefetch = {mode: asyncio.run(prefetch_form(url, args.model, questions, answers, mode == "chained"))
+                    for mode in ("parallel", "chained")}
+        return full, chained, prefetch
+
+    if args.url:
+        full, chained, prefetch = run(args.url)
+    else:
+        with StubServerThread(models=[args.model], prompt_tokens_per_second=args.prompt_tps,
+                              tokens_per_second=args.tps, max_parallel=args.parallel) as stub:
+            full, chained, prefetch = run(stub.url)
+
+    print("One field at a time:")
+    print(f"{'field':<28} {'full s':>8} {'full tok':>9} {'context s':>10} {'context tok':>12}")
+    for field, (full_s, full_tok), (chain_s, chain_tok) in zip(questions, full, chained):
+        print(f"{field[:28]:<28} {full_s:>8.3f} {full_tok or 0:>9} {chain_s:>10.3f} {chain_tok or 0:>12}")
+    print(f"{'total':<28} {sum(r[0] for r in full):>8.3f} {sum(r[1] or 0 for r in full):>9} "
+          f"{sum(r[0] for r in chained):>10.3f} {sum(r[1] or 0 for r in chained):>12}")
+
+    print(f"\nPrefetching the whole form ({DEFAULT_CONCURRENCY} connections), seconds until fields are ready:")
+    print(f"{'mode':<10} {'first':>8} {'median':>8} {'last':>8} {'prompt tok':>11}")
+    for mode, (ready, tokens) in prefetch.items():
+        print(f"{mode:<10} {ready[0]:>8.3f} {ready[len(ready) // 2]:>8.3f} {ready[-1]:>8.3f} {tokens:>11}")
+
+if __name__ == "__main__":
+    main()
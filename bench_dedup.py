@@ -0,0 +1,114 @@
+import argparse
+import logging
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from bench_search import build_vocabulary
+from near_duplicates import (DEFAULT_DIM, DEFAULT_THRESHOLD, EmbeddingStore, HashingVectorizer, cluster_pairs,
+                             similar_pairs, submission_text)
+
+logging.basicConfig(level=logging.WARNING)
+
+SUMMARY_WORDS = 60
+FEATURES = (5, 8)  # items x words per item
+# Fraction of submissions that re-submit an earlier idea in other words
+DUPLICATE_RATE = 0.02
+# Fraction of a duplicate's words that are replaced
+REWORD_RATE = 0.2
+
+def synthetic_submissions(count, seed=1):
+    """Return (documents, planted) where planted holds (original, duplicate) index pairs."""
+    rng = random.Random(seed)
+    words, cumulative = build_vocabulary(20000)
+
+    def text(n):
+        return rng.choices(words, cum_weights=cumulative, k=n)
+
+    def reword(items):
+        return [rng.choice(words) if rng.random() < REWORD_RATE else word for word in items]
+
+    documents, planted = [], []
+    for i in range(count):
+        if i and rng.random() < DUPLICATE_RATE:
+            original = rng.randrange(i)
+            responses = documents[original]["responses"]
+            summary = reword(responses["Concept Summary"]["answer"].split())
+            features = [reword(item.split()) for item in responses["Key Features"]["answer"]]
+            rng.shuffle(features)
+            planted.append((original, i))
+        else:
+            summary = text(SUMMARY_WORDS)
+            features = [text(FEATURES[1]) for _ in range(FEATURES[0])]
+        documents.append({"metadata": {"model": "none"}, "responses": {
+            "Project Title": {"question": "Project Title", "answer": f"Project Title: Idea {i}"},
+            "Concept Summary": {"question": "Concept Summary", "answer": " ".join(summary)},
+            "Key Features": {"question": "Key Features", "answer": [" ".join(item) for item in features]},
+        }})
+    return documents, planted
+
+def python_pairwise_rate(matrix, pairs=200000):
+    """Return how many pairs per second a plain Python loop compares."""
+    vectors = matrix[:min(len(matrix), 1000)].tolist()
+    n = len(vectors)
+    start = time.perf_counter()
+    done = 0
+    for i in range(n):
+        a = vectors[i]
+        for j in range(i + 1, n):
+            sum(x * y for x, y in zip(a, vectors[j]))
+            done += 1
+            if done >= pairs:
+                return done / (time.perf_counter() - start)
+    return done / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate detection of submissions.")
+    parser.add_argument('--docs', type=int, default=50000)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM)
+    args = parser.parse_args()
+
+    documents, planted = synthetic_submissions(args.docs)
+    texts = [submission_text(document) for document in documents]
+    print(f"{args.docs} submissions, {len(planted)} planted duplicates")
+
+    with tempfile.TemporaryDirectory() as cache:
+        start = time.perf_counter()
+        matrix, embedded = EmbeddingStore(HashingVectorizer(args.dim), cache).embed(texts)
+        print(f"Embed (cold cache):    {time.perf_counter() - start:6.2f}s  ({embedded} texts)")
+        start = time.perf_counter()
+        matrix, embedded = EmbeddingStore(HashingVectorizer(args.dim), cache).embed(texts)
+        print(f"Embed (warm cache):    {time.perf_counter() - start:6.2f}s  ({embedded} texts)")
+
+    start = time.perf_counter()
+    i, j, _ = similar_pairs(matrix, args.threshold)
+    pairs_time = time.perf_counter() - start
+    start = time.perf_counter()
+    groups = cluster_pairs(len(texts), i, j)
+    cluster_time = time.perf_counter() - start
+    print(f"All-pairs similarity:  {pairs_time:6.2f}s  ({len(i)} pairs >= {args.threshold})")
+    print(f"Clustering:            {cluster_time:6.2f}s  ({len(groups)} groups)")
+
+    group_of = {row: number for number, group in enumerate(groups) for row in group}
+    found = sum(1 for a, b in planted if a in group_of and group_of.get(a) == group_of.get(b))
+    planted_set = set(planted)
+    true_pairs = sum(1 for a, b in zip(i.tolist(), j.tolist()) if (a, b) in planted_set)
+    print(f"Recall of planted duplicates: {found / max(len(planted), 1):.1%}, "
+          f"precision of pairs found: {true_pairs / max(len(i), 1):.1%}")
+
+    sample = np.random.default_rng(0).integers(0, len(matrix), size=(100000, 2))
+    sample = sample[sample[:, 0] != sample[:, 1]]
+    unrelated = np.einsum('ij,ij->i', matrix[sample[:, 0]], matrix[sample[:, 1]])
+    print(f"Random pairs: mean similarity {unrelated.mean():.3f}, 99.9th percentile "
+          f"{np.quantile(unrelated, 0.999):.3f}")
+
+    rate = python_pairwise_rate(matrix)
+    total = len(texts) * (len(texts) - 1) / 2
+    print(f"A Python loop over all {total:.3g} pairs would take about {total / rate / 60:.0f} minutes "
+          f"({rate:.0f} pairs/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+
+from generate_docs import batch_generate
+
+logging.basicConfig(level=logging.WARNING)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def write_submissions(directory, count):
+    """Write count valid submissions, copies of test_data.json with their own titles."""
+    with open(os.path.join(HERE, 'test_data.json'), 'r') as f:
+        template = json.load(f)
+    for i in range(count):
+        template["responses"]["Project Title"]["answer"] = f"Project Title: Submission {i}"
+        with open(os.path.join(directory, f"submission_{i}.json"), 'w') as f:
+            json.dump(template, f)
+
+def output_mtimes(directory):
+    return {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(directory)}
+
+def timed_build(source_dir, output_dir, workers, **options):
+    """Run one batch build quietly; returns (seconds, names of output files written)."""
+    before = output_mtimes(output_dir) if os.path.isdir(output_dir) else {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        batch_generate(source_dir, output_dir, workers=workers, **options)
+    elapsed = time.perf_counter() - start
+    after = output_mtimes(output_dir)
+    return elapsed, sorted(name for name, mtime in after.items() if before.get(name) != mtime)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time full and incremental documentation builds.")
+    parser.add_argument('--docs', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir, output_dir = os.path.join(tmp, 'submissions'), os.path.join(tmp, 'docs')
+        os.makedirs(source_dir)
+        write_submissions(source_dir, args.docs)
+
+        def report(name, elapsed, written):
+            shown = ", ".join(written[:4]) + (", ..." if len(written) > 4 else "")
+            print(f"{name:<28} {elapsed:>7.2f}s  {len(written):>6} files written  {shown}")
+
+        report("full build", *timed_build(source_dir, output_dir, args.workers))
+        report("nothing changed", *timed_build(source_dir, output_dir, args.workers))
+
+        edited = os.path.join(source_dir, "submission_0.json")
+        with open(edited, 'r') as f:
+            document = json.load(f)
+        document["responses"]["Concept Summary"]["answer"] += " Edited."
+        with open(edited, 'w') as f:
+            json.dump(document, f)
+        report("one submission edited", *timed_build(source_dir, output_dir, args.workers))
+
+        os.utime(os.path.join(source_dir, "submission_1.json"))
+        report("one submission touched", *timed_build(source_dir, output_dir, args.workers))
+        report("forced rebuild", *timed_build(source_dir, output_dir, args.workers, force=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from async_http import ConnectionPool, request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+FEATURES = ["Offline mode", "Shared drafts", "Schema checks", "AI suggestions", "Export to HTML"]
+
+def start_server(workdir, persist_interval):
+    """Run form_server.py in its own process on a free port; returns (process, url)."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, 'form_server.py'), '--port', '0',
+         '--template', os.path.join(HERE, 'day1form.md'),
+         '--sessions', os.path.join(workdir, 'sessions'), '--out', os.path.join(workdir, 'out'),
+         '--persist-interval', str(persist_interval)],
+        cwd=workdir, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if 'http://' not in line:
+        process.kill()
+        raise RuntimeError(f"form_server.py did not start: {line!r}")
+    return process, line.split()[3]
+
+async def fill_forms(url, deadline, think, latencies, counts):
+    """One user: fill in and save forms until the deadline, timing every request."""
+    pool = ConnectionPool(url, max_connections=1)
+
+    async def call(method, path, payload=None):
+        start = time.perf_counter()
+        status, body = await request(pool, method, path, payload, timeout=30)
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            raise RuntimeError(f"{method} {path}: HTTP {status} {body[:200]!r}")
+        return json.loads(body)
+
+    try:
+        while time.perf_counter() < deadline:
+            state = await call('POST', '/sessions', {})
+            session = state["session"]
+            while state["next"] is not None:
+                question = state["next"]
+                if think:
+                    await asyncio.sleep(think)
+                answer = FEATURES if question["list"] else f"Answer to {question['field']} " * 8
+                state = await call('POST', f'/sessions/{session}/answer', {"answer": answer})
+                counts["answers"] += 1
+                if question["position"] == 3:
+                    await call('POST', f'/sessions/{session}/answer', {"answer": "SAVE"})
+            await call('POST', f'/sessions/{session}/save', {"name": "bench"})
+            counts["forms"] += 1
+    finally:
+        await pool.close()
+
+async def run_level(url, users, duration, think):
+    latencies, counts = [], {"answers": 0, "forms": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(fill_forms(url, start + duration, think, latencies, counts)
+                           for _ in range(users)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {"users": users, "seconds": elapsed, "answers_per_s": counts["answers"] / elapsed,
+            "forms_per_s": counts["forms"] / elapsed, "requests": len(latencies),
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000}
+
+async def health(url):
+    pool = ConnectionPool(url, max_connections=1)
+    try:
+        _, body = await request(pool, 'GET', '/health', timeout=5)
+        return json.loads(body)
+    finally:
+        await pool.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test form_server.py with many concurrent users.")
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per level")
+    parser.add_argument('--think', type=float, default=0.0, help="seconds each user waits before answering")
+    parser.add_argument('--persist-interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process, url = start_server(workdir, args.persist_interval)
+        try:
+            print(f"Server {url}, {os.cpu_count()} CPUs shared by server and clients\n")
+            print(f"{'users':>6} {'answers/s':>10} {'forms/s':>8} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8}")
+            for users in args.users:
+                result = asyncio.run(run_level(url, users, args.duration, args.think))
+                print(f"{result['users']:>6} {result['answers_per_s']:>10.0f} {result['forms_per_s']:>8.1f} "
+                      f"{result['requests']:>9} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+            stats = asyncio.run(health(url))
+            print(f"\nServer: {stats['started']} sessions started, {stats['saved']} saved, "
+                  f"{stats['answers']} answers, {stats['persisted_records']} records persisted in the background")
+        finally:
+            process.terminate()
+            process.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import logging
+import time
+import tracemalloc
+
+from generate_docs import iter_html, iter_markdown, write_chunks
+
+logging.basicConfig(level=logging.WARNING)
+
+def build_submission(features, answer_chars):
+    """Build a synthetic response document with many Key Features and long answers."""
+    long_answer = ("lorem ipsum dolor sit amet " * (answer_chars // 27 + 1))[:answer_chars]
+    return {
+        "metadata": {
+            "model": "llama3.2:latest",
+            "timestamp": "2024-01-04T10:30:00.000Z"
+        },
+        "responses": {
+            "Project Title": {"question": "What is the title of your project?",
+                              "answer": "Benchmark Project"},
+            "Concept Summary": {"question": "What is the main concept?", "answer": long_answer},
+            "Key Features": {"question": "What are the main features?",
+                             "answer": [f"Feature number {i} with a short description"
+                                        for i in range(features)]},
+            "Technical Approach": {"question": "How will you implement it?", "answer": long_answer}
+        }
+    }
+
+class NullSink:
+    """A sink that counts characters and discards them, like a socket that never blocks."""
+    def __init__(self):
+        self.size = 0
+
+    def write(self, chunk):
+        self.size += len(chunk)
+
+def measure(render):
+    """Return (seconds, peak traced bytes, output chars) for one render call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = render()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+def render_concatenated(chunks):
+    """Reproduce the old approach: build the whole document with += before writing it."""
+    content = ""
+    for chunk in chunks:
+        content += chunk
+    sink = NullSink()
+    sink.write(content)
+    return sink.size
+
+def render_streamed(chunks):
+    """Stream chunks straight into a sink."""
+    sink = NullSink()
+    write_chunks(chunks, sink)
+    return sink.size
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of streamed and concatenated rendering.")
+    parser.add_argument('--features', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--answer-chars', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'format':<6} {'features':>9} {'output MB':>10} {'concat peak MB':>15} "
+          f"{'stream peak MB':>15} {'concat s':>9} {'stream s':>9}")
+    for features in args.features:
+        data = build_submission(features, args.answer_chars)
+        for name, iter_document in (('html', iter_html), ('md', iter_markdown)):
+            concat_s, concat_peak, size = measure(lambda: render_concatenated(iter_document(data)))
+            stream_s, stream_peak, _ = measure(lambda: render_streamed(iter_document(data)))
+            print(f"{name:<6} {features:>9} {size / 1e6:>10.2f} {concat_peak / 1e6:>15.2f} "
+                  f"{stream_peak / 1e6:>15.2f} {concat_s:>9.3f} {stream_s:>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+from submission_store import SNAPSHOT_INTERVAL, SubmissionStore
+
+logging.basicConfig(level=logging.WARNING)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def edit(store, form_id, document, rng, step):
+    """Make one edit the way --edit does: one item of Key Features, or one text answer."""
+    responses = document["responses"]
+    if rng.random() < 0.5:
+        features = list(responses["Key Features"]["answer"])
+        features[rng.randrange(len(features))] = f"Feature rewritten in edit {step}"
+        responses["Key Features"] = dict(responses["Key Features"], answer=features)
+        store.update_field(form_id, "Key Features", responses["Key Features"])
+    else:
+        field = rng.choice([field for field, entry in responses.items() if isinstance(entry["answer"], str)])
+        responses[field] = dict(responses[field], answer=f"{responses[field]['answer'][:400]} (edit {step})")
+        store.save(document, form_id)
+
+def revision_bytes(store, form_id):
+    return sum(entry["size"] for entry in store.history(form_id))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cost of submission revisions stored as patches.")
+    parser.add_argument('--edits', type=int, default=2000)
+    parser.add_argument('--features', type=int, default=40, help="Key Features items, to make the document large")
+    args = parser.parse_args()
+
+    with open(os.path.join(HERE, 'test_data.json'), 'r') as f:
+        document = json.load(f)
+    document["responses"]["Key Features"]["answer"] = [f"Feature {i}: " + "detail " * 20
+                                                      for i in range(args.features)]
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp, SubmissionStore(os.path.join(tmp, 'bench.sqlite3')) as store:
+        form_id = store.save(document)
+        size = len(json.dumps(document))
+        start = time.perf_counter()
+        for step in range(args.edits):
+            edit(store, form_id, document, rng, step)
+        elapsed = time.perf_counter() - start
+        revisions = store.revisions([form_id])[form_id]
+        history = store.history(form_id)
+        stored = revision_bytes(store, form_id)
+        snapshots = sum(1 for entry in history if entry["kind"] == 'document')
+
+        print(f"Document: {size} bytes, {revisions} revisions after {args.edits} edits "
+              f"({snapshots} full copies, one per {SNAPSHOT_INTERVAL} revisions)")
+        print(f"Edit:              {elapsed / args.edits * 1000:8.3f} ms per edit")
+        print(f"History stored:    {stored:>10} bytes ({stored / revisions:.0f} per revision)")
+        print(f"As full copies:    {size * revisions:>10} bytes")
+
+        def timed_read(label, call, repeat=200):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                call()
+            print(f"{label:<19}{(time.perf_counter() - start) / repeat * 1000:8.3f} ms")
+
+        timed_read("Latest (get):", lambda: store.get(form_id))
+        # The slowest revision to rebuild has the most patches after its full copy
+        last_snapshot, worst, replayed = 1, 1, 0
+        for entry in history:
+            if entry["kind"] == 'document':
+                last_snapshot = entry["revision"]
+            elif entry["revision"] - last_snapshot > replayed:
+                worst, replayed = entry["revision"], entry["revision"] - last_snapshot
+        timed_read(f"Revision {worst}:", lambda: store.document_at(form_id, worst))
+        print(f"  ({replayed} patches replayed)")
+        timed_read("Diff 1 -> latest:", lambda: store.diff(form_id, 1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from search_index import SearchIndex
+
+logging.basicConfig(level=logging.WARNING)
+
+FIELDS = ["Project Title", "Concept Summary", "Target Audience", "Key Features", "Technical Approach",
+          "Expected Challenges", "Submission Format", "Expected Outcome", "Additional Notes"]
+# Words per answer (Key Features: items x words per item)
+ANSWER_WORDS = {"Project Title": 4, "Concept Summary": 60, "Target Audience": 30,
+                "Technical Approach": 60, "Expected Challenges": 40, "Submission Format": 20,
+                "Expected Outcome": 30, "Additional Notes": 20}
+FEATURES = (5, 8)
+
+# Project vocabulary, ranked behind filler words in a Zipf-distributed vocabulary so
+# that each of these occurs in roughly 5-15% of submissions, as topic words do
+DOMAIN_RANK = 150
+DOMAIN_WORDS = ("form validation schema json python api model user data search index cache "
+                "database sqlite template markdown html export import session journal async "
+                "server client prompt suggestion ollama batch report latency storage").split()
+
+# Phrases written into a few percent of the technical answers
+PHRASES = ["form validation", "json schema", "search index", "async server"]
+PHRASE_RATE = 0.05
+
+QUERIES = [
+    ("stopword-like", "w3", None),
+    ("one word", "data", None),
+    ("two words", "form validation", None),
+    ("phrase", '"form validation"', None),
+    ("rare word", "w4711", None),
+    ("prefix", "valid*", None),
+    ("field-scoped", "form validation", ["Technical Approach", "Key Features"]),
+    ("any word", "sqlite ollama", None),
+]
+
+def build_vocabulary(size):
+    """Return the vocabulary and its cumulative Zipf weights."""
+    filler = [f"w{i}" for i in range(size)]
+    words = filler[:DOMAIN_RANK] + DOMAIN_WORDS + filler[DOMAIN_RANK:]
+    cumulative, total = [], 0.0
+    for rank in range(len(words)):
+        total += 1.0 / (rank + 1)
+        cumulative.append(total)
+    return words, cumulative
+
+def synthetic_documents(count, seed=1):
+    """Yield (source, document, version) items shaped like day1form.json."""
+    rng = random.Random(seed)
+    words, cumulative = build_vocabulary(20000)
+
+    def text(n):
+        return " ".join(rng.choices(words, cum_weights=cumulative, k=n))
+
+    for i in range(count):
+        responses = {field: {"question": field, "answer": text(n)} for field, n in ANSWER_WORDS.items()}
+        responses["Project Title"]["answer"] = "Project Title: " + responses["Project Title"]["answer"]
+        if rng.random() < PHRASE_RATE:
+            responses["Technical Approach"]["answer"] += f" using {rng.choice(PHRASES)}"
+        responses["Key Features"] = {"question": "Key Features",
+                                     "answer": [text(FEATURES[1]) for _ in range(FEATURES[0])]}
+        yield f"bench/{i}.json", {"metadata": {"model": "none"}, "responses": responses}, "1"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search index build time and query latency.")
+    parser.add_argument('--docs', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=30, help="repetitions of each query")
+    parser.add_argument('--keep', help="keep the index at this path instead of a temporary file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.keep or os.path.join(tmp, 'bench_index.sqlite3')
+        with SearchIndex(path, FIELDS) as index:
+            start = time.perf_counter()
+            index.add_many(synthetic_documents(args.docs))
+            build = time.perf_counter() - start
+            start = time.perf_counter()
+            index.optimize()
+            optimize = time.perf_counter() - start
+            size = os.path.getsize(path)
+            print(f"Indexed {args.docs} submissions in {build:.1f}s ({args.docs / build:.0f} docs/s), "
+                  f"optimize {optimize:.1f}s, index size {size / 1e6:.0f} MB")
+
+            start = time.perf_counter()
+            index.add(*next(synthetic_documents(1, seed=2)))
+            print(f"Incremental update of one submission: {(time.perf_counter() - start) * 1000:.2f} ms\n")
+
+            print(f"{'query':<16} {'results':>7} {'p50 ms':>8} {'p95 ms':>8}")
+            for name, query, fields in QUERIES:
+                times = []
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    results = index.search(query, fields, limit=10, any_terms=name == "any word")
+                    times.append((time.perf_counter() - start) * 1000)
+                times.sort()
+                print(f"{name:<16} {len(results):>7} {statistics.median(times):>8.2f} "
+                      f"{times[int(len(times) * 0.95) - 1]:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Commands that should start fast; none of them reach a prompt
+COMMANDS = {
+    "python (baseline)": [sys.executable, "-c", "pass"],
+    "import process_form": [sys.executable, "-c", "import process_form"],
+    "import form_session": [sys.executable, "-c", "import form_session"],
+    "process_form.py --help": [sys.executable, "process_form.py", "--help"],
+    "process_form.py --batch --help": [sys.executable, "process_form.py", "--batch", "--help"],
+}
+
+def time_command(command, runs):
+    """Return the wall-clock seconds of each of several fresh runs of a command."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=HERE, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+def count_modules(statement):
+    """Return how many modules a fresh interpreter has loaded after running statement."""
+    output = subprocess.run([sys.executable, "-c", f"{statement}; import sys; print(len(sys.modules))"],
+                            cwd=HERE, capture_output=True, text=True).stdout.strip()
+    return int(output) if output.isdigit() else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the command line tools.")
+    parser.add_argument('--runs', type=int, default=15)
+    args = parser.parse_args()
+
+    print(f"{'command':<34} {'min ms':>8} {'median ms':>10}")
+    for name, command in COMMANDS.items():
+        times = time_command(command, args.runs)
+        print(f"{name:<34} {min(times) * 1000:>8.1f} {statistics.median(times) * 1000:>10.1f}")
+    print(f"\nModules loaded: python {count_modules('pass')}, "
+          f"import process_form {count_modules('import process_form')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BUILD_CACHE_FILE = '.build_cache.json'
+# Bump when the information recorded per source changes, so everything is rebuilt once
+BUILD_CACHE_VERSION = 1
+
+def document_hash(document):
+    """Return the content hash of a response document; key order and formatting do not count."""
+    canonical = json.dumps(document, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def file_stamp(path):
+    """Return the mtime/size stamp of a file, or None if it is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+class BuildCache:
+    """What has been generated in an output directory, from which source content and template.
+
+    Kept in OUTPUT_DIR/.build_cache.json, one entry per source (a JSON file
+    path, or "db#id" for the submission store):
+
+      stamp    mtime/size of the file (or store revision) when it was last hashed
+      hash     document_hash() of the source document
+      outputs  {format: {"file": output file name, "template": template version}}
+
+    An output is rebuilt when the source hash or the template version
+    changed, or when the file is missing. The stamp only saves hashing
+    sources whose stat (or revision) has not changed since the last build.
+    """
+
+    def __init__(self, output_dir, filename=BUILD_CACHE_FILE):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, filename)
+        self.entries = self._load()
+        # Which source each output file was last built from
+        self._owners = {output["file"]: source for source, entry in self.entries.items()
+                        for output in entry["outputs"].values()}
+        self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if not isinstance(cache, dict) or cache.get("version") != BUILD_CACHE_VERSION:
+            return {}
+        return cache.get("sources", {})
+
+    def __len__(self):
+        return len(self.entries)
+
+    def source_hash(self, source, stamp, load):
+        """Return the content hash of a source, calling load() for its document only if its stamp changed.
+
+        Returns None if load() returns None (the source could not be read).
+        """
+        entry = self.entries.get(source)
+        if entry and stamp is not None and entry["stamp"] == stamp:
+            return entry["hash"]
+        document = load()
+        return document_hash(document) if document is not None else None
+
+    def stale_formats(self, source, content_hash, versions):
+        """Return the formats of versions ({format: template version}) whose output is out of date."""
+        entry = self.entries.get(source)
+        if not entry or entry["hash"] != content_hash:
+            return list(versions)
+        stale = []
+        for fmt, version in versions.items():
+            output = entry["outputs"].get(fmt)
+            if (not output or output["template"] != version or self._owners.get(output["file"]) != source
+                    or not os.path.exists(os.path.join(self.output_dir, output["file"]))):
+                stale.append(fmt)
+        return stale
+
+    def touch(self, source, stamp, content_hash):
+        """Record a new stamp for an unchanged source, so it is not hashed again."""
+        entry = self.entries.get(source)
+        if entry and entry["hash"] == content_hash and entry["stamp"] != stamp:
+            entry["stamp"] = stamp
+            self._dirty = True
+
+    def record(self, source, stamp, content_hash, fmt, template_version, output_file):
+        """Record that output_file was generated from the source content in a format."""
+        entry = self.entries.get(source)
+        if entry is None or entry["hash"] != content_hash:
+            # Outputs built from earlier content are stale in every format
+            entry = self.entries[source] = {"stamp": stamp, "hash": content_hash, "outputs": {}}
+        entry["stamp"] = stamp
+        name = os.path.relpath(output_file, self.output_dir)
+        entry["outputs"][fmt] = {"file": name, "template": template_version}
+        self._owners[name] = source
+        self._dirty = True
+
+    def forget(self, source):
+        """Drop a source; returns the paths of the outputs that were built from it."""
+        entry = self.entries.pop(source, None)
+        if entry is None:
+            return []
+        self._dirty = True
+        paths = []
+        for output in entry["outputs"].values():
+            if self._owners.get(output["file"]) == source:
+                del self._owners[output["file"]]
+                paths.append(os.path.join(self.output_dir, output["file"]))
+        return paths
+
+    def save(self):
+        """Write the cache atomically, if anything changed."""
+        if not self._dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": BUILD_CACHE_VERSION, "sources": self.entries}, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning("Could not write build cache %s: %s", self.path, e)
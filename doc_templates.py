@@ -0,0 +1,147 @@
+import hashlib
+import html
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Layout templates live here as document.<format>, e.g. document.html or document.md
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+TEMPLATE_PREFIX = 'document.'
+
+# Formats whose variables are HTML-escaped; everything else is inserted as-is
+ESCAPERS = {
+    'html': html.escape,
+    'htm': html.escape,
+    'xml': html.escape
+}
+
+# {% block name %}...{% endblock %}; a newline directly after either tag is dropped
+_BLOCK_RE = re.compile(r'{%\s*block\s+(\w+)\s*%}\n?(.*?){%\s*endblock\s*%}\n?', re.DOTALL)
+_COMMENT_RE = re.compile(r'{#.*?#}\n?', re.DOTALL)
+_VARIABLE_RE = re.compile(r'{{\s*(\w+)\s*}}')
+
+# Compiled templates keyed by path, with the mtime/size they were compiled from
+_compiled_templates = {}
+
+class TemplateError(Exception):
+    """Raised when a layout template cannot be compiled."""
+
+class CompiledTemplate:
+    """A layout template compiled into one Python render function per block.
+
+    Blocks used to render a document:
+      header        - once, before any field (title, generated, model)
+      section       - a free-text field (field, question, answer)
+      list_start    - before the items of a list field (field, question)
+      list_item     - each item of a list field (field, item)
+      list_end      - after the items of a list field (field, question)
+      footer        - once, at the end
+      title_section - optional; used for Project Title instead of section
+    """
+
+    def __init__(self, fmt, blocks, version):
+        self.format = fmt
+        self.blocks = blocks
+        self.version = version
+
+    def _block(self, name):
+        return self.blocks.get(name, _render_empty)
+
+    def iter_document(self, data, generated):
+        """Yield the rendered document for a JSON response one chunk at a time."""
+        context = {
+            'title': data['responses']['Project Title']['answer'],
+            'generated': generated,
+            'model': data['metadata']['model']
+        }
+        section = self._block('section')
+        list_start = self._block('list_start')
+        list_item = self._block('list_item')
+        list_end = self._block('list_end')
+        title_section = self.blocks.get('title_section')
+
+        yield self._block('header')(context)
+        for field, content in data['responses'].items():
+            context['field'] = field
+            context['question'] = content.get('question', '')
+            if field == 'Project Title' and title_section is not None:
+                context['answer'] = content['answer']
+                yield title_section(context)
+            elif isinstance(content['answer'], list):
+                yield list_start(context)
+                for item in content['answer']:
+                    context['item'] = item
+                    yield list_item(context)
+                yield list_end(context)
+            else:
+                context['answer'] = content['answer']
+                yield section(context)
+        yield self._block('footer')(context)
+
+def _render_empty(context):
+    return ''
+
+def _compile_block(name, body, escape):
+    """Compile one block body into a function of the render context."""
+    parts = []
+    position = 0
+    for match in _VARIABLE_RE.finditer(body):
+        if match.start() > position:
+            parts.append(repr(body[position:match.start()]))
+        parts.append(f"_escape(str(context[{match.group(1)!r}]))")
+        position = match.end()
+    if position < len(body):
+        parts.append(repr(body[position:]))
+
+    source = f"def render_{name}(context):\n    return {' + '.join(parts) or repr('')}\n"
+    namespace = {'_escape': escape}
+    exec(compile(source, f"<template block {name}>", 'exec'), namespace)
+    return namespace[f"render_{name}"]
+
+def compile_template(source, fmt):
+    """Compile template source text for an output format."""
+    escape = ESCAPERS.get(fmt, _identity)
+    source = _COMMENT_RE.sub('', source)
+    blocks = {}
+    for match in _BLOCK_RE.finditer(source):
+        name, body = match.group(1), match.group(2)
+        if name in blocks:
+            raise TemplateError(f"Block '{name}' defined twice in {fmt} template")
+        blocks[name] = _compile_block(name, body, escape)
+    if not blocks:
+        raise TemplateError(f"No blocks found in {fmt} template")
+    version = hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+    return CompiledTemplate(fmt, blocks, version)
+
+def _identity(value):
+    return value
+
+def template_path(fmt, template_dir=TEMPLATE_DIR):
+    """Return the path of the layout template for a format."""
+    return os.path.join(template_dir, f"{TEMPLATE_PREFIX}{fmt}")
+
+def available_formats(template_dir=TEMPLATE_DIR):
+    """Return the output formats that have a layout template."""
+    try:
+        names = os.listdir(template_dir)
+    except FileNotFoundError:
+        logger.error("Template directory not found: %s", template_dir)
+        return []
+    return sorted(name[len(TEMPLATE_PREFIX):] for name in names
+                  if name.startswith(TEMPLATE_PREFIX) and len(name) > len(TEMPLATE_PREFIX))
+
+def get_template(fmt, template_dir=TEMPLATE_DIR):
+    """Return the compiled template for a format, recompiling only when its file changes."""
+    path = template_path(fmt, template_dir)
+    stat = os.stat(path)
+    cached = _compiled_templates.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    logger.info("Compiling %s template: %s", fmt, path)
+    with open(path, 'r', encoding='utf-8') as f:
+        template = compile_template(f.read(), fmt)
+    _compiled_templates[path] = (stat.st_mtime_ns, stat.st_size, template)
+    return template
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = '.json_manifest.json'
+# Bump when the information recorded per file changes, so every entry is re-read
+MANIFEST_VERSION = 2
+SCHEMA_FILE = 'schema.json'
+
+KIND_SUBMISSION = 'submission'  # a form response document (possibly incomplete)
+KIND_OTHER = 'other'            # valid JSON that is not a form response
+KIND_INVALID = 'invalid'        # unreadable or not JSON
+
+def describe_file(path, validate):
+    """Parse one JSON file and return its manifest entry (without the stat fields)."""
+    try:
+        with open(path, 'r') as f:
+            document = json.load(f)
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        return {"kind": KIND_INVALID, "valid": False, "errors": [str(e)]}
+    if not (isinstance(document, dict) and isinstance(document.get('responses'), dict)
+            and isinstance(document.get('metadata', {}), dict)):
+        return {"kind": KIND_OTHER, "valid": False, "errors": ["not a form response document"]}
+
+    from submission_store import document_title
+
+    metadata = document.get('metadata', {})
+    errors = [f"{p}: {m}" for p, m in validate(document)] if validate else []
+    return {
+        "kind": KIND_SUBMISSION,
+        "valid": not errors,
+        "errors": errors,
+        "title": document_title(document),
+        "model": metadata.get('model'),
+        "timestamp": metadata.get('timestamp'),
+        "fields": len(document['responses'])
+    }
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+def _load_validator(directory):
+    from form_schema import SchemaError, get_validator
+
+    try:
+        return get_validator(os.path.join(directory, SCHEMA_FILE))
+    except (OSError, json.JSONDecodeError, SchemaError) as e:
+        logger.warning("Could not load %s, skipping schema checks: %s", SCHEMA_FILE, e)
+        return None
+
+def scan(directory='.', manifest_path=None):
+    """Return {filename: entry} for every .json file in a directory, refreshing the manifest.
+
+    Files are matched to the manifest by stat alone: only new files and files
+    whose mtime or size changed are opened and parsed. Each entry records
+    mtime_ns, size, kind, valid, errors and, for submissions, title, model,
+    timestamp and the number of answered fields.
+    """
+    manifest_path = manifest_path or os.path.join(directory, MANIFEST_FILE)
+    manifest = _load_manifest(manifest_path)
+    old_files = manifest.get("files", {})
+    schema_stat = None
+    try:
+        st = os.stat(os.path.join(directory, SCHEMA_FILE))
+        schema_stat = [st.st_mtime_ns, st.st_size]
+    except OSError:
+        pass
+    if manifest.get("schema") != schema_stat:
+        # Validity depends on the schema, so a changed schema re-checks everything
+        old_files = {}
+
+    files = {}
+    validate = None
+    parsed = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if not name.endswith('.json') or name.startswith('.') or name == SCHEMA_FILE:
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            cached = old_files.get(name)
+            if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+                files[name] = cached
+                continue
+            if validate is None and schema_stat is not None:
+                validate = _load_validator(directory)
+            files[name] = dict(describe_file(entry.path, validate),
+                               mtime_ns=st.st_mtime_ns, size=st.st_size)
+            parsed += 1
+
+    if parsed or files.keys() != old_files.keys():
+        logger.info("Manifest refreshed: %s of %s JSON files parsed", parsed, len(files))
+        tmp_path = f"{manifest_path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": MANIFEST_VERSION, "schema": schema_stat, "files": files}, f)
+            os.replace(tmp_path, manifest_path)
+        except OSError as e:
+            logger.warning("Could not write manifest %s: %s", manifest_path, e)
+    return files
+
+def list_submissions(directory='.', valid_only=False):
+    """Return (filename, entry) for the form submissions in a directory, newest first."""
+    files = scan(directory)
+    submissions = [(name, entry) for name, entry in files.items()
+                   if entry["kind"] == KIND_SUBMISSION and (entry["valid"] or not valid_only)]
+    submissions.sort(key=lambda item: item[1]["mtime_ns"], reverse=True)
+    return submissions
+
+def describe_entry(name, entry):
+    """Return a one-line description of a manifest entry for file pickers."""
+    details = [entry.get("title") or "(untitled)"]
+    if entry.get("model"):
+        details.append(entry["model"])
+    if not entry.get("valid"):
+        details.append("incomplete")
+    return f"{name} - {' - '.join(details)}"
@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_DIR = '.journal'
+JOURNAL_SUFFIX = '.jsonl'
+
+# fsync policies: every record survives a process crash (it is flushed to the OS);
+# fsync decides how often it is also forced to disk
+FSYNC_ALWAYS = 'always'      # fsync after every record
+FSYNC_INTERVAL = 'interval'  # fsync at most once per fsync_interval seconds, and on sync()
+FSYNC_NEVER = 'never'        # leave it to the OS, except on sync()
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER)
+DEFAULT_FSYNC_INTERVAL = 1.0
+
+def _apply(state, record):
+    """Apply one journal record to a document state."""
+    op = record.get('op')
+    if op == 'start':
+        document = record.get('document') or {}
+        state['metadata'] = dict(document.get('metadata', {}))
+        state['responses'] = dict(document.get('responses', {}))
+    elif op == 'set':
+        state['responses'][record['field']] = record['entry']
+    elif op == 'meta':
+        state['metadata'][record['key']] = record['value']
+
+def replay(path):
+    """Rebuild the document recorded in a journal.
+
+    Returns (document, info, valid_bytes). A torn last line from a crash
+    mid-write is ignored; valid_bytes is the length of the intact prefix.
+    """
+    state = {"metadata": {}, "responses": {}}
+    info = {"path": path, "records": 0, "session": None, "source": None, "created": None,
+            "updated": None}
+    valid_bytes = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                logger.warning("Ignoring incomplete last record in %s", path)
+                break
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Ignoring corrupt record in %s at byte %s", path, valid_bytes)
+                break
+            _apply(state, record)
+            if record.get('op') == 'start':
+                info.update(session=record.get('session'), source=record.get('source'),
+                            created=record.get('created'))
+            info['records'] += 1
+            info['updated'] = record.get('at', info['updated'])
+            valid_bytes += len(line)
+    return state, info, valid_bytes
+
+def find_journals(directory=JOURNAL_DIR):
+    """Return (document, info) for every journal left behind by an unfinished session, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    paths = [os.path.join(directory, name) for name in os.listdir(directory)
+             if name.endswith(JOURNAL_SUFFIX)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    journals = []
+    for path in paths:
+        try:
+            document, info, _ = replay(path)
+        except OSError as e:
+            logger.warning("Could not read journal %s: %s", path, e)
+            continue
+        journals.append((document, info))
+    return journals
+
+class FormJournal:
+    """Append-only JSONL journal of one form session.
+
+    The first record holds the document the session started from; every
+    answered or edited field then appends one small record, so saving costs
+    O(changed field). compact() writes the final document and removes the
+    journal. A journal still on disk at startup belongs to a session that
+    never finished and can be replayed with FormJournal.open().
+
+    A buffered journal keeps new records in memory until persist() (or
+    sync(), compact(), close()) writes them in one go, so a server holding
+    many sessions decides how often each one touches the disk.
+    """
+
+    def __init__(self, path, document, fsync=FSYNC_INTERVAL, fsync_interval=DEFAULT_FSYNC_INTERVAL,
+                 buffered=False):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', expected one of {', '.join(FSYNC_POLICIES)}")
+        self.path = path
+        self.document = document
+        self.source = None
+        self.session = None
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.records = 0
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        self.buffered = buffered
+        self._pending = []
+        self._file = open(path, 'ab')
+
+    @classmethod
+    def create(cls, document, directory=JOURNAL_DIR, source=None, session=None, **options):
+        """Start a journal for a new session from an initial document.
+
+        session names the journal; by default it is the start time and
+        process id, which is unique for one session per process.
+        """
+        os.makedirs(directory, exist_ok=True)
+        session = session or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        path = os.path.join(directory, f"session_{session}{JOURNAL_SUFFIX}")
+        journal = cls(path, document, **options)
+        journal.source = source
+        journal.session = session
+        journal._append({"op": "start", "session": session, "source": source,
+                         "created": datetime.now().isoformat(), "document": document})
+        if journal.buffered:
+            # The session exists on disk at once; forcing it to disk is left to the fsync policy
+            journal.persist()
+        else:
+            journal.sync()
+        logger.info("Journaling session %s to %s", session, path)
+        return journal
+
+    @classmethod
+    def open(cls, path, **options):
+        """Resume an unfinished session: replay its journal and keep appending to it."""
+        document, info, valid_bytes = replay(path)
+        if valid_bytes < os.path.getsize(path):
+            # Drop a torn tail so new records start on a clean line
+            with open(path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        journal = cls(path, document, **options)
+        journal.records = info['records']
+        journal.source = info['source']
+        journal.session = info['session']
+        logger.info("Recovered %s answers from %s", len(document['responses']), path)
+        return journal
+
+    def _append(self, record):
+        record['at'] = datetime.now().isoformat()
+        line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+        self.records += 1
+        if self.buffered:
+            self._pending.append(line)
+            return
+        self._write(line)
+
+    def _write(self, data):
+        self._file.write(data)
+        self._file.flush()
+        self._dirty = True
+        if self.fsync == FSYNC_ALWAYS or (
+                self.fsync == FSYNC_INTERVAL
+                and time.monotonic() - self._last_fsync >= self.fsync_interval):
+            self._fsync()
+
+    @property
+    def pending(self):
+        """Number of records of a buffered journal not yet written to the file."""
+        return len(self._pending)
+
+    def persist(self):
+        """Write the records a buffered journal is holding; returns how many were written."""
+        if not self._pending:
+            return 0
+        lines, self._pending = self._pending, []
+        self._write(b"".join(lines))
+        return len(lines)
+
+    def _fsync(self):
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+    def record(self, field, entry):
+        """Record a field's answer ({"question", "answer"}) and apply it to the document."""
+        self.document['responses'][field] = entry
+        self._append({"op": "set", "field": field, "entry": entry})
+
+    def set_metadata(self, key, value):
+        """Record a metadata value and apply it to the document."""
+        self.document['metadata'][key] = value
+        self._append({"op": "meta", "key": key, "value": value})
+
+    def sync(self):
+        """Force every record written so far to disk."""
+        self.persist()
+        if self._dirty:
+            self._fsync()
+
+    def compact(self, output_path):
+        """Write the journaled document to output_path atomically, then remove the journal."""
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.document, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+        logger.info("Compacted %s journal records into %s", self.records, output_path)
+        self.discard()
+
+    def discard(self):
+        """Close and delete the journal."""
+        self._pending = []
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Sync and close the journal, leaving it on disk for recovery."""
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
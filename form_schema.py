@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.json')
+
+_TYPE_CHECKS = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "string": "isinstance({v}, str)",
+    "boolean": "isinstance({v}, bool)",
+    "integer": "(isinstance({v}, int) and not isinstance({v}, bool))",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "null": "{v} is None"
+}
+
+# Compiled validators keyed by schema path, with the mtime/size they were compiled from
+_compiled_validators = {}
+
+class SchemaError(Exception):
+    """Raised when schema.json uses something the validator compiler does not support."""
+
+def _is_date_time(value):
+    try:
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return True
+    except ValueError:
+        return False
+
+_FORMAT_CHECKS = {"date-time": _is_date_time}
+
+class _Compiler:
+    """Turns a JSON schema into the source of one straight-line validate(document) function."""
+
+    def __init__(self):
+        self.lines = []
+        self.counter = 0
+
+    def emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def var(self):
+        self.counter += 1
+        return f"v{self.counter}"
+
+    def compile(self, schema):
+        self.emit(0, "def validate(document):")
+        self.emit(1, "errors = []")
+        self.node(schema, "document", "$", 1)
+        self.emit(1, "return errors")
+        return "\n".join(self._fill_empty_blocks(self.lines)) + "\n"
+
+    @staticmethod
+    def _fill_empty_blocks(lines):
+        """Give every block opener without an indented body a `pass`."""
+        filled = []
+        for i, line in enumerate(lines):
+            filled.append(line)
+            if line.endswith(":"):
+                depth = len(line) - len(line.lstrip())
+                following = lines[i + 1] if i + 1 < len(lines) else ""
+                if len(following) - len(following.lstrip()) <= depth:
+                    filled.append(" " * (depth + 4) + "pass")
+        return filled
+
+    @staticmethod
+    def path_expr(path):
+        """Paths are plain strings while constant, or ("expr", source) once inside an array."""
+        return path[1] if isinstance(path, tuple) else repr(path)
+
+    @staticmethod
+    def child_path(path, suffix):
+        if isinstance(path, tuple):
+            return ("expr", f"{path[1]} + {suffix!r}")
+        return path + suffix
+
+    def node(self, schema, v, path, indent):
+        """Emit checks for value v (a variable name) at path."""
+        unknown = set(schema) - {"$schema", "type", "required", "properties", "items", "format",
+                                 "enum", "title", "description"}
+        if unknown:
+            raise SchemaError(f"Unsupported schema keywords: {', '.join(sorted(unknown))}")
+        where = self.path_expr(path)
+        expected = schema.get("type")
+        if expected:
+            if expected not in _TYPE_CHECKS:
+                raise SchemaError(f"Unsupported schema type: {expected}")
+            self.emit(indent, f"if not {_TYPE_CHECKS[expected].format(v=v)}:")
+            self.emit(indent + 1, f"errors.append(({where}, {'expected ' + expected!r}))")
+            else_at = len(self.lines)
+            self.emit(indent, "else:")
+            indent += 1
+
+        if "enum" in schema:
+            self.emit(indent, f"if {v} not in {schema['enum']!r}:")
+            self.emit(indent + 1, f"errors.append(({where}, {'expected one of ' + repr(schema['enum'])!r}))")
+        if "format" in schema and schema["format"] in _FORMAT_CHECKS:
+            fmt = schema["format"]
+            self.emit(indent, f"if isinstance({v}, str) and not _formats[{fmt!r}]({v}):")
+            self.emit(indent + 1, f"errors.append(({where}, {'expected ' + fmt!r}))")
+
+        if expected in (None, "object"):
+            guard = indent
+            if expected is None:
+                self.emit(indent, f"if isinstance({v}, dict):")
+                guard += 1
+            for key in schema.get("required", []):
+                self.emit(guard, f"if {key!r} not in {v}:")
+                self.emit(guard + 1, f"errors.append(({where}, {'missing ' + repr(key)!r}))")
+            for key, subschema in schema.get("properties", {}).items():
+                child = self.var()
+                self.emit(guard, f"{child} = {v}.get({key!r}, _MISSING)")
+                self.emit(guard, f"if {child} is not _MISSING:")
+                self.node(subschema, child, self.child_path(path, '.' + key), guard + 1)
+        if expected in (None, "array") and "items" in schema:
+            guard = indent
+            if expected is None:
+                self.emit(indent, f"if isinstance({v}, list):")
+                guard += 1
+            index, item = self.var(), self.var()
+            self.emit(guard, f"for {index}, {item} in enumerate({v}):")
+            item_path = ("expr", f"{self.path_expr(path)} + '[' + str({index}) + ']'")
+            self.node(schema["items"], item, item_path, guard + 1)
+
+        if expected and len(self.lines) == else_at + 1:
+            # Nothing to check beyond the type
+            self.lines.pop()
+
+def compile_schema(schema):
+    """Compile a JSON schema into a function returning a list of (path, message) errors.
+
+    The schema is walked once here; the generated function only runs the
+    checks, with no per-document interpretation.
+    """
+    source = _Compiler().compile(schema)
+    namespace = {"_MISSING": object(), "_formats": _FORMAT_CHECKS}
+    exec(compile(source, "<schema validator>", "exec"), namespace)
+    validate = namespace["validate"]
+    validate.source = source
+    return validate
+
+def get_validator(schema_path=SCHEMA_PATH):
+    """Return the compiled validator for a schema file, recompiling only when the file changes."""
+    stat = os.stat(schema_path)
+    cached = _compiled_validators.get(schema_path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    logger.info("Compiling schema validator: %s", schema_path)
+    with open(schema_path, 'r') as f:
+        validator = compile_schema(json.load(f))
+    _compiled_validators[schema_path] = (stat.st_mtime_ns, stat.st_size, validator)
+    return validator
+
+def validate_document(document, schema_path=SCHEMA_PATH):
+    """Return the schema errors of a response document as "path: message" strings."""
+    return [f"{path}: {message}" for path, message in get_validator(schema_path)(document)]
+
+def _validate_files(paths, schema_path):
+    """Worker: validate a chunk of JSON files; returns [(name, errors)]."""
+    validate = get_validator(schema_path)
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'r') as f:
+                document = json.load(f)
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+            results.append((path, [f"$: unreadable JSON ({str(e)})"]))
+            continue
+        results.append((path, [f"{p}: {m}" for p, m in validate(document)]))
+    return results
+
+def _validate_lines(numbered_lines, schema_path, source):
+    """Worker: validate a chunk of (line number, JSONL line) pairs; returns [(name, errors)]."""
+    validate = get_validator(schema_path)
+    results = []
+    for number, line in numbered_lines:
+        name = f"{source}:{number}"
+        try:
+            document = json.loads(line)
+        except json.JSONDecodeError as e:
+            results.append((name, [f"$: invalid JSON ({str(e)})"]))
+            continue
+        results.append((name, [f"{p}: {m}" for p, m in validate(document)]))
+    return results
+
+def _iter_chunks(source, chunk_size):
+    """Yield (worker function, chunk) pairs for a directory, glob, JSONL file or '-' (stdin)."""
+    if source == '-' or source.endswith('.jsonl'):
+        name = 'stdin' if source == '-' else source
+        stream = sys.stdin if source == '-' else open(source, 'r')
+        try:
+            chunk = []
+            for number, line in enumerate(stream, 1):
+                if line.strip():
+                    chunk.append((number, line))
+                if len(chunk) >= chunk_size:
+                    yield _validate_lines, (chunk, name)
+                    chunk = []
+            if chunk:
+                yield _validate_lines, (chunk, name)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        return
+
+    import glob
+
+    pattern = os.path.join(source, '*.json') if os.path.isdir(source) else source
+    paths = sorted(glob.glob(pattern))
+    for start in range(0, len(paths), chunk_size):
+        yield _validate_files, (paths[start:start + chunk_size],)
+
+def bulk_validate(source, schema_path=SCHEMA_PATH, workers=None, chunk_size=256, on_invalid=None):
+    """Validate every document in source across worker processes.
+
+    Returns (documents checked, invalid documents, seconds). on_invalid is
+    called with (name, errors) for each invalid document as results arrive.
+    """
+    # Imported here so that validating a single document stays cheap to import
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    workers = workers or os.cpu_count() or 1
+    get_validator(schema_path)  # fail fast on an unsupported schema
+    checked = invalid = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+
+        def collect(done):
+            nonlocal checked, invalid
+            for future in done:
+                for name, errors in future.result():
+                    checked += 1
+                    if errors:
+                        invalid += 1
+                        if on_invalid:
+                            on_invalid(name, errors)
+
+        for func, args in _iter_chunks(source, chunk_size):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            if func is _validate_lines:
+                pending.add(executor.submit(func, args[0], schema_path, args[1]))
+            else:
+                pending.add(executor.submit(func, args[0], schema_path))
+        collect(pending)
+    return checked, invalid, time.perf_counter() - start
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate response documents against schema.json.")
+    parser.add_argument('source', help="directory, glob of JSON files, JSONL file, or - for JSONL on stdin")
+    parser.add_argument('--schema', default=SCHEMA_PATH)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=256, help="documents per worker task")
+    parser.add_argument('--quiet', action='store_true', help="only print the summary")
+    parser.add_argument('--show-source', action='store_true', help="print the generated validator and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.show_source:
+        print(get_validator(args.schema).source)
+        return
+
+    def report(name, errors):
+        if not args.quiet:
+            for error in errors:
+                print(f"{name}: {error}")
+
+    checked, invalid, elapsed = bulk_validate(args.source, args.schema, args.workers,
+                                              args.chunk_size, report)
+    rate = checked / elapsed if elapsed > 0 else 0.0
+    print(f"\nValidated {checked} documents in {elapsed:.2f}s ({rate:.0f} documents/s), "
+          f"{invalid} invalid")
+    sys.exit(1 if invalid else 0)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,390 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import signal
+import sys
+import time
+from datetime import datetime
+
+from async_http import encode_response, read_request
+from form_journal import FSYNC_NEVER, FSYNC_POLICIES, JOURNAL_SUFFIX
+from form_session import FormSession
+from log_setup import SESSION_ID, new_session_id, set_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+SESSION_DIR = '.server_sessions'
+OUTPUT_DIR = 'submissions'
+LOG_FILE = 'form_server.log'
+# Seconds between writing buffered answers to the session journals
+PERSIST_INTERVAL = 5.0
+# Sessions idle this long are persisted and dropped from memory; they reload on next use
+IDLE_TIMEOUT = 3600.0
+
+_ROUTE_RE = re.compile(r'^/sessions/(\w+)(?:/(answer|edit|save))?$')
+
+class RequestError(Exception):
+    """An error reported to the client with an HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class _LiveSession:
+    """A FormSession held in memory, with where the user is in the form."""
+
+    __slots__ = ('session', 'position', 'lock', 'last_seen')
+
+    def __init__(self, session, position=0):
+        self.session = session
+        self.position = position
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+
+class FormServer:
+    """Serve many form sessions at once over a small JSON HTTP API.
+
+    Each session is a FormSession whose journal is buffered: answers live in
+    memory and every persist_interval seconds the new ones are appended to
+    its journal in SESSION_DIR, so a crashed server loses at most that much.
+    Sessions idle for idle_timeout are dropped from memory and reloaded from
+    their journal when the user comes back. Everything runs on one event
+    loop; only the final save of a file is handed to a thread.
+
+      POST   /sessions               start: {"document": {...}} continues a form,
+                                     {"previous": {...}} only offers its answers
+      GET    /sessions/ID            answers so far, schema errors and the next question
+      POST   /sessions/ID/answer     {"answer": ...}; SAVE, EXIT and RETURN work as at the terminal
+      POST   /sessions/ID/edit       {"field", "answer"} or, for list fields,
+                                     {"field", "add"} / {"field", "index", "item"} / {"field", "index", "delete": true}
+      POST   /sessions/ID/save       {"name": ...}; writes the form and ends the session
+      DELETE /sessions/ID            ends the session without saving
+      GET    /health                 counters
+    """
+
+    def __init__(self, questions, host='127.0.0.1', port=DEFAULT_PORT, session_dir=SESSION_DIR,
+                 output_dir=OUTPUT_DIR, store=None, persist_interval=PERSIST_INTERVAL,
+                 idle_timeout=IDLE_TIMEOUT, fsync=FSYNC_NEVER):
+        self.questions = questions
+        self.fields = list(questions)
+        self.host = host
+        self.port = port
+        self.session_dir = session_dir
+        self.output_dir = output_dir
+        self.store = store
+        self.persist_interval = persist_interval
+        self.idle_timeout = idle_timeout
+        self.fsync = fsync
+        self.sessions = {}
+        self.stats = {"requests": 0, "answers": 0, "started": 0, "saved": 0, "resumed": 0,
+                      "evicted": 0, "persisted_records": 0}
+        self._server = None
+        self._persister = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        """Start listening (port 0 picks a free port) and persisting in the background."""
+        os.makedirs(self.session_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        waiting = sum(1 for name in os.listdir(self.session_dir) if name.endswith(JOURNAL_SUFFIX))
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._persister = asyncio.create_task(self._persist_loop())
+        logger.info("Form server listening on %s; %d unfinished sessions in %s",
+                    self.url, waiting, self.session_dir)
+        return self
+
+    async def stop(self):
+        """Stop serving and write every session's answers to its journal (they can be resumed)."""
+        if self._persister:
+            self._persister.cancel()
+            try:
+                await self._persister
+            except asyncio.CancelledError:
+                pass
+            self._persister = None
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for live in self.sessions.values():
+            live.session.close()
+        logger.info("Form server stopped; %d sessions left to resume", len(self.sessions))
+        self.sessions.clear()
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            self.persist_all()
+
+    def persist_all(self):
+        """Write buffered answers to the journals and drop idle sessions; returns records written."""
+        written = 0
+        now = time.monotonic()
+        for session_id, live in list(self.sessions.items()):
+            if live.lock.locked():
+                continue  # being saved; the save writes everything anyway
+            if now - live.last_seen > self.idle_timeout:
+                live.session.close()
+                del self.sessions[session_id]
+                self.stats["evicted"] += 1
+                continue
+            written += live.session.persist()
+        self.stats["persisted_records"] += written
+        if written:
+            logger.debug("Persisted %d answers", written)
+        return written
+
+    # Sessions
+
+    def _first_unanswered(self, session):
+        for position, field in enumerate(self.fields):
+            if field not in session.responses:
+                return position
+        return len(self.fields)
+
+    def create_session(self, document=None, previous=None, model=None):
+        """Start a session and return its id."""
+        session_id = new_session_id()
+        session = FormSession.start(self.questions, document, previous=previous, model=model,
+                                    store=self.store, fsync=self.fsync, journal_dir=self.session_dir,
+                                    session_id=session_id, buffered=True)
+        self.sessions[session_id] = _LiveSession(session)
+        self.stats["started"] += 1
+        return session_id
+
+    def get_session(self, session_id):
+        """Return a live session, reloading it from its journal if it was dropped from memory."""
+        live = self.sessions.get(session_id)
+        if live is None:
+            path = os.path.join(self.session_dir, f"session_{session_id}{JOURNAL_SUFFIX}")
+            if not os.path.exists(path):
+                raise RequestError(404, f"no session {session_id}")
+            session = FormSession.resume(path, self.questions, store=self.store, fsync=self.fsync,
+                                         buffered=True)
+            live = self.sessions[session_id] = _LiveSession(session, self._first_unanswered(session))
+            self.stats["resumed"] += 1
+            logger.info("Resumed session %s from %s", session_id, path)
+        live.last_seen = time.monotonic()
+        return live
+
+    def describe(self, session_id, live, full=False, **extra):
+        """Return the client's view of a session: the next question, plus answers and schema errors if full."""
+        state = {"session": session_id, "next": self._question(live),
+                 "done": live.position >= len(self.fields)}
+        if full:
+            state.update(responses=live.session.responses, errors=live.session.errors())
+        state.update(extra)
+        return state
+
+    def _question(self, live):
+        if live.position >= len(self.fields):
+            return None
+        field = self.fields[live.position]
+        return {"field": field, "question": self.questions[field], "position": live.position,
+                "total": len(self.fields), "list": live.session.is_list(field),
+                "previous": live.session.previous_answer(field)}
+
+    async def answer(self, session_id, live, value):
+        """Handle an answer to the current question, or a SAVE/EXIT/RETURN command."""
+        session = live.session
+        command = value.strip().upper() if isinstance(value, str) else None
+        if command == 'SAVE':
+            # SAVE forces the journal to disk; fsync would stall every other session
+            await asyncio.to_thread(session.checkpoint)
+            return self.describe(session_id, live, saved=True)
+        if command == 'EDIT':
+            raise RequestError(400, f"EDIT needs a field: POST /sessions/{session_id}/edit")
+        if command == 'EXIT':
+            # As at the terminal, EXIT saves what there is
+            return await self.save(session_id, live)
+        if live.position >= len(self.fields):
+            raise RequestError(409, "every question has been answered; save the form")
+        field = self.fields[live.position]
+        if command == 'RETURN':
+            try:
+                session.keep(field)
+            except KeyError:
+                raise RequestError(400, "there is no previous answer to keep")
+        else:
+            session.answer(field, value)
+        live.position += 1
+        self.stats["answers"] += 1
+        return self.describe(session_id, live, answered=field)
+
+    def edit(self, session_id, live, request):
+        """Change an answered field: replace it, or add, replace or delete one item of a list."""
+        session = live.session
+        field = request.get("field")
+        if field not in session.responses:
+            raise RequestError(400, f"'{field}' has not been answered")
+        if "add" in request:
+            session.add_item(field, request["add"])
+        elif request.get("delete"):
+            session.delete_item(field, int(request["index"]))
+        elif "index" in request:
+            session.replace_item(field, int(request["index"]), request["item"])
+        elif "answer" in request:
+            session.edit(field, request["answer"])
+        else:
+            raise RequestError(400, "give answer, add, index and item, or index and delete")
+        return self.describe(session_id, live, full=True, edited=field)
+
+    def _output_path(self, session_id, name):
+        name = "".join(c if c.isalnum() or c in '-_' else "_" for c in str(name or "form"))
+        datestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(self.output_dir, f"{name}_{datestamp}_{session_id}.json")
+
+    async def save(self, session_id, live, name=None):
+        """Save the form (into the store, or a JSON file) and end the session."""
+        errors = live.session.errors()
+        if self.store is not None:
+            # The store's SQLite connection belongs to the event loop's thread
+            saved = live.session.save()
+        else:
+            # Writing and fsyncing the file would stall every other session
+            saved = await asyncio.to_thread(live.session.save, self._output_path(session_id, name))
+        del self.sessions[session_id]
+        self.stats["saved"] += 1
+        return {"session": session_id, "saved": saved, "errors": errors}
+
+    # HTTP
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._dispatch(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(encode_response(status, payload, keep_alive=keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        self.stats["requests"] += 1
+        token = None
+        try:
+            try:
+                request = json.loads(body) if body else {}
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                raise RequestError(400, "the request body is not valid JSON")
+            if not isinstance(request, dict):
+                raise RequestError(400, "the request body must be a JSON object")
+            path = path.split('?', 1)[0].rstrip('/') or '/'
+            if path == '/health' and method == 'GET':
+                return 200, self.health()
+            if path == '/sessions' and method == 'POST':
+                document = request.get("document")
+                if document is not None and not isinstance(document, dict):
+                    raise RequestError(400, "document must be a JSON object")
+                session_id = self.create_session(document, request.get("previous"), request.get("model"))
+                token = set_session(session_id)
+                logger.info("Started session %s", session_id)
+                return 200, self.describe(session_id, self.sessions[session_id])
+            match = _ROUTE_RE.match(path)
+            if not match:
+                raise RequestError(404, f"unknown endpoint {method} {path}")
+            session_id, action = match.groups()
+            token = set_session(session_id)
+            live = self.get_session(session_id)
+            async with live.lock:
+                if session_id not in self.sessions:
+                    raise RequestError(404, f"session {session_id} has ended")
+                if method == 'GET' and action is None:
+                    return 200, self.describe(session_id, live, full=True)
+                if method == 'DELETE' and action is None:
+                    live.session.discard()
+                    del self.sessions[session_id]
+                    return 200, {"session": session_id, "discarded": True}
+                if method != 'POST' or action is None:
+                    raise RequestError(405, f"{method} is not allowed on {path}")
+                if action == 'answer':
+                    if "answer" not in request:
+                        raise RequestError(400, "missing answer")
+                    return 200, await self.answer(session_id, live, request["answer"])
+                if action == 'edit':
+                    return 200, self.edit(session_id, live, request)
+                return 200, await self.save(session_id, live, request.get("name"))
+        except RequestError as e:
+            return e.status, {"error": str(e)}
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            return 400, {"error": f"invalid request: {e}"}
+        except Exception as e:
+            logger.error("Error handling %s %s: %s", method, path, e, exc_info=True)
+            return 500, {"error": "internal error"}
+        finally:
+            if token is not None:
+                SESSION_ID.reset(token)
+
+    def health(self):
+        return dict(self.stats, sessions=len(self.sessions),
+                    pending=sum(live.session.journal.pending for live in self.sessions.values()))
+
+async def serve(server):
+    await server.start()
+    print(f"Form server on {server.url} (Ctrl+C to stop)")
+    stopping = asyncio.Event()
+    try:
+        # Stop cleanly under a process manager too, so no buffered answer is lost
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    except (NotImplementedError, RuntimeError):
+        pass
+    try:
+        await stopping.wait()
+    finally:
+        await server.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the form to many users at once over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--template', default='day1form.md', help="form template")
+    parser.add_argument('--out', default=OUTPUT_DIR, help="directory for saved forms")
+    parser.add_argument('--store', nargs='?', const='submissions.sqlite3',
+                        help="save into this SQLite submission store instead of JSON files")
+    parser.add_argument('--sessions', default=SESSION_DIR, help="directory of session journals")
+    parser.add_argument('--persist-interval', type=float, default=PERSIST_INTERVAL,
+                        help="seconds between writing answers to the journals")
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help="seconds before an idle session is dropped from memory")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default=FSYNC_NEVER,
+                        help="when journal writes are forced to disk")
+    args = parser.parse_args(argv)
+
+    from log_setup import configure_logging
+    from process_form import load_form_template
+
+    configure_logging(LOG_FILE, console_level=logging.WARNING)
+    questions = load_form_template(args.template)["questions"]
+    store = None
+    if args.store:
+        from submission_store import SubmissionStore
+
+        store = SubmissionStore(args.store)
+    server = FormServer(questions, args.host, args.port, args.sessions, args.out, store,
+                        args.persist_interval, args.idle_timeout, args.fsync)
+    try:
+        asyncio.run(serve(server))
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        if store is not None:
+            store.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,269 @@
+import logging
+from datetime import datetime
+
+from form_journal import FSYNC_INTERVAL, JOURNAL_DIR, FormJournal, find_journals
+from stage_timing import timed
+
+logger = logging.getLogger(__name__)
+
+# Recorded as metadata.model (required by schema.json) when no AI model was used
+NO_MODEL = 'none'
+
+# Fields whose answer is a list of numbered items rather than free text
+LIST_FIELDS = ("Key Features",)
+
+def format_title_answer(answer):
+    """Format the title answer with 'Project Title: ' prefix if not present."""
+    if not answer.startswith("Project Title:"):
+        return f"Project Title: {answer}"
+    return answer
+
+def normalize_answer(field, answer):
+    """Return an answer in the shape saved for its field.
+
+    List fields get a list of non-empty stripped items (a string is split
+    into lines); other fields get a stripped string, with the Project Title
+    prefix added to a non-empty title.
+    """
+    if field in LIST_FIELDS:
+        if answer is None:
+            return []
+        if isinstance(answer, str):
+            return [line.strip() for line in answer.split('\n') if line.strip()]
+        return [str(item).strip() for item in answer if str(item).strip()]
+    if answer is None:
+        answer = ""
+    elif isinstance(answer, list):
+        answer = " ".join(str(item).strip() for item in answer if str(item).strip())
+    else:
+        answer = str(answer).strip()
+    if field == "Project Title" and answer:
+        answer = format_title_answer(answer)
+    return answer
+
+def new_document():
+    """Return an empty response document."""
+    return {"metadata": {"timestamp": datetime.now().isoformat()}, "responses": {}}
+
+def unfinished_sessions(directory=JOURNAL_DIR):
+    """Return (document, info) for every session that ended without saving, newest first."""
+    return find_journals(directory)
+
+def store_id_from_source(store, source):
+    """Return the submission id a session was started from, if it came from this store."""
+    prefix = f"{store.db_path}#"
+    if source and source.startswith(prefix):
+        return int(source[len(prefix):])
+    return None
+
+class FormSession:
+    """A form being filled in: its questions, the answers so far and where they are saved.
+
+    Every change is appended to a FormJournal first, so a session that dies
+    can be resumed. Nothing here reads input or prints; process_form.py is
+    the terminal front end, and other front ends drive the same methods.
+    """
+
+    def __init__(self, questions, journal, previous=None, store=None, form_id=None):
+        self.questions = questions
+        self.journal = journal
+        # Responses shown as "previous answer" and kept by keep(); may be the live responses
+        self.previous = previous if previous is not None else {}
+        self.store = store
+        self.form_id = form_id
+
+    @classmethod
+    def start(cls, questions, document=None, previous=None, source=None, store=None, form_id=None,
+              model=None, fsync=FSYNC_INTERVAL, journal_dir=JOURNAL_DIR, session_id=None, buffered=False):
+        """Start a session that continues document (or a new, empty one).
+
+        previous holds the responses offered as previous answers; by default
+        those of document. source (a file path or "db#id") is where the
+        document came from and is remembered for recovery. session_id names
+        the journal, and buffered keeps answers in memory until persist().
+        """
+        document = document if document is not None else new_document()
+        journal = FormJournal.create(document, journal_dir, source=source, session=session_id,
+                                     fsync=fsync, buffered=buffered)
+        session = cls(questions, journal,
+                      previous if previous is not None else journal.document["responses"],
+                      store, form_id)
+        session.set_model(model)
+        return session
+
+    @classmethod
+    def resume(cls, journal_path, questions, store=None, model=None, fsync=FSYNC_INTERVAL, buffered=False):
+        """Resume a session from the journal it left behind."""
+        journal = FormJournal.open(journal_path, fsync=fsync, buffered=buffered)
+        form_id = store_id_from_source(store, journal.source) if store is not None else None
+        session = cls(questions, journal, journal.document["responses"], store, form_id)
+        session.set_model(model)
+        return session
+
+    @property
+    def document(self):
+        return self.journal.document
+
+    @property
+    def responses(self):
+        return self.journal.document["responses"]
+
+    @property
+    def metadata(self):
+        return self.journal.document["metadata"]
+
+    @property
+    def source(self):
+        return self.journal.source
+
+    @property
+    def session_id(self):
+        return self.journal.session
+
+    def set_model(self, model=None):
+        """Record the model used for suggestions; NO_MODEL if none was ever recorded."""
+        if model:
+            self.journal.set_metadata("model", model)
+        elif "model" not in self.metadata:
+            self.journal.set_metadata("model", NO_MODEL)
+
+    def is_list(self, field):
+        return field in LIST_FIELDS
+
+    def previous_answer(self, field):
+        """Return the previous answer of a field, or None if it has none."""
+        entry = self.previous.get(field)
+        return entry["answer"] if entry else None
+
+    def unanswered(self):
+        """Return the fields that have no answer yet, in form order."""
+        return [field for field in self.questions if field not in self.responses]
+
+    def answer(self, field, value):
+        """Set a field's answer (normalized for the field) and return it."""
+        question = self.questions.get(field) or self.responses.get(field, {}).get("question", "")
+        entry = {"question": question, "answer": normalize_answer(field, value)}
+        self.journal.record(field, entry)
+        return entry["answer"]
+
+    def keep(self, field):
+        """Keep a field's previous answer; raises KeyError if there is none."""
+        entry = self.previous.get(field)
+        if entry is None:
+            raise KeyError(field)
+        self.journal.record(field, {"question": self.questions.get(field, entry.get("question", "")),
+                                    "answer": entry["answer"]})
+        return entry["answer"]
+
+    def edit(self, field, value):
+        """Replace the answer of an already answered field."""
+        if field not in self.responses:
+            raise KeyError(field)
+        return self.answer(field, value)
+
+    def _items(self, field, index=None):
+        items = self.responses[field]["answer"]
+        if not isinstance(items, list):
+            raise TypeError(f"{field} is not a list field")
+        if index is not None and not 0 <= index < len(items):
+            raise IndexError(f"{field} has no item {index}")
+        return list(items)
+
+    def add_item(self, field, item):
+        """Append an item to a list answer."""
+        return self.edit(field, self._items(field) + [item])
+
+    def replace_item(self, field, index, item):
+        """Replace item index (0-based) of a list answer; raises IndexError if out of range."""
+        items = self._items(field, index)
+        items[index] = item
+        return self.edit(field, items)
+
+    def delete_item(self, field, index):
+        """Delete item index (0-based) of a list answer; raises IndexError if out of range."""
+        items = self._items(field, index)
+        del items[index]
+        return self.edit(field, items)
+
+    def errors(self):
+        """Return where the document does not match schema.json yet, as "path: message" strings."""
+        from form_schema import validate_document
+
+        return validate_document(self.document)
+
+    def persist(self):
+        """Write answers a buffered session is holding to its journal; returns how many."""
+        return self.journal.persist()
+
+    @timed("save_progress")
+    def checkpoint(self):
+        """Force every answer so far to disk; the session carries on."""
+        self.journal.sync()
+        logger.info("Progress checkpointed in %s", self.journal.path)
+
+    @timed("save_progress")
+    def save(self, path=None):
+        """Write the finished document and end the session.
+
+        Saves into the submission store when the session has one (returning
+        the form id), else writes path atomically (returning path).
+        Incomplete documents are saved too; check errors() first to tell the
+        user what is missing.
+        """
+        for error in self.errors():
+            logger.warning("The saved form does not match schema.json: %s", error)
+        if self.store is not None:
+            self.form_id = self.store.save(self.document, self.form_id, source=self.source)
+            self.journal.discard()
+            logger.info("Saved submission %s in %s", self.form_id, self.store.db_path)
+            self._update_search_index()
+            return self.form_id
+        if not path:
+            raise ValueError("a path is needed to save without a submission store")
+        self.journal.compact(path)
+        logger.info("Successfully saved results to %s", path)
+        self._update_search_index(path)
+        return path
+
+    @timed("save_progress")
+    def save_edit(self, field):
+        """Write one edited field back to where the document came from and end the session.
+
+        With a store only that field's row is rewritten; otherwise the source
+        file is replaced. Returns the form id or the file path.
+        """
+        if self.store is not None and self.form_id is not None:
+            self.store.update_field(self.form_id, field, self.responses[field])
+            self.journal.discard()
+            self._update_search_index()
+            return self.form_id
+        if not self.source:
+            raise ValueError("the session has no source to write back to")
+        self.journal.compact(self.source)
+        self._update_search_index(self.source)
+        return self.source
+
+    def _update_search_index(self, path=None):
+        """Reindex the saved submission, if a search index has been built."""
+        from search_index import index_saved
+
+        if path is not None:
+            index_saved(path, self.document)
+        else:
+            revision = self.store.revisions([self.form_id]).get(self.form_id)
+            index_saved(f"{self.store.db_path}#{self.form_id}", self.document, str(revision))
+
+    def discard(self):
+        """End the session without saving, deleting its journal."""
+        self.journal.discard()
+
+    def close(self):
+        """Close the journal; an unsaved session stays on disk for resume()."""
+        self.journal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
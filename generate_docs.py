@@ -1,175 +1,404 @@
 import json
 import os
+import sys
+import glob
+import time
+import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from datetime import datetime
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
+from build_cache import BuildCache, document_hash, file_stamp
+from doc_templates import available_formats, get_template
+from form_schema import validate_document
+from log_setup import configure_logging, configure_worker_logging
+from stage_timing import call_and_drain, merge, reset as reset_timings, run_instrumented, timed
+
 logger = logging.getLogger(__name__)
 
+PROFILE_FILE = 'generate_docs.prof'
+# Fewer documents than this to build are rendered in-process rather than in a pool
+POOL_MIN_FILES = 8
+WATCH_INTERVAL = 2.0
+
+@timed("load_json")
 def load_json(file_path):
     """Load and return contents of a JSON file."""
-    logger.info(f"Attempting to load JSON file: {file_path}")
+    logger.info("Attempting to load JSON file: %s", file_path)
     try:
         with open(file_path, 'r') as file:
             data = json.load(file)
-            logger.debug(f"Successfully loaded JSON from {file_path}")
+            logger.debug("Successfully loaded JSON from %s", file_path)
             return data
     except FileNotFoundError:
-        logger.error(f"File not found: {file_path}")
+        logger.error("File not found: %s", file_path)
         return None
     except json.JSONDecodeError as e:
-        logger.error(f"Error decoding JSON from {file_path}: {str(e)}")
+        logger.error("Error decoding JSON from %s: %s", file_path, e)
         return None
     except Exception as e:
-        logger.error(f"Error reading file {file_path}: {str(e)}")
+        logger.error("Error reading file %s: %s", file_path, e)
         return None
 
-def generate_html(data, output_file):
-    """Generate HTML file from JSON data."""
-    logger.info(f"Generating HTML file: {output_file}")
-    try:
-        html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{data['responses']['Project Title']['answer']}</title>
-    <style>
-        body {{
-            font-family: Arial, sans-serif;
-            line-height: 1.6;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-        }}
-        .section {{
-            margin-bottom: 20px;
-        }}
-        h1 {{
-            color: #2c3e50;
-            border-bottom: 2px solid #3498db;
-            padding-bottom: 10px;
-        }}
-        h2 {{
-            color: #34495e;
-        }}
-        ul {{
-            list-style-type: disc;
-            padding-left: 20px;
-        }}
-        .metadata {{
-            color: #7f8c8d;
-            font-size: 0.9em;
-            margin-bottom: 20px;
-        }}
-    </style>
-</head>
-<body>
-    <div class="metadata">
-        Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-        <br>
-        Model used: {data['metadata']['model']}
-    </div>
-"""
-        
-        for field, content in data['responses'].items():
-            html_content += f'    <div class="section">\n        <h2>{field}</h2>\n'
-            if isinstance(content['answer'], list):
-                html_content += '        <ul>\n'
-                for item in content['answer']:
-                    html_content += f'            <li>{item}</li>\n'
-                html_content += '        </ul>\n'
-            else:
-                html_content += f'        <p>{content["answer"]}</p>\n'
-            html_content += '    </div>\n'
+def iter_document(data, fmt):
+    """Yield a document in the given format for a JSON response one chunk at a time."""
+    generated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return get_template(fmt).iter_document(data, generated)
+
+def iter_html(data):
+    """Yield the HTML document for a JSON response one chunk at a time."""
+    return iter_document(data, 'html')
+
+def iter_markdown(data):
+    """Yield the Markdown document for a JSON response one chunk at a time."""
+    return iter_document(data, 'md')
+
+def write_chunks(chunks, sink):
+    """Send chunks to a sink: anything with a write() method, or a callable taking a string."""
+    write = sink.write if hasattr(sink, 'write') else sink
+    for chunk in chunks:
+        write(chunk)
 
-        html_content += """</body>
-</html>"""
+def write_document(chunks, output_file):
+    """Stream chunks into output_file through a buffered handle.
 
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        logger.info(f"Successfully generated HTML file: {output_file}")
+    The document is written to a temporary file first and moved into place,
+    so a failure part-way through never leaves a truncated output file.
+    """
+    tmp_file = f"{output_file}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8', buffering=64 * 1024) as f:
+            write_chunks(chunks, f)
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+def generate_document(data, output_file, fmt):
+    """Generate a document in any format that has a layout template."""
+    logger.info("Generating %s file: %s", fmt.upper(), output_file)
+    try:
+        # Stages are named after the format's wrapper: generate_html, generate_md, ...
+        with timed(f"generate_{fmt}"):
+            write_document(iter_document(data, fmt), output_file)
+        logger.info("Successfully generated %s file: %s", fmt.upper(), output_file)
         return True
     except Exception as e:
-        logger.error(f"Error generating HTML file: {str(e)}")
+        logger.error("Error generating %s file: %s", fmt.upper(), e)
         return False
 
+def generate_html(data, output_file):
+    """Generate HTML file from JSON data."""
+    return generate_document(data, output_file, 'html')
+
 def generate_markdown(data, output_file):
     """Generate Markdown file from JSON data."""
-    logger.info(f"Generating Markdown file: {output_file}")
-    try:
-        md_content = f"""# {data['responses']['Project Title']['answer']}
-
-*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*  
-*Model used: {data['metadata']['model']}*
-
-"""
-        for field, content in data['responses'].items():
-            if field != 'Project Title':  # Skip title since it's already at the top
-                md_content += f"## {field}\n\n"
-                if isinstance(content['answer'], list):
-                    for item in content['answer']:
-                        md_content += f"- {item}\n"
-                else:
-                    md_content += f"{content['answer']}\n"
-                md_content += "\n"
-
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(md_content)
-        logger.info(f"Successfully generated Markdown file: {output_file}")
-        return True
-    except Exception as e:
-        logger.error(f"Error generating Markdown file: {str(e)}")
-        return False
+    return generate_document(data, output_file, 'md')
+
+def check_document(data, name):
+    """Validate a document against schema.json; logs and returns its errors (empty if valid)."""
+    errors = validate_document(data)
+    for error in errors:
+        logger.error("%s does not match schema.json: %s", name, error)
+    return errors
+
+def get_safe_title(data):
+    """Return the project title of a document, made safe for use in a filename."""
+    title = data['responses']['Project Title']['answer']
+    if title.startswith("Project Title: "):
+        title = title[14:]
+    return "".join(c if c.isalnum() else "_" for c in title)
 
-def generate_documentation(json_file):
-    """Main function to generate documentation from JSON file."""
+def generate_documentation(json_file, data=None):
+    """Main function to generate documentation from JSON file (or an already loaded document)."""
     # Load JSON data
-    data = load_json(json_file)
+    if data is None:
+        data = load_json(json_file)
     if not data:
         print("Failed to load JSON file.")
         return False
 
-    # Extract project title for filename
-    try:
-        title = data['responses']['Project Title']['answer']
-        if title.startswith("Project Title: "):
-            title = title[14:]
-        safe_title = "".join(c if c.isalnum() else "_" for c in title)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    except KeyError:
-        logger.error("JSON file does not contain Project Title")
-        print("Error: JSON file must contain a Project Title")
+    # Check the structure up front instead of failing halfway through rendering
+    errors = check_document(data, json_file)
+    if errors:
+        print(f"Error: {json_file} does not match schema.json:")
+        for error in errors:
+            print(f"  {error}")
         return False
 
+    # Extract project title for filename
+    safe_title = get_safe_title(data)
+
     # Prompt for output format
+    formats = available_formats()
     while True:
-        format_choice = input("Choose output format (html/md): ").lower().strip()
-        if format_choice in ['html', 'md']:
+        format_choice = input(f"Choose output format ({'/'.join(formats)}): ").lower().strip()
+        if format_choice in formats:
             break
-        print("Please enter either 'html' or 'md'")
+        print(f"Please enter one of: {', '.join(formats)}")
 
-    # Generate appropriate file
-    output_file = f"{safe_title}_{timestamp}.{format_choice}"
-    if format_choice == 'html':
-        success = generate_html(data, output_file)
-    else:
-        success = generate_markdown(data, output_file)
+    # Generate appropriate file under a stable name, unless it is already up to date
+    output_file = f"{safe_title}.{format_choice}"
+    cache = BuildCache('.')
+    source = os.path.normpath(json_file)
+    content_hash = document_hash(data)
+    version = get_template(format_choice).version
+    if not cache.stale_formats(source, content_hash, {format_choice: version}):
+        print(f"\n{output_file} is up to date")
+        return True
+    success = generate_document(data, output_file, format_choice)
 
     if success:
+        cache.record(source, file_stamp(json_file), content_hash, format_choice, version, output_file)
+        cache.save()
         print(f"\nSuccessfully generated {format_choice.upper()} file: {output_file}")
         return True
     else:
         print(f"\nFailed to generate {format_choice.upper()} file")
         return False
 
+def _init_batch_worker():
+    """Quieten per-file logging in batch worker processes."""
+    configure_worker_logging(logging.WARNING)
+    reset_timings()
+
+def _render_all(name, data, base_name, output_dir, formats):
+    errors = validate_document(data)
+    if errors:
+        return name, [], f"does not match schema.json: {'; '.join(errors)}"
+
+    output_files = []
+    for fmt in formats:
+        output_file = os.path.join(output_dir, f"{base_name}.{fmt}")
+        if not generate_document(data, output_file, fmt):
+            return name, output_files, f"failed to generate {fmt.upper()}"
+        output_files.append(output_file)
+    return name, output_files, None
+
+def render_documents(json_file, output_dir, formats=('html', 'md')):
+    """Load one JSON file once and render every requested format from it.
+
+    Returns a (json_file, output_files, error) tuple so results can cross process boundaries.
+    """
+    data = load_json(json_file)
+    if not data:
+        return json_file, [], "could not load JSON"
+    base_name = os.path.splitext(os.path.basename(json_file))[0]
+    return _render_all(json_file, data, base_name, output_dir, formats)
+
+_worker_stores = {}
+
+def render_submission(db_path, form_id, output_dir, formats=('html', 'md')):
+    """Render one submission from the store; each worker keeps its own connection open."""
+    from submission_store import SubmissionStore
+
+    store = _worker_stores.get(db_path)
+    if store is None:
+        store = _worker_stores[db_path] = SubmissionStore(db_path)
+    name = f"submission {form_id}"
+    data = store.get(form_id)
+    if not data:
+        return name, [], "no such submission"
+    return _render_all(name, data, f"submission_{form_id}", output_dir, formats)
+
+def find_json_files(pattern):
+    """Return the JSON files in a directory, or those matching a glob pattern."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.json')
+    return sorted(glob.glob(pattern))
+
+def _read_json(path):
+    """Load a JSON file quietly (for hashing); None if it cannot be read."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError):
+        return None
+
+def plan_builds(cache, sources, formats, force=False):
+    """Return [(item, source, stamp, hash, formats to build)] for the sources that are out of date.
+
+    sources yields (item, source, stamp, load) where load() returns the
+    source document; it is only called for sources whose stamp changed.
+    Unchanged sources whose stamp moved (e.g. touched files) get the new
+    stamp recorded.
+    """
+    versions = {fmt: get_template(fmt).version for fmt in formats}
+    todo = []
+    for item, source, stamp, load in sources:
+        content_hash = cache.source_hash(source, stamp, load)
+        if content_hash is None:
+            # Unreadable; the render reports why
+            todo.append((item, source, stamp, None, list(formats)))
+            continue
+        stale = list(formats) if force else cache.stale_formats(source, content_hash, versions)
+        if stale:
+            todo.append((item, source, stamp, content_hash, stale))
+        else:
+            cache.touch(source, stamp, content_hash)
+    return todo
+
+def _prune(cache, sources):
+    """Delete the outputs of cached sources that no longer exist; returns how many sources were dropped."""
+    gone = [source for source in list(cache.entries) if source not in sources]
+    for source in gone:
+        for path in cache.forget(source):
+            if os.path.exists(path):
+                os.remove(path)
+                logger.info("Removed %s: its source %s is gone", path, source)
+    return len(gone)
+
+def batch_generate(pattern, output_dir, formats=('html', 'md'), workers=None, store_path=None,
+                   title=None, model=None, force=False, prune=False, quiet=False):
+    """Render documentation for every matching JSON file across a process pool.
+
+    With store_path, renders the submissions in that store instead
+    (optionally filtered by title prefix and model). Only sources whose
+    content, format template or output file changed since the last run are
+    rendered (all of them with force), each to a stable OUTPUT_DIR/<name>.<format>.
+    prune deletes outputs whose JSON file (or stored submission) is gone.
+    quiet prints nothing when everything is up to date.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache = BuildCache(output_dir)
+    if store_path:
+        from submission_store import SubmissionStore
+
+        with SubmissionStore(store_path) as store:
+            if title or model:
+                items = [row["id"] for row in store.find(title, model, limit=-1)]
+            else:
+                items = store.ids()
+            revisions = store.revisions(items)
+            sources = {f"{store_path}#{form_id}": form_id for form_id in items}
+            todo = plan_builds(cache, ((form_id, source, str(revisions.get(form_id)), partial(store.get, form_id))
+                                       for source, form_id in sources.items()), formats, force)
+            if prune and not (title or model):
+                pruned = _prune(cache, sources)
+            else:
+                pruned = 0
+        render = partial(render_submission, store_path)
+        if not items and not quiet:
+            print(f"No matching submissions in {store_path}")
+    else:
+        items = find_json_files(pattern)
+        sources = {os.path.normpath(path): path for path in items}
+        todo = plan_builds(cache, ((path, source, file_stamp(path), partial(_read_json, path))
+                                   for source, path in sources.items()), formats, force)
+        pruned = _prune(cache, sources) if prune else 0
+        render = render_documents
+        if not items and not quiet:
+            print(f"No JSON files found for {pattern}")
+    if not todo:
+        cache.save()
+        if items and not quiet:
+            print(f"All {len(items)} files are up to date in {output_dir}")
+        elif pruned:
+            print(f"Removed the documentation of {pruned} deleted files")
+        return len(items), []
+
+    workers = workers or os.cpu_count() or 1
+    logger.info("Generating documentation for %s of %s files (%s up to date) with %s workers",
+                len(todo), len(items), len(items) - len(todo), workers)
+
+    failures = []
+    start = time.perf_counter()
+    executor = None
+    try:
+        if len(todo) < POOL_MIN_FILES or workers == 1:
+            # Not worth starting worker processes for a handful of files
+            results = ((render(item, output_dir, stale), {}) for item, _, _, _, stale in todo)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker)
+            chunksize = max(1, len(todo) // (workers * 4))
+            # Workers send back the stage timings of each file with its result
+            results = executor.map(partial(call_and_drain, render), [task[0] for task in todo],
+                                   [output_dir] * len(todo), [task[4] for task in todo],
+                                   chunksize=chunksize)
+        versions = {fmt: get_template(fmt).version for fmt in formats}
+        for (_, source, stamp, content_hash, stale), ((name, output_files, error), timings) in zip(todo, results):
+            merge(timings)
+            if content_hash is not None:
+                for fmt, output_file in zip(stale, output_files):
+                    cache.record(source, stamp, content_hash, fmt, versions[fmt], output_file)
+            if error:
+                failures.append((name, error))
+                logger.error("Failed to generate documentation for %s: %s", name, error)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        # Keep what was built even if the run was interrupted
+        cache.save()
+    elapsed = time.perf_counter() - start
+
+    rate = len(todo) / elapsed if elapsed > 0 else 0.0
+    print(f"\nGenerated documentation for {len(todo) - len(failures)} of {len(todo)} changed files "
+          f"in {elapsed:.2f}s ({rate:.1f} files/s), {len(items) - len(todo)} up to date, "
+          f"{len(failures)} failed")
+    for name, error in failures:
+        print(f"  {name}: {error}")
+    return len(items), failures
+
+def watch(pattern, output_dir, formats=('html', 'md'), workers=None, store_path=None, title=None,
+          model=None, interval=WATCH_INTERVAL):
+    """Rebuild the documentation of changed submissions every interval seconds until interrupted.
+
+    Each round only stats the files (or reads store revisions), so polling
+    a directory of thousands of submissions stays cheap; deleted sources
+    have their documentation removed.
+    """
+    batch_generate(pattern, output_dir, formats, workers, store_path, title, model, prune=True)
+    print(f"Watching {store_path or pattern} every {interval:g}s (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            batch_generate(pattern, output_dir, formats, workers, store_path, title, model,
+                           prune=True, quiet=True)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+def batch_main(argv):
+    """Entry point for `generate_docs.py --batch`."""
+    parser = argparse.ArgumentParser(
+        prog='generate_docs.py --batch',
+        description="Generate documentation for every JSON file in a directory or matching a glob."
+    )
+    parser.add_argument('pattern', nargs='?', help="directory or glob of response JSON files")
+    parser.add_argument('--store', help="render submissions from this SQLite store instead of JSON files")
+    parser.add_argument('--title', help="with --store, only titles starting with this")
+    parser.add_argument('--model', help="with --store, only submissions made with this model")
+    parser.add_argument('--out', default='docs', help="directory for the generated files")
+    parser.add_argument('--formats', default='html,md', help="comma-separated output formats")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="rebuild every document, even if up to date")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running, rebuilding documents whose source changes")
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL,
+                        help=f"seconds between checks in --watch mode (default {WATCH_INTERVAL:g})")
+    # Handled by the entry point for every mode; declared here so they show up in --help
+    parser.add_argument('--timings', metavar='FILE', help="write stage timings at exit (.prom for Prometheus, else JSON)")
+    parser.add_argument('--profile', metavar='FILE', nargs='?', const=PROFILE_FILE,
+                        help=f"run under cProfile and write the stats (default {PROFILE_FILE})")
+    args = parser.parse_args(argv)
+    if not args.pattern and not args.store:
+        parser.error("give a directory or glob of JSON files, or --store")
+
+    formats = tuple(f.strip() for f in args.formats.split(',') if f.strip())
+    unknown = [f for f in formats if f not in available_formats()]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+
+    if args.watch:
+        watch(args.pattern, args.out, formats, args.workers, args.store, args.title, args.model,
+              args.interval)
+        sys.exit(0)
+    _, failures = batch_generate(args.pattern, args.out, formats, args.workers,
+                                 store_path=args.store, title=args.title, model=args.model,
+                                 force=args.force)
+    sys.exit(1 if failures else 0)
+
 def print_info():
     """Print information about what the script does."""
     print("\nDocument Generator")
@@ -178,28 +407,54 @@ def print_info():
     print("\nWhat it does:")
     print("1. Lists available JSON files in current directory")
     print("2. Lets you select a JSON file to process")
-    print("3. Asks whether you want HTML or MD output")
+    print("3. Asks which output format you want (one per template in templates/)")
     print("4. Creates a well-structured document containing:")
     print("   - Project title")
     print("   - Generation timestamp")
     print("   - AI model used")
     print("   - All fields from your JSON organized into sections")
-    print("\nThe output file will be named using your project title and timestamp.")
+    print("\nThe output file is named after your project title, and is only rewritten")
+    print("when the JSON file or the layout template has changed.")
     print("\nPress Enter to continue or Ctrl+C to exit...")
     input()
 
-if __name__ == "__main__":
+def get_option(name, default=None):
+    """Return the value following a command line option, e.g. --store DB."""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv) and not sys.argv[idx + 1].startswith('--'):
+            return sys.argv[idx + 1]
+    return default
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1].lower() == '--batch':
+        batch_main(sys.argv[2:])
+
     print_info()
+
+    # Pick a submission from the SQLite store instead of a JSON file (--store [DB])
+    if '--store' in sys.argv:
+        from submission_store import DEFAULT_STORE_PATH, SubmissionStore, prompt_for_submission
+
+        with SubmissionStore(get_option('--store', DEFAULT_STORE_PATH)) as store:
+            form_id = prompt_for_submission(store)
+            if form_id is None:
+                exit(1)
+            generate_documentation(f"submission {form_id}", store.get(form_id))
+        exit(0)
     
-    # List JSON files in current directory
-    json_files = [f for f in os.listdir('.') if f.endswith('.json')]
+    # List the complete submissions in the current directory (from the stat-refreshed manifest)
+    from file_manifest import describe_entry, list_submissions
+
+    submissions = list_submissions('.', valid_only=True)
+    json_files = [name for name, _ in submissions]
     if not json_files:
-        print("No JSON files found in current directory")
+        print("No complete form submissions found in current directory")
         exit(1)
 
     print("\nAvailable JSON files:")
-    for i, file in enumerate(json_files, 1):
-        print(f"{i}. {file}")
+    for i, (name, entry) in enumerate(submissions, 1):
+        print(f"{i}. {describe_entry(name, entry)}")
 
     while True:
         try:
@@ -214,3 +469,9 @@ if __name__ == "__main__":
             print("Please enter a valid number.")
 
     generate_documentation(selected_file)
+
+if __name__ == "__main__":
+    # Console only, as before; configured here rather than on import
+    configure_logging(log_file=None)
+    profile_path = get_option('--profile', PROFILE_FILE) if '--profile' in sys.argv else None
+    run_instrumented(main, get_option('--timings'), profile_path)
@@ -0,0 +1,134 @@
+import copy
+
+class PatchError(ValueError):
+    """A patch does not apply to the document it was given."""
+
+def escape(key):
+    """Return key escaped as one JSON Pointer (RFC 6901) segment."""
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+def unescape(segment):
+    return segment.replace('~1', '/').replace('~0', '~')
+
+def pointer(*keys):
+    """Return the JSON Pointer of a path of keys, e.g. pointer('responses', 'Key Features', 2)."""
+    return ''.join(f"/{escape(key)}" for key in keys)
+
+def _same(a, b):
+    """Return True if two JSON values are equal with matching types at every level (1 is not True)."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return list(a) == list(b) and all(_same(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+def make_patch(old, new, path=''):
+    """Return the JSON Patch (RFC 6902 add/remove/replace ops) that turns old into new.
+
+    The patch only names what changed: an edited field is one replace of
+    that field's answer, an edited list item one replace of that item.
+    Applying it rebuilds new exactly, key order included; where a dict's
+    keys were reordered, the whole dict is replaced instead.
+    """
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": copy.deepcopy(new)}]
+    if isinstance(old, dict):
+        return _dict_patch(old, new, path)
+    if isinstance(old, list):
+        return _list_patch(old, new, path)
+    if old != new:
+        return [{"op": "replace", "path": path, "value": new}]
+    return []
+
+def _dict_patch(old, new, path):
+    kept = [key for key in old if key in new]
+    added = [key for key in new if key not in old]
+    # Added keys are appended, so the patch keeps new's key order only if they come last
+    if kept + added != list(new):
+        return [{"op": "replace", "path": path, "value": copy.deepcopy(new)}]
+    ops = [{"op": "remove", "path": f"{path}/{escape(key)}"} for key in old if key not in new]
+    for key in kept:
+        ops.extend(make_patch(old[key], new[key], f"{path}/{escape(key)}"))
+    ops.extend({"op": "add", "path": f"{path}/{escape(key)}", "value": copy.deepcopy(new[key])}
+               for key in added)
+    return ops
+
+def _list_patch(old, new, path):
+    # Trim the common prefix and suffix; only the items in between changed
+    start = 0
+    while start < len(old) and start < len(new) and _same(old[start], new[start]):
+        start += 1
+    old_end, new_end = len(old), len(new)
+    while old_end > start and new_end > start and _same(old[old_end - 1], new[new_end - 1]):
+        old_end -= 1
+        new_end -= 1
+    common = min(old_end, new_end) - start
+    ops = []
+    for offset in range(common):
+        ops.extend(make_patch(old[start + offset], new[start + offset], f"{path}/{start + offset}"))
+    # Remove from the back so earlier indexes stay valid
+    ops.extend({"op": "remove", "path": f"{path}/{index}"}
+               for index in range(old_end - 1, start + common - 1, -1))
+    ops.extend({"op": "add", "path": f"{path}/{index}", "value": copy.deepcopy(new[index])}
+               for index in range(start + common, new_end))
+    return ops
+
+def _resolve(document, path):
+    """Return (container, key) for the last segment of path."""
+    if not path.startswith('/'):
+        raise PatchError(f"invalid pointer {path!r}")
+    segments = [unescape(segment) for segment in path[1:].split('/')]
+    target = document
+    for segment in segments[:-1]:
+        target = _child(target, segment, path)
+    return target, segments[-1]
+
+def _child(target, segment, path):
+    try:
+        if isinstance(target, list):
+            return target[int(segment)]
+        return target[segment]
+    except (KeyError, IndexError, ValueError, TypeError):
+        raise PatchError(f"{path}: no such location") from None
+
+def apply_patch(document, patch):
+    """Apply a JSON Patch in place and return the document (a new one if the root is replaced)."""
+    for op in patch:
+        path = op["path"]
+        if path == '':
+            if op["op"] not in ("add", "replace"):
+                raise PatchError(f"cannot {op['op']} the whole document")
+            document = copy.deepcopy(op["value"])
+            continue
+        target, key = _resolve(document, path)
+        if isinstance(target, list):
+            index = len(target) if key == '-' else _index(key, path)
+            if op["op"] == "add" and 0 <= index <= len(target):
+                target.insert(index, copy.deepcopy(op["value"]))
+            elif op["op"] == "replace" and 0 <= index < len(target):
+                target[index] = copy.deepcopy(op["value"])
+            elif op["op"] == "remove" and 0 <= index < len(target):
+                del target[index]
+            else:
+                raise PatchError(f"{path}: cannot {op['op']} item {index} of {len(target)}")
+        elif isinstance(target, dict):
+            if op["op"] == "add":
+                target[key] = copy.deepcopy(op["value"])
+            elif op["op"] in ("replace", "remove") and key in target:
+                if op["op"] == "replace":
+                    target[key] = copy.deepcopy(op["value"])
+                else:
+                    del target[key]
+            else:
+                raise PatchError(f"{path}: cannot {op['op']} a missing key")
+        else:
+            raise PatchError(f"{path}: parent is not an object or array")
+    return document
+
+def _index(key, path):
+    try:
+        return int(key)
+    except ValueError:
+        raise PatchError(f"{path}: {key!r} is not an array index") from None
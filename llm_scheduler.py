@@ -0,0 +1,315 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Lower numbers run first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREFETCH = 10
+
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_DEADLINE = 60.0  # seconds from submission until a request is abandoned
+
+class SchedulerError(Exception):
+    """Base class for errors raised by the LLM scheduler."""
+
+class QueueFullError(SchedulerError):
+    """Raised when the request queue is full (backpressure)."""
+
+class CircuitOpenError(SchedulerError):
+    """Raised while the circuit breaker is open after repeated failures."""
+
+class DeadlineExceededError(SchedulerError):
+    """Raised when a request does not finish before its deadline."""
+
+class NonRetryableError(SchedulerError):
+    """Wraps a failure that must not be retried, e.g. after output was already streamed."""
+
+class CircuitBreaker:
+    """Stops sending requests after repeated failures, then lets one trial through after a pause."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.state = 'closed'
+
+    def allow(self):
+        """Return True if a request may be sent now."""
+        if self.state == 'open':
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+                logger.info("Circuit breaker half-open, sending a trial request")
+                return True
+            return False
+        return True
+
+    def record_success(self):
+        if self.state != 'closed':
+            logger.info("Circuit breaker closed")
+        self.failures = 0
+        self.state = 'closed'
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == 'half-open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                logger.warning("Circuit breaker open after %s failures", self.failures)
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+class _Job:
+    __slots__ = ('key', 'call', 'priority', 'deadline', 'session', 'future',
+                 'enqueued_at', 'started', 'waiters', 'task')
+
+    def __init__(self, key, call, priority, deadline, session, future):
+        self.key = key
+        self.call = call
+        self.priority = priority
+        self.deadline = deadline
+        self.session = session
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.started = False
+        # Requests waiting for the result; the job is abandoned when the last one leaves
+        self.waiters = 0
+        # The running call, while a worker has it
+        self.task = None
+
+class LLMScheduler:
+    """Runs model calls through a bounded priority queue with a fixed number of workers.
+
+    - Interactive requests (the field the user is on) run ahead of prefetches.
+    - Identical in-flight requests (same key) share one call.
+    - A request nobody waits for any more (all cancelled or past their
+      deadline) is dropped from the queue, or its running call cancelled,
+      so it does not hold a worker and the model.
+    - Every request has a deadline; failures are retried with exponential
+      backoff, and a circuit breaker stops calls while the model is failing.
+    - stats() exposes queue depth and wait times for sizing a deployment.
+    """
+
+    def __init__(self, workers=1, max_queue=DEFAULT_MAX_QUEUE, max_retries=2,
+                 backoff_base=0.5, backoff_max=8.0, default_deadline=DEFAULT_DEADLINE,
+                 breaker=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.default_deadline = default_deadline
+        self.breaker = breaker or CircuitBreaker()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._inflight = {}
+        self._queued = 0
+        self._running = 0
+        self._wakeup = None
+        self._tasks = []
+        self._wait_times = deque(maxlen=1000)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.max_queue_depth = 0
+
+    def _ensure_started(self):
+        if not self._tasks:
+            self._wakeup = asyncio.Condition()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Stop the workers; queued and running requests fail with CancelledError."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for _, _, job in self._heap:
+            if not job.future.done():
+                job.future.cancel()
+        self._heap = []
+        self._queued = 0
+
+    async def submit(self, key, call, priority=PRIORITY_PREFETCH, deadline=None, session=None):
+        """Queue a call (a zero-argument coroutine function) and return its result.
+
+        A request with the same key as one already queued or running shares its
+        result; a higher priority promotes the queued request.
+        """
+        self._ensure_started()
+        existing = self._inflight.get(key)
+        if existing is not None:
+            self.deduplicated += 1
+            if priority < existing.priority and not existing.started:
+                await self._push(existing, priority)
+            return await self._wait(existing)
+
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"LLM request queue is full ({self.max_queue} waiting)")
+
+        timeout = self.default_deadline if deadline is None else deadline
+        job = _Job(key, call, priority, time.monotonic() + timeout, session,
+                   asyncio.get_running_loop().create_future())
+        self._inflight[key] = job
+        job.future.add_done_callback(lambda _: self._forget(job))
+        self.submitted += 1
+        self._queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queued)
+        await self._push(job, priority)
+        return await self._wait(job)
+
+    async def promote(self, key, priority=PRIORITY_INTERACTIVE):
+        """Raise the priority of a queued request; returns True if it was found."""
+        job = self._inflight.get(key)
+        if job is None or job.started or priority >= job.priority:
+            return False
+        await self._push(job, priority)
+        return True
+
+    async def _push(self, job, priority):
+        # Re-pushing leaves a stale heap entry behind; workers skip entries already started
+        job.priority = priority
+        async with self._wakeup:
+            heapq.heappush(self._heap, (priority, next(self._sequence), job))
+            self._wakeup.notify()
+
+    async def _wait(self, job):
+        remaining = job.deadline - time.monotonic()
+        job.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), max(remaining, 0))
+        except asyncio.TimeoutError:
+            if not job.future.done():
+                job.future.set_exception(DeadlineExceededError(f"Deadline exceeded for {job.key[:12]}"))
+                # Retrieved here so an abandoned future does not log "exception never retrieved"
+                job.future.exception()
+            raise DeadlineExceededError("LLM request did not finish before its deadline")
+        finally:
+            job.waiters -= 1
+            if job.waiters == 0:
+                self._abandon(job)
+
+    def _abandon(self, job):
+        """Stop a job nobody is waiting for: drop it if still queued, cancel its call if running."""
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+        elif job.future.done():
+            return
+        self.abandoned += 1
+        if not job.future.done():
+            job.future.cancel()
+        logger.info("Abandoned LLM request %s with no one waiting for it", job.key[:12])
+
+    def _forget(self, job):
+        if self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        if not job.started:
+            self._queued -= 1
+            job.started = True
+
+    async def _worker(self):
+        while True:
+            async with self._wakeup:
+                await self._wakeup.wait_for(lambda: self._heap)
+                _, _, job = heapq.heappop(self._heap)
+            if job.started or job.future.done():
+                continue
+            job.started = True
+            self._queued -= 1
+            self._wait_times.append(time.monotonic() - job.enqueued_at)
+            self._running += 1
+            try:
+                await self._execute(job)
+            finally:
+                self._running -= 1
+
+    async def _execute(self, job):
+        for attempt in range(self.max_retries + 1):
+            remaining = job.deadline - time.monotonic()
+            if job.future.done():
+                return
+            if remaining <= 0:
+                self._fail(job, DeadlineExceededError("Deadline passed while queued"))
+                return
+            if not self.breaker.allow():
+                self._fail(job, CircuitOpenError("Model calls suspended after repeated failures"))
+                return
+            job.task = asyncio.ensure_future(job.call())
+            try:
+                done, _ = await asyncio.wait([job.task], timeout=remaining)
+            except asyncio.CancelledError:
+                # The scheduler is closing: stop the call and release whoever waits for it
+                job.task.cancel()
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            if not done:
+                job.task.cancel()
+                # Let the call clean up (close its stream) before the worker takes the next job
+                await asyncio.wait([job.task])
+                self.breaker.record_failure()
+                self._fail(job, DeadlineExceededError("LLM call exceeded its deadline"))
+                return
+            if job.task.cancelled():
+                # Abandoned by every waiter; the worker is free for the next job
+                if not job.future.done():
+                    job.future.cancel()
+                return
+            error = job.task.exception()
+            if error is None:
+                self.breaker.record_success()
+                self.completed += 1
+                if not job.future.done():
+                    job.future.set_result(job.task.result())
+                return
+            self.breaker.record_failure()
+            if isinstance(error, NonRetryableError):
+                self._fail(job, error.__cause__ or error)
+                return
+            if attempt >= self.max_retries:
+                self._fail(job, error)
+                return
+            self.retries += 1
+            backoff = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+            logger.warning("LLM call failed (%s), retrying in %.1fs", error, backoff)
+            await asyncio.sleep(min(backoff, max(job.deadline - time.monotonic(), 0)))
+
+    def _fail(self, job, error):
+        self.failed += 1
+        if not job.future.done():
+            job.future.set_exception(error)
+            # Waiters may all have given up already
+            job.future.exception()
+
+    def stats(self):
+        """Return queue depth, throughput counters and wait-time percentiles (seconds)."""
+        waits = sorted(self._wait_times)
+
+        def pct(p):
+            return waits[min(len(waits) - 1, int(p / 100.0 * len(waits)))] if waits else None
+
+        return {
+            "queue_depth": self._queued,
+            "max_queue_depth": self.max_queue_depth,
+            "running": self._running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "abandoned": self.abandoned,
+            "wait_p50": pct(50),
+            "wait_p95": pct(95),
+            "wait_max": waits[-1] if waits else None,
+            "breaker_state": self.breaker.state
+        }
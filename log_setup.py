@@ -0,0 +1,146 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import uuid
+from datetime import datetime, timezone
+
+DEFAULT_LOG_FILE = 'form_processor.log'
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024  # 5MB
+DEFAULT_BACKUP_COUNT = 3
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# The session a log record belongs to; set per form session (or per connection in a server)
+SESSION_ID = contextvars.ContextVar('log_session_id', default=None)
+
+_listener = None
+_queue_handler = None
+
+def new_session_id():
+    """Return a short random session id."""
+    return uuid.uuid4().hex[:12]
+
+def set_session(session_id):
+    """Tag log records from the current thread/task with session_id; returns a reset token."""
+    return SESSION_ID.set(session_id)
+
+class SessionFilter(logging.Filter):
+    """Stamps each record with the current session id, in the thread that logged it."""
+
+    def __init__(self, default_session=None):
+        super().__init__()
+        self.default_session = default_session
+
+    def filter(self, record):
+        record.session = SESSION_ID.get() or self.default_session
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "session": getattr(record, 'session', None),
+            "message": record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that leaves %-formatting of the message to the background writer.
+
+    The stock handler formats every record in the calling thread; here only
+    tracebacks are rendered up front (they reference live frames). Arguments
+    are expected to be plain values that do not change after the call.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def cleanup_old_logs(prefix='form_processor_', directory='.'):
+    """Delete leftover log files named prefix*, from older versions of the logging setup."""
+    for name in os.listdir(directory):
+        if name.startswith(prefix):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+def configure_logging(log_file=DEFAULT_LOG_FILE, level=logging.INFO, console_level=logging.INFO,
+                      session_id=None, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+    """Route all logging through a queue to a background thread; returns the session id.
+
+    Callers only enqueue records. The writer thread appends JSON lines to a
+    rotating log_file (None for no file) and human-readable lines to stderr
+    at console_level (None for no console). Calling it again replaces the
+    previous configuration.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+    session_id = session_id or new_session_id()
+
+    handlers = []
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                                            backupCount=backup_count)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console_level is not None:
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(console_level)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    _queue_handler.addFilter(SessionFilter(session_id))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return session_id
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+def configure_worker_logging(level=logging.WARNING):
+    """Plain stderr logging for worker processes, which do not inherit the writer thread."""
+    global _listener, _queue_handler
+    # A forked child has a copy of the queue handler but no thread draining it
+    _listener = None
+    _queue_handler = None
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from ollama_client import AsyncOllamaClient, OllamaError, default_base_url
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_CACHE_FILE = '.ollama_models.json'
+CATALOGUE_TTL = 300  # seconds before the cached model list is refreshed
+
+_refresh_lock = threading.Lock()
+
+def _read_cache(cache_path):
+    """Return the cached catalogue, or an empty dict if there is none."""
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def _write_cache(cache_path, cache):
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f, indent=4)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("Could not write model catalogue cache %s: %s", cache_path, e)
+
+async def _fetch(base_url):
+    async with AsyncOllamaClient(base_url, max_connections=1, timeout=10.0) as client:
+        return await client.tags()
+
+def refresh_models(base_url=None, cache_path=CATALOGUE_CACHE_FILE):
+    """Fetch the model list from /api/tags and store it in the cache; returns the list."""
+    base_url = base_url or default_base_url()
+    logger.info("Fetching available Ollama models")
+    models = asyncio.run(_fetch(base_url))
+    with _refresh_lock:
+        cache = _read_cache(cache_path)
+        cache[base_url] = {"models": models, "fetched_at": time.time()}
+        _write_cache(cache_path, cache)
+    logger.info("Cached %s Ollama models", len(models))
+    return models
+
+def _refresh_quietly(base_url, cache_path):
+    try:
+        refresh_models(base_url, cache_path)
+    except OllamaError as e:
+        logger.warning("Background model catalogue refresh failed: %s", e)
+
+def get_models(base_url=None, ttl=CATALOGUE_TTL, cache_path=CATALOGUE_CACHE_FILE):
+    """Return the available models, from the on-disk cache whenever possible.
+
+    A fresh cache is returned as-is. A stale one is returned immediately while
+    a background thread refreshes it. Only an empty cache blocks on /api/tags.
+    """
+    base_url = base_url or default_base_url()
+    entry = _read_cache(cache_path).get(base_url)
+    if entry is None:
+        return refresh_models(base_url, cache_path)
+
+    age = time.time() - entry.get("fetched_at", 0)
+    if age > ttl:
+        logger.info("Model catalogue is %.0fs old, refreshing in the background", age)
+        threading.Thread(target=_refresh_quietly, args=(base_url, cache_path), daemon=True).start()
+    else:
+        logger.info("Using cached model catalogue (%.0fs old)", age)
+    return entry.get("models", [])
@@ -0,0 +1,397 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; only this module needs it
+    np = None
+
+from ollama_client import AsyncOllamaClient, OllamaError
+from search_index import answer_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDINGS_DIR = '.embeddings'
+# Answers that describe the idea itself, rather than who built it or how
+EMBED_FIELDS = ("Concept Summary", "Key Features")
+DEFAULT_DIM = 256
+DEFAULT_THRESHOLD = 0.6
+# Texts embedded (and appended to the store) at a time, which bounds memory use
+EMBED_CHUNK = 4096
+OLLAMA_BATCH = 64
+# Size of each block of the similarity matrix held in memory at once
+BLOCK_BYTES = 64 << 20
+KEY_SIZE = hashlib.sha256().digest_size
+
+_WORD_RE = re.compile(r"\w+")
+# Odd 64-bit constant that combines the hashes of two words into the hash of the pair
+_PAIR_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15) if np is not None else None
+
+class DedupError(Exception):
+    """Raised when embeddings cannot be computed or stored."""
+
+def _require_numpy():
+    if np is None:
+        raise DedupError("near-duplicate detection needs numpy (pip install numpy)")
+
+def submission_text(document, fields=EMBED_FIELDS):
+    """Return the text of a submission that is embedded: its idea fields, one per paragraph."""
+    responses = document.get("responses", {})
+    parts = []
+    for field in fields:
+        entry = responses.get(field)
+        text = answer_text(entry.get("answer") if isinstance(entry, dict) else entry).strip()
+        if text:
+            parts.append(text)
+    return "\n\n".join(parts)
+
+def content_key(text):
+    """Return the cache key of a text's embedding."""
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+def normalize_rows(matrix):
+    """Scale each row to unit length (in place), so dot products are cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+class HashingVectorizer:
+    """Embed texts locally as signed, hashed counts of their words and word pairs.
+
+    Needs no model and no vocabulary: each word and adjacent word pair is
+    hashed to one of dim columns with a +/-1 sign, weighted 1 + log(count).
+    Rewording keeps most of the words, so paraphrases stay close, while
+    unrelated texts land near zero similarity.
+    """
+
+    def __init__(self, dim=DEFAULT_DIM):
+        _require_numpy()
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+        self._hashes = {}
+
+    def _hash(self, word):
+        value = self._hashes.get(word)
+        if value is None:
+            value = self._hashes[word] = int.from_bytes(
+                hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+        return value
+
+    def embed(self, texts):
+        """Return a float32 matrix with one unit-length row per text."""
+        hashes, lengths = [], []
+        for text in texts:
+            words = _WORD_RE.findall(text.lower())
+            hashes.extend([self._hash(word) for word in words])
+            lengths.append(len(words))
+        # Everything after hashing the words runs over the whole batch at once
+        words = np.array(hashes, dtype=np.uint64)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        same_text = rows[:-1] == rows[1:]
+        pairs = (words[:-1] * _PAIR_MULTIPLIER + words[1:])[same_text]
+        features = np.concatenate([words, pairs])
+        rows = np.concatenate([rows, rows[:-1][same_text]])
+        if features.size == 0:
+            # No text has a word (e.g. punctuation only): all-zero rows, similar to nothing
+            return np.zeros((len(texts), self.dim), np.float32)
+        # Count each distinct feature of each text
+        order = np.lexsort((features, rows))
+        features, rows = features[order], rows[order]
+        firsts = np.flatnonzero(np.concatenate([[True], (features[1:] != features[:-1]) | (rows[1:] != rows[:-1])]))
+        counts = np.diff(np.append(firsts, len(features)))
+        features, rows = features[firsts], rows[firsts]
+        weights = np.where(features >> np.uint64(63), 1.0, -1.0) * (1.0 + np.log(counts))
+        cells = rows * self.dim + (features % np.uint64(self.dim)).astype(np.int64)
+        flat = np.bincount(cells, weights=weights, minlength=len(texts) * self.dim)
+        return normalize_rows(flat.reshape(len(texts), self.dim).astype(np.float32))
+
+class OllamaEmbedder:
+    """Embed texts with an Ollama embedding model, in concurrent batches."""
+
+    def __init__(self, model, base_url=None, batch_size=OLLAMA_BATCH, concurrency=4):
+        _require_numpy()
+        self.model = model
+        self.base_url = base_url
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.name = "ollama-" + re.sub(r"[^\w.-]", "_", model)
+
+    def embed(self, texts):
+        """Return a float32 matrix with one unit-length row per text."""
+        return normalize_rows(np.asarray(asyncio.run(self._embed(list(texts))), dtype=np.float32))
+
+    async def _embed(self, texts):
+        async with AsyncOllamaClient(self.base_url, max_connections=self.concurrency) as client:
+            batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            results = await asyncio.gather(*(client.embed(self.model, batch) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+class EmbeddingStore:
+    """Embeddings cached on disk by the SHA-256 of the text they embed.
+
+    One store per embedder, in three files: NAME.f32 is the float32 matrix,
+    one row per text, read through a NumPy memmap; NAME.keys holds the
+    32-byte content hash of each row in the same order; NAME.json records
+    the dimension. Rows are only ever appended, the matrix before its keys,
+    so a run that dies part way loses at most the rows it had not finished.
+    """
+
+    def __init__(self, embedder, directory=DEFAULT_EMBEDDINGS_DIR):
+        _require_numpy()
+        self.embedder = embedder
+        self.directory = directory
+        base = os.path.join(directory, embedder.name)
+        self.matrix_path = f"{base}.f32"
+        self.keys_path = f"{base}.keys"
+        self.meta_path = f"{base}.json"
+        self.dim = None
+        self._rows = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.meta_path, 'r') as f:
+                self.dim = json.load(f)["dim"]
+            with open(self.keys_path, 'rb') as f:
+                keys = f.read()
+            matrix_rows = os.path.getsize(self.matrix_path) // (4 * self.dim)
+        except (OSError, ValueError, KeyError):
+            self.dim = None
+            return
+        rows = min(len(keys) // KEY_SIZE, matrix_rows)
+        self._rows = {keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(rows)}
+        if len(keys) != rows * KEY_SIZE or matrix_rows != rows:
+            # Drop a half-written append
+            os.truncate(self.keys_path, rows * KEY_SIZE)
+            os.truncate(self.matrix_path, rows * 4 * self.dim)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def matrix(self):
+        """Return every stored embedding as a read-only memmap."""
+        if not self._rows:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.matrix_path, dtype=np.float32, mode='r', shape=(len(self._rows), self.dim))
+
+    def _append(self, keys, vectors):
+        if self.dim is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.dim = vectors.shape[1]
+            for path in (self.matrix_path, self.keys_path):
+                open(path, 'wb').close()
+            with open(self.meta_path, 'w') as f:
+                json.dump({"embedder": self.embedder.name, "dim": self.dim}, f)
+        elif vectors.shape[1] != self.dim:
+            raise DedupError(f"{self.embedder.name} returned {vectors.shape[1]}-dimensional embeddings, "
+                             f"but {self.matrix_path} holds {self.dim}-dimensional ones")
+        with open(self.matrix_path, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.keys_path, 'ab') as f:
+            f.write(b"".join(keys))
+        for key in keys:
+            self._rows[key] = len(self._rows)
+
+    def embed(self, texts):
+        """Return the embeddings of texts as an in-memory matrix, embedding only uncached texts.
+
+        Returns (matrix, number of texts that had to be embedded).
+        """
+        keys = [content_key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._rows and key not in missing:
+                missing[key] = text
+        pending = list(missing.items())
+        for start in range(0, len(pending), EMBED_CHUNK):
+            chunk = pending[start:start + EMBED_CHUNK]
+            self._append([key for key, _ in chunk], self.embedder.embed([text for _, text in chunk]))
+            logger.info("Embedded %d of %d new texts", min(start + EMBED_CHUNK, len(pending)), len(pending))
+        rows = np.fromiter((self._rows[key] for key in keys), dtype=np.int64, count=len(keys))
+        return np.asarray(self.matrix()[rows]), len(pending)
+
+def _block_rows(n, block_bytes):
+    return max(1, block_bytes // (4 * max(n, 1)))
+
+def similar_pairs(matrix, threshold=DEFAULT_THRESHOLD, block_bytes=BLOCK_BYTES):
+    """Return (i, j, similarity) arrays of every pair i < j with cosine similarity >= threshold.
+
+    Rows must be unit length. The upper triangle of the similarity matrix is
+    computed one block of rows at a time, each a single matrix product of
+    about block_bytes, so memory stays bounded and no Python loop runs per pair.
+    Pairs come back most similar first.
+    """
+    n = len(matrix)
+    step = _block_rows(n, block_bytes)
+    found_i, found_j, found_s = [], [], []
+    for start in range(0, n, step):
+        end = min(start + step, n)
+        sims = matrix[start:end] @ matrix[start:].T
+        # Columns before the diagonal are pairs an earlier block already compared
+        sims[:, :end - start][np.tril_indices(end - start)] = -np.inf
+        # flatnonzero is several times faster than a 2-D nonzero on a mostly empty mask
+        rows, cols = np.divmod(np.flatnonzero(sims >= threshold), sims.shape[1])
+        found_i.append(rows + start)
+        found_j.append(cols + start)
+        found_s.append(sims[rows, cols])
+    if not found_i:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=np.float32)
+    i, j, s = np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_s)
+    order = np.argsort(-s, kind='stable')
+    return i[order], j[order], s[order]
+
+def top_k(matrix, k=5, block_bytes=BLOCK_BYTES):
+    """Return (indices, similarities), each n x k: every row's k most similar other rows, best first."""
+    n = len(matrix)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int64), np.zeros((n, 0), dtype=np.float32)
+    step = _block_rows(n, block_bytes)
+    indices = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, step):
+        end = min(start + step, n)
+        sims = matrix[start:end] @ matrix.T
+        local = np.arange(end - start)
+        sims[local, local + start] = -np.inf
+        best = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(sims, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        indices[start:end] = np.take_along_axis(best, order, axis=1)
+        scores[start:end] = np.take_along_axis(best_scores, order, axis=1)
+    return indices, scores
+
+def cluster_pairs(n, i, j):
+    """Group rows linked by a pair (single linkage); returns groups of 2 or more, largest first."""
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(i.tolist(), j.tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    groups = {}
+    for x in range(n):
+        groups.setdefault(find(x), []).append(x)
+    return sorted((group for group in groups.values() if len(group) > 1), key=lambda g: (-len(g), g[0]))
+
+def load_submissions(directories=(), store=None):
+    """Return [(source, document)] from directories of JSON submissions and a submission store."""
+    from file_manifest import list_submissions
+
+    submissions = []
+    for directory in directories:
+        for name, _ in list_submissions(directory):
+            source = os.path.normpath(os.path.join(directory, name))
+            try:
+                with open(source, 'r') as f:
+                    submissions.append((source, json.load(f)))
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning("Could not read %s: %s", source, e)
+    if store is not None:
+        for form_id in store.ids():
+            submissions.append((f"{store.db_path}#{form_id}", store.get(form_id)))
+    return submissions
+
+def find_near_duplicates(documents, embedder=None, threshold=DEFAULT_THRESHOLD,
+                         directory=DEFAULT_EMBEDDINGS_DIR):
+    """Group documents whose idea fields are near-duplicates.
+
+    Returns a list of groups, each a list of (document index, similarity to
+    the group's first document); documents with nothing to embed are skipped.
+    """
+    embedder = embedder or HashingVectorizer()
+    texts, positions = [], []
+    for position, document in enumerate(documents):
+        text = submission_text(document)
+        if text:
+            texts.append(text)
+            positions.append(position)
+    matrix, _ = EmbeddingStore(embedder, directory).embed(texts)
+    i, j, _ = similar_pairs(matrix, threshold)
+    groups = []
+    for group in cluster_pairs(len(texts), i, j):
+        similarity = matrix[group] @ matrix[group[0]]
+        groups.append([(positions[row], float(score)) for row, score in zip(group, similarity)])
+    return groups
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find submissions that describe the same idea.")
+    parser.add_argument('--dir', action='append', help="directory of submission JSON files "
+                                                      "(repeatable; default: current directory)")
+    parser.add_argument('--store', help="also compare the submissions in this SQLite store")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="cosine similarity at which two submissions count as duplicates")
+    parser.add_argument('--top-k', type=int, metavar='K',
+                        help="instead of grouping, list each submission's K most similar ones")
+    parser.add_argument('--embedder', choices=('hashing', 'ollama'), default='hashing')
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM, help="hashing embedding size")
+    parser.add_argument('--model', default='nomic-embed-text', help="Ollama embedding model")
+    parser.add_argument('--ollama-url', help="Ollama URL (default: OLLAMA_HOST or localhost)")
+    parser.add_argument('--cache', default=DEFAULT_EMBEDDINGS_DIR, help="embedding cache directory")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        _require_numpy()
+        from submission_store import SubmissionStore, document_title
+
+        start = time.perf_counter()
+        submissions = load_submissions(args.dir or ['.'])
+        if args.store:
+            with SubmissionStore(args.store) as store:
+                submissions += load_submissions(store=store)
+        submissions = [(source, document) for source, document in submissions if submission_text(document)]
+        loaded = time.perf_counter()
+
+        if args.embedder == 'ollama':
+            embedder = OllamaEmbedder(args.model, args.ollama_url)
+        else:
+            embedder = HashingVectorizer(args.dim)
+        matrix, embedded = EmbeddingStore(embedder, args.cache).embed(
+            [submission_text(document) for _, document in submissions])
+        ready = time.perf_counter()
+
+        def describe(row):
+            source, document = submissions[row]
+            return f"{source}  {document_title(document) or '(untitled)'}"
+
+        if args.top_k:
+            indices, scores = top_k(matrix, args.top_k)
+            for row in range(len(submissions)):
+                print(describe(row))
+                for other, score in zip(indices[row], scores[row]):
+                    print(f"  {score:6.3f}  {describe(other)}")
+            compared = time.perf_counter()
+        else:
+            i, j, _ = similar_pairs(matrix, args.threshold)
+            groups = cluster_pairs(len(submissions), i, j)
+            compared = time.perf_counter()
+            for number, group in enumerate(groups, 1):
+                print(f"Group {number} ({len(group)} submissions):")
+                for row, score in zip(group, matrix[group] @ matrix[group[0]]):
+                    print(f"  {score:6.3f}  {describe(row)}")
+            print(f"{len(groups)} groups of near-duplicates among {len(submissions)} submissions "
+                  f"(threshold {args.threshold})")
+        print(f"Loaded in {loaded - start:.2f}s, embedded {embedded} new texts in {ready - loaded:.2f}s, "
+              f"compared in {compared - ready:.2f}s")
+    except (DedupError, OllamaError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import aclosing
+
+from async_http import ConnectionPool, HTTPError, request, stream_lines
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OLLAMA_URL = 'http://localhost:11434'
+# How long Ollama keeps a model loaded after our last request
+DEFAULT_KEEP_ALIVE = '30m'
+
+class OllamaError(Exception):
+    """Raised when the Ollama API cannot be reached or returns an error."""
+
+def default_base_url():
+    """Return the Ollama URL, honouring the OLLAMA_HOST environment variable."""
+    host = os.environ.get('OLLAMA_HOST', '').strip()
+    if not host:
+        return DEFAULT_OLLAMA_URL
+    if '://' not in host:
+        host = f"http://{host}"
+    return host.rstrip('/')
+
+class AsyncOllamaClient:
+    """Asyncio client for the Ollama HTTP API over a pool of keep-alive connections."""
+
+    def __init__(self, base_url=None, max_connections=4, timeout=120.0):
+        self.base_url = base_url or default_base_url()
+        self.timeout = timeout
+        self.pool = ConnectionPool(self.base_url, max_connections=max_connections)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close all pooled connections."""
+        await self.pool.close()
+
+    async def _call(self, method, path, payload=None, timeout=None):
+        try:
+            status, body = await request(self.pool, method, path, payload,
+                                         timeout=timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise OllamaError(f"Timed out calling {path}")
+        except (ConnectionError, OSError) as e:
+            raise OllamaError(f"Could not connect to Ollama at {self.base_url}: {str(e)}")
+        if status != 200:
+            raise OllamaError(f"{path} failed: {HTTPError(status, body)}")
+        try:
+            return json.loads(body)
+        except json.JSONDecodeError as e:
+            raise OllamaError(f"Invalid JSON from {path}: {str(e)}")
+
+    async def version(self):
+        """Return the Ollama server version string."""
+        return (await self._call('GET', '/api/version')).get('version')
+
+    async def tags(self):
+        """Return the names of the models available on the server."""
+        data = await self._call('GET', '/api/tags')
+        return [model['name'] for model in data.get('models', [])]
+
+    async def generate(self, model, prompt, options=None, timeout=None, keep_alive=None,
+                       context=None):
+        """Run a non-streaming generation and return the final response object.
+
+        Passing the "context" of an earlier response continues that conversation.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        if context:
+            payload["context"] = context
+        logger.debug("Requesting generation from %s", model)
+        return await self._call('POST', '/api/generate', payload, timeout=timeout)
+
+    async def embed(self, model, inputs, timeout=None, keep_alive=None):
+        """Return the embedding vector of each text in inputs, in order."""
+        payload = {"model": model, "input": list(inputs)}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        data = await self._call('POST', '/api/embed', payload, timeout=timeout)
+        embeddings = data.get("embeddings")
+        if not isinstance(embeddings, list) or len(embeddings) != len(payload["input"]):
+            raise OllamaError(f"/api/embed returned {len(embeddings or [])} embeddings "
+                              f"for {len(payload['input'])} inputs")
+        return embeddings
+
+    async def warm_up(self, model, keep_alive=DEFAULT_KEEP_ALIVE, timeout=None):
+        """Load a model into memory without generating, and keep it loaded for keep_alive."""
+        start = time.perf_counter()
+        logger.info("Warming up model %s", model)
+        await self.generate(model, "", timeout=timeout, keep_alive=keep_alive)
+        elapsed = time.perf_counter() - start
+        logger.info("Model %s warm after %.2fs", model, elapsed)
+        return elapsed
+
+    async def generate_stream(self, model, prompt, options=None, read_timeout=None, keep_alive=None,
+                              context=None):
+        """Run a streaming generation, yielding each NDJSON chunk as it arrives.
+
+        Token chunks carry "response"; the last chunk has "done": true plus the
+        timing, token counts and the "context" to pass to a follow-up request.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        if context:
+            payload["context"] = context
+        logger.debug("Streaming generation from %s", model)
+        try:
+            async with aclosing(stream_lines(self.pool, 'POST', '/api/generate', payload,
+                                             read_timeout or self.timeout)) as lines:
+                async for line in lines:
+                    chunk = json.loads(line)
+                    if 'error' in chunk:
+                        raise OllamaError(f"Generation failed: {chunk['error']}")
+                    yield chunk
+        except HTTPError as e:
+            raise OllamaError(f"/api/generate failed: {str(e)}")
+        except asyncio.TimeoutError:
+            raise OllamaError("Timed out waiting for tokens from /api/generate")
+        except json.JSONDecodeError as e:
+            raise OllamaError(f"Invalid JSON in stream from /api/generate: {str(e)}")
+        except (ConnectionError, OSError) as e:
+            raise OllamaError(f"Could not connect to Ollama at {self.base_url}: {str(e)}")
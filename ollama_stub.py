@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from async_http import encode_chunk, encode_chunked_head, encode_response, read_request
+
+# Length of the stub's embedding vectors
+EMBEDDING_DIM = 64
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODELS = ('llama3.2:latest', 'llama2:latest')
+
+class OllamaStub:
+    """A local stand-in for the Ollama API (/api/version, /api/tags, /api/generate, /api/embed).
+
+    Generations echo the end of the prompt back as a canned suggestion, so
+    clients can be exercised without a real model. Timing is simulated:
+
+      latency                   fixed seconds before generation starts (+/- jitter)
+      prompt_tokens_per_second  prompt evaluation rate; 0 makes it free
+      tokens_per_second         generation rate; 0 emits every token at once
+      reply_tokens              number of tokens in each reply
+      max_parallel              generations run at once, like a single loaded model;
+                                extra requests queue
+      error_rate                fraction of generations answered with HTTP 500
+      load_time                 seconds the first request for each model spends loading it
+
+    A request carrying the "context" of an earlier response only pays prompt
+    evaluation for its new prompt, as the real server does with a cached context.
+    Embeddings are hashed bags of words, so texts sharing words get similar
+    vectors; they pay the latency once per request.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, models=DEFAULT_MODELS, latency=0.0,
+                 jitter=0.0, prompt_tokens_per_second=0.0, tokens_per_second=0.0,
+                 reply_tokens=16, max_parallel=0, error_rate=0.0, load_time=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.models = list(models)
+        self.latency = latency
+        self.jitter = jitter
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.max_parallel = max_parallel
+        self.error_rate = error_rate
+        self.load_time = load_time
+        self.loaded_models = set()
+        self._load_locks = {}
+        self.requests = 0
+        self.generations = 0
+        self.embeddings = 0
+        self.errors = 0
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._slots = None
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        """Start listening; port 0 picks a free port."""
+        if self.max_parallel:
+            self._slots = asyncio.Semaphore(self.max_parallel)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Ollama stub listening on %s", self.url)
+        return self
+
+    async def stop(self):
+        """Stop listening and close the server."""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def reply_text(self, prompt):
+        """Return the canned suggestion for a prompt."""
+        words = prompt.split() or ["nothing"]
+        reply = ["Suggested", "answer:"]
+        while len(reply) < self.reply_tokens:
+            reply.extend(words[-(self.reply_tokens - len(reply)):])
+        return " ".join(reply[:max(self.reply_tokens, 1)])
+
+    @staticmethod
+    def embedding(text):
+        """Return the stub's unit-length embedding of a text."""
+        vector = [0.0] * EMBEDDING_DIM
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode(), digest_size=4).digest()
+            vector[int.from_bytes(digest[:3], 'little') % EMBEDDING_DIM] += 1.0 if digest[3] & 1 else -1.0
+        norm = sum(value * value for value in vector) ** 0.5 or 1.0
+        return [value / norm for value in vector]
+
+    async def _handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                self.requests += 1
+                method, path, _, body = request
+                await self._dispatch(writer, method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, writer, method, path, body):
+        if method == 'GET' and path == '/api/version':
+            writer.write(encode_response(200, {"version": "0.0.0-stub"}))
+        elif method == 'GET' and path == '/api/tags':
+            writer.write(encode_response(200, {"models": [
+                {"name": name, "model": name, "size": 0} for name in self.models
+            ]}))
+        elif method == 'POST' and path == '/api/generate':
+            await self._generate(writer, body)
+        elif method == 'POST' and path == '/api/embed':
+            await self._embed(writer, body)
+        else:
+            writer.write(encode_response(404, {"error": f"unknown endpoint {method} {path}"}))
+        await writer.drain()
+
+    async def _generate(self, writer, body):
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError:
+            writer.write(encode_response(400, {"error": "invalid JSON"}))
+            return
+        model = payload.get('model')
+        if model not in self.models:
+            writer.write(encode_response(404, {"error": f"model '{model}' not found"}))
+            return
+
+        if self._slots is not None:
+            async with self._slots:
+                await self._run_generation(writer, payload)
+        else:
+            await self._run_generation(writer, payload)
+
+    async def _embed(self, writer, body):
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError:
+            writer.write(encode_response(400, {"error": "invalid JSON"}))
+            return
+        model = payload.get('model')
+        if model not in self.models:
+            writer.write(encode_response(404, {"error": f"model '{model}' not found"}))
+            return
+        inputs = payload.get('input', [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            writer.write(encode_response(500, {"error": "simulated model failure"}))
+            return
+        self.embeddings += len(inputs)
+        writer.write(encode_response(200, {"model": model,
+                                           "embeddings": [self.embedding(text) for text in inputs]}))
+
+    async def _run_generation(self, writer, payload):
+        self.generations += 1
+        start = time.perf_counter()
+        model = payload['model']
+        prompt = payload.get('prompt', '')
+        prompt_tokens = len(prompt.split())
+        context = payload.get('context') or []
+
+        load_duration = 0.0
+        if model not in self.loaded_models:
+            # Concurrent first requests wait for a single load
+            async with self._load_locks.setdefault(model, asyncio.Lock()):
+                if model not in self.loaded_models:
+                    if self.load_time:
+                        await asyncio.sleep(self.load_time)
+                    self.loaded_models.add(model)
+            load_duration = time.perf_counter() - start
+        if not prompt:
+            # An empty prompt only loads the model, as with the real API
+            writer.write(encode_response(200, {
+                "model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+                "response": "", "done": True, "load_duration": int(load_duration * 1e9)
+            }))
+            return
+        prompt_start = time.perf_counter()
+
+        delay = self.latency
+        if self.jitter:
+            delay = max(0.0, delay + self._random.uniform(-self.jitter, self.jitter))
+        if self.prompt_tokens_per_second:
+            delay += prompt_tokens / self.prompt_tokens_per_second
+        if delay:
+            await asyncio.sleep(delay)
+        prompt_done = time.perf_counter()
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            writer.write(encode_response(500, {"error": "simulated model failure"}))
+            return
+
+        tokens = [word + ' ' for word in self.reply_text(prompt).split()] if self.reply_tokens else []
+        token_delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        final = {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": "",
+            "done": True,
+            "context": list(context) + list(range(len(context), len(context) + prompt_tokens + len(tokens))),
+            "load_duration": int(load_duration * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int((prompt_done - prompt_start) * 1e9),
+            "eval_count": len(tokens)
+        }
+        if payload.get('stream', True):
+            writer.write(encode_chunked_head(200))
+            for token in tokens:
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+                chunk = {"model": model, "created_at": final["created_at"],
+                         "response": token, "done": False}
+                writer.write(encode_chunk(json.dumps(chunk) + '\n'))
+                await writer.drain()
+            final["eval_duration"] = int((time.perf_counter() - prompt_done) * 1e9)
+            final["total_duration"] = int((time.perf_counter() - start) * 1e9)
+            writer.write(encode_chunk(json.dumps(final) + '\n'))
+            writer.write(encode_chunk(b''))
+        else:
+            if token_delay:
+                await asyncio.sleep(token_delay * len(tokens))
+            final["response"] = "".join(tokens).strip()
+            final["eval_duration"] = int((time.perf_counter() - prompt_done) * 1e9)
+            final["total_duration"] = int((time.perf_counter() - start) * 1e9)
+            writer.write(encode_response(200, final))
+
+class StubServerThread:
+    """Run an OllamaStub on a background event loop, for synchronous callers.
+
+    with StubServerThread(latency=0.1) as stub:
+        client = AsyncOllamaClient(stub.url)
+    """
+
+    def __init__(self, **stub_options):
+        self.stub = OllamaStub(**stub_options)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    @property
+    def url(self):
+        return self.stub.url
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.stub.start(), self.loop).result()
+        return self.stub
+
+    def __exit__(self, *exc_info):
+        asyncio.run_coroutine_threadsafe(self.stub.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+async def _serve(args):
+    stub = OllamaStub(args.host, args.port, args.models, latency=args.latency,
+                      jitter=args.jitter, prompt_tokens_per_second=args.prompt_tps,
+                      tokens_per_second=args.tps, reply_tokens=args.reply_tokens,
+                      max_parallel=args.max_parallel, error_rate=args.error_rate,
+                      load_time=args.load_time)
+    await stub.start()
+    print(f"Ollama stub serving {', '.join(stub.models)} on {stub.url} (Ctrl+C to stop)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Ollama API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--models', nargs='+', default=list(DEFAULT_MODELS))
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every generation")
+    parser.add_argument('--jitter', type=float, default=0.0, help="random +/- seconds added to the latency")
+    parser.add_argument('--prompt-tps', type=float, default=0.0, help="prompt evaluation tokens per second")
+    parser.add_argument('--tps', type=float, default=0.0, help="generated tokens per second")
+    parser.add_argument('--reply-tokens', type=int, default=16, help="tokens in each reply")
+    parser.add_argument('--max-parallel', type=int, default=0, help="generations served at once (0 = unlimited)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of generations that fail")
+    parser.add_argument('--load-time', type=float, default=0.0, help="seconds to load each model on first use")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        print("\nStub stopped")
+
+if __name__ == "__main__":
+    main()
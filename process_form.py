@@ -1,89 +1,96 @@
 import json
+import io
 import re
 import sys
 import os
+import time
 import logging
-import logging.handlers
-import traceback
 from datetime import datetime
 
-# Configure logging with rotation and cleanup
-log_file = 'form_processor.log'
-max_bytes = 5 * 1024 * 1024  # 5MB
-backup_count = 3  # Keep 3 backup files
+# Kept light so that --help, batch mode and library use start fast; the
+# process pool, schema validator and logging pipeline are imported where used
+from form_session import (LIST_FIELDS, NO_MODEL, FormSession, new_document, normalize_answer,
+                          unfinished_sessions)
+# Re-exported: format_title_answer was defined here before form_session.py
+from form_session import format_title_answer  # noqa: F401
+from stage_timing import run_instrumented, timed
+
+LOG_FILE = 'form_processor.log'
+PROFILE_FILE = 'process_form.prof'
+# The sample response shipped with the project; --edit never overwrites it
+SAMPLE_FILE = 'day1form.json'
 
-# Clean up old log files
-for old_log in [f for f in os.listdir('.') if f.startswith('form_processor_')]:
-    try:
-        os.remove(old_log)
-    except OSError:
-        pass
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.handlers.RotatingFileHandler(
-            log_file,
-            maxBytes=max_bytes,
-            backupCount=backup_count
-        ),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
-logger.info(f"Log file created at: {log_file}")
 
+def setup_logging(log_file=LOG_FILE):
+    """Configure logging for a run; called by the entry point, never on import."""
+    from log_setup import cleanup_old_logs, configure_logging
+
+    cleanup_old_logs('form_processor_')
+    session_id = configure_logging(log_file)
+    logger.info("Log file created at: %s (session %s)", log_file, session_id)
+    return session_id
+
+@timed("load_json")
 def load_json(file_path):
     """Load and return contents of a JSON file."""
-    logger.info(f"Attempting to load JSON file: {file_path}")
+    logger.info("Attempting to load JSON file: %s", file_path)
     try:
         with open(file_path, 'r') as file:
             data = json.load(file)
-            logger.debug(f"Successfully loaded JSON from {file_path}")
+            logger.debug("Successfully loaded JSON from %s", file_path)
             return data
     except FileNotFoundError:
-        logger.error(f"File not found: {file_path}")
+        logger.error("File not found: %s", file_path)
         return None
     except json.JSONDecodeError as e:
-        logger.error(f"Error decoding JSON from {file_path}: {str(e)}")
+        logger.error("Error decoding JSON from %s: %s", file_path, e)
         return None
     except Exception as e:
-        logger.error(f"Error reading file {file_path}: {str(e)}")
-        logger.error(f"Stack trace: {traceback.format_exc()}")
+        logger.error("Error reading file %s: %s", file_path, e, exc_info=True)
         return None
 
 def prompt_for_json_file():
-    """Prompt user to select a JSON file from local directory."""
+    """Prompt user to select a saved form from the JSON files in the local directory."""
+    from file_manifest import describe_entry, list_submissions
+
     logger.info("Prompting user for JSON file selection")
     print("\nAvailable JSON files in current directory:")
-    json_files = [f for f in os.listdir('.') if f.endswith('.json')]
+    # Only form submissions are listed; the manifest knows which files those are without parsing them
+    submissions = list_submissions('.')
+    json_files = [name for name, _ in submissions]
     
     if not json_files:
         logger.warning("No JSON files found in current directory")
         print("No JSON files found in current directory")
-        return 'day1form.json'  # default
+        return SAMPLE_FILE  # default
     
-    for i, file in enumerate(json_files, 1):
-        print(f"{i}. {file}")
+    for i, (name, entry) in enumerate(submissions, 1):
+        print(f"{i}. {describe_entry(name, entry)}")
     
     while True:
         try:
-            choice = input("\nSelect a file number (or press Enter for default 'day1form.json'): ").strip()
+            choice = input(f"\nSelect a file number (or press Enter for default '{SAMPLE_FILE}'): ").strip()
             if not choice:
-                logger.info("User selected default file (day1form.json)")
-                return 'day1form.json'
+                logger.info("User selected default file (%s)", SAMPLE_FILE)
+                return SAMPLE_FILE
             
             choice_idx = int(choice) - 1
             if 0 <= choice_idx < len(json_files):
                 selected_file = json_files[choice_idx]
-                logger.info(f"User selected file: {selected_file}")
+                logger.info("User selected file: %s", selected_file)
                 return selected_file
             else:
                 print("Invalid selection. Please try again.")
         except ValueError:
             print("Please enter a valid number.")
 
+def is_sample_file(path):
+    """Return True if path is the bundled sample response (in this directory or next to this script)."""
+    path = os.path.abspath(path)
+    return path in (os.path.abspath(SAMPLE_FILE),
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)), SAMPLE_FILE))
+
 def prompt_for_save_location(user_input="form"):
     """Prompt user for where to save the JSON file."""
     logger.info("Prompting user for save location")
@@ -93,7 +100,7 @@ def prompt_for_save_location(user_input="form"):
             # Generate default filename with user input and datestamp
             datestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"{user_input}_{datestamp}.json"
-            logger.info(f"Using default filename format: {filename}")
+            logger.info("Using default filename format: %s", filename)
         
         if not filename.endswith('.json'):
             filename += '.json'
@@ -103,108 +110,160 @@ def prompt_for_save_location(user_input="form"):
             if overwrite != 'y':
                 continue
         
-        logger.info(f"User selected save location: {filename}")
+        logger.info("User selected save location: %s", filename)
         return filename
 
-def save_progress(results, prompt_save=False, exit_save=False):
-    """Save current progress to JSON file."""
+def check_schema(results, name, show=False):
+    """Log (and optionally print) where a document does not match schema.json; returns the errors."""
+    from form_schema import validate_document
+
+    errors = validate_document(results)
+    for error in errors:
+        logger.warning("%s does not match schema.json: %s", name, error)
+    if show:
+        print_schema_errors(name, errors)
+    return errors
+
+def print_schema_errors(name, errors):
+    """Tell the user where a document does not match schema.json yet."""
+    if errors:
+        print(f"\nNote: {name} does not match schema.json yet:")
+        for error in errors:
+            print(f"  {error}")
+
+def save_progress(session, prompt_save=False, exit_save=False):
+    """Save current progress.
+
+    A plain SAVE only forces the session journal to disk; the final save
+    (prompt_save/exit_save) writes the document to a JSON file, or into the
+    submission store when the session has one. Returns True, or the form id
+    when saved to a store.
+    """
     logger.info("Saving current progress")
     try:
+        if not (prompt_save or exit_save):
+            session.checkpoint()
+            print("\nProgress saved")
+            return True
+
+        # Incomplete forms are still saved; the user is told what is missing
+        if prompt_save:
+            print_schema_errors("The saved form", session.errors())
+        if session.store is not None:
+            form_id = session.save()
+            print(f"\nProgress saved as submission {form_id} in {session.store.db_path}")
+            return form_id
+
         # Get user input for filename prefix
-        if prompt_save or exit_save:
-            user_input = input("\nEnter a name for your file: ").strip()
-            if not user_input:
-                user_input = "form"
-        else:
-            user_input = "form"
-            
+        user_input = input("\nEnter a name for your file: ").strip() or "form"
         # Generate filename with datestamp
         datestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{user_input}_{datestamp}.json"
-        
-        with open(filename, 'w') as f:
-            json.dump(results, f, indent=4)
-        logger.info(f"Successfully saved results to {filename}")
+        filename = session.save(f"{user_input}_{datestamp}.json")
         print(f"\nProgress saved to {filename}")
         return True
     except Exception as e:
-        logger.error(f"Error saving progress: {str(e)}")
-        logger.error(f"Stack trace: {traceback.format_exc()}")
+        logger.error("Error saving progress: %s", e, exc_info=True)
         print("\nError saving progress!")
         return False
 
+@timed("read_markdown_file")
 def read_markdown_file(file_path):
     """Read and return contents of markdown file."""
-    logger.info(f"Attempting to read markdown file: {file_path}")
+    logger.info("Attempting to read markdown file: %s", file_path)
     try:
         with open(file_path, 'r') as file:
             content = file.read()
-            logger.debug(f"Successfully read {len(content)} characters from {file_path}")
+            logger.debug("Successfully read %s characters from %s", len(content), file_path)
             return content
     except FileNotFoundError:
-        logger.error(f"File not found: {file_path}")
+        logger.error("File not found: %s", file_path)
         raise
     except Exception as e:
-        logger.error(f"Error reading file {file_path}: {str(e)}")
-        logger.error(f"Stack trace: {traceback.format_exc()}")
+        logger.error("Error reading file %s: %s", file_path, e, exc_info=True)
         raise
 
+# A single pattern classifying every structural line of a form:
+# "Field:" headers, "1." / "1. Feature" items, underscore rules and "(hint)" lines
+_FORM_LINE_RE = re.compile(
+    r'^(?:(?P<header>.*):'
+    r'|\s*(?P<item>\d+)\.(?:\s+(?P<item_text>.*?))?\s*'
+    r'|\s*(?P<rule>_+)\s*'
+    r'|\s*(?P<hint>\(.*\))\s*)$'
+)
+
+def iter_markdown_lines(file_path):
+    """Yield lines of a markdown file one at a time without loading the whole file."""
+    logger.info("Streaming markdown file: %s", file_path)
+    try:
+        with open(file_path, 'r') as file:
+            for line in file:
+                yield line
+    except FileNotFoundError:
+        logger.error("File not found: %s", file_path)
+        raise
+
+def iter_form_fields(lines):
+    """Parse form lines in a single pass, yielding a (field, value) pair as each field ends.
+
+    Scalar values are joined from a list of their lines; list fields such as
+    Key Features yield the list of item texts.
+    """
+    current_field = None
+    parts = []
+    for line in lines:
+        stripped = line.strip()
+        # Skip empty lines
+        if not stripped:
+            continue
+
+        match = _FORM_LINE_RE.match(line.rstrip('\r\n'))
+        if match is None:
+            # Plain content belongs to the current free-text field
+            if current_field and current_field not in LIST_FIELDS:
+                parts.append(stripped)
+        elif match.group('header') is not None:
+            if current_field is not None:
+                yield current_field, parts if current_field in LIST_FIELDS else " ".join(parts)
+            current_field = match.group('header').strip()
+            parts = []
+            logger.debug("Found new field: %s", current_field)
+        elif match.group('item') is not None:
+            item_text = match.group('item_text')
+            if current_field in LIST_FIELDS:
+                if item_text:
+                    parts.append(item_text)
+            elif item_text and current_field:
+                # A numbered line inside a free-text answer is just content
+                parts.append(stripped)
+        # Underscore rules and parenthesised hints carry no content
+
+    if current_field is not None:
+        yield current_field, parts if current_field in LIST_FIELDS else " ".join(parts)
+
+@timed("extract_fields")
 def extract_fields(content):
-    """Extract fields from markdown content."""
+    """Extract fields from markdown content (a string or an iterable of lines)."""
     logger.info("Starting field extraction from markdown content")
     try:
-        # Split content into lines
-        lines = content.split('\n')
-        logger.debug(f"Split content into {len(lines)} lines")
-        
-        fields = {}
-        current_field = None
-        key_features = []
-        
-        for line in lines:
-            # Skip empty lines
-            if not line.strip():
-                continue
-                
-            # If line ends with colon, it's a field name
-            if line.endswith(':'):
-                current_field = line[:-1].strip()
-                fields[current_field] = [] if current_field == "Key Features" else ""
-                logger.debug(f"Found new field: {current_field}")
-            # If line starts with number and dot (like "1."), it's part of Key Features
-            elif re.match(r'^\d+\.$', line.strip()):
-                if current_field == "Key Features":
-                    feature = line.strip()[line.strip().find('.')+1:].strip()
-                    if feature:
-                        fields[current_field].append(feature)
-                        logger.debug(f"Added feature: {feature}")
-            # If line is just underscores, skip it
-            elif all(c == '_' for c in line.strip()):
-                continue
-            # If in parentheses, it's a description - skip it
-            elif line.strip().startswith('(') and line.strip().endswith(')'):
-                continue
-            # Otherwise, if we have a current field, add content
-            elif current_field and line.strip():
-                if current_field != "Key Features":
-                    if fields[current_field]:
-                        fields[current_field] += " " + line.strip()
-                    else:
-                        fields[current_field] = line.strip()
-                    logger.debug(f"Added content to {current_field}")
-        
-        logger.info(f"Successfully extracted {len(fields)} fields")
+        lines = io.StringIO(content) if isinstance(content, str) else content
+        fields = dict(iter_form_fields(lines))
+        logger.info("Successfully extracted %s fields", len(fields))
         return fields
-        
+
     except Exception as e:
-        logger.error(f"Error extracting fields: {str(e)}")
-        logger.error(f"Stack trace: {traceback.format_exc()}")
+        logger.error("Error extracting fields: %s", e, exc_info=True)
         raise
 
+def extract_fields_from_file(file_path):
+    """Extract fields from a markdown file, streaming it line by line."""
+    return extract_fields(iter_markdown_lines(file_path))
+
+@timed("generate_questions")
 def generate_questions(fields):
     """Generate questions from field names."""
     logger.info("Generating questions from fields")
-    logger.debug(f"Processing fields: {list(fields.keys())}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Processing fields: %s", list(fields))
     questions = {}
     for field in fields:
         if field == "Project Title":
@@ -227,6 +286,85 @@ def generate_questions(fields):
             questions[field] = "Do you have any additional information to add?"
     return questions
 
+# Parsed templates, keyed by absolute path; the on-disk copy lives next to each template
+TEMPLATE_CACHE_FILE = '.template_cache.json'
+# Bump when extract_fields/generate_questions change so stale disk entries are ignored
+TEMPLATE_PARSER_VERSION = 1
+_template_cache = {}
+
+def _load_template_disk_cache(cache_path):
+    """Return the on-disk template cache, or an empty dict if it is missing or unreadable."""
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def _save_template_disk_cache(cache_path, cache):
+    """Atomically write the on-disk template cache."""
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f, indent=4)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("Could not write template cache %s: %s", cache_path, e)
+
+@timed("load_form_template")
+def load_form_template(file_path='day1form.md'):
+    """Return the parsed form template (fields, kinds, questions), re-parsing only when it changes.
+
+    Entries are cached in memory and on disk, keyed by path and validated by
+    mtime/size first and by content hash when the file has been touched.
+    """
+    key = os.path.abspath(file_path)
+    stat = os.stat(key)
+
+    cached = _template_cache.get(key)
+    if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+        logger.debug("Using in-memory template cache for %s", file_path)
+        return cached
+
+    cache_path = os.path.join(os.path.dirname(key), TEMPLATE_CACHE_FILE)
+    disk_cache = _load_template_disk_cache(cache_path)
+    entry = disk_cache.get(key)
+    if entry and entry.get("version") != TEMPLATE_PARSER_VERSION:
+        entry = None
+
+    if entry and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+        logger.info("Loaded parsed template for %s from %s", file_path, cache_path)
+        _template_cache[key] = entry
+        return entry
+
+    # The file was touched: only re-parse if its content actually changed
+    import hashlib
+
+    with open(key, 'rb') as file:
+        raw = file.read()
+    sha256 = hashlib.sha256(raw).hexdigest()
+    if entry and entry.get("sha256") == sha256:
+        logger.info("Template %s touched but unchanged, reusing cached parse", file_path)
+    else:
+        logger.info("Parsing template %s", file_path)
+        fields = extract_fields(raw.decode('utf-8'))
+        entry = {
+            "version": TEMPLATE_PARSER_VERSION,
+            "sha256": sha256,
+            "fields": fields,
+            "kinds": {field: "list" if isinstance(value, list) else "scalar"
+                      for field, value in fields.items()},
+            "questions": generate_questions(fields)
+        }
+
+    entry["mtime_ns"] = stat.st_mtime_ns
+    entry["size"] = stat.st_size
+    disk_cache[key] = entry
+    _save_template_disk_cache(cache_path, disk_cache)
+
+    _template_cache[key] = entry
+    return entry
+
 def print_instructions():
     """Print usage instructions."""
     print("\nForm Processing Instructions:")
@@ -239,15 +377,15 @@ def print_instructions():
     print("│ RETURN - Accept the previous answer        │")
     print("└─────────────────────────────────────────────┘\n")
 
-def edit_answer(results):
-    """Allow user to edit a specific answer."""
+def edit_answer(session):
+    """Allow user to edit a specific answer; returns the edited field, or None if cancelled."""
     logger.info("Starting answer editing process")
     
     # Display available fields
     print("\nAvailable fields to edit:")
-    fields = list(results["responses"].keys())
+    fields = list(session.responses)
     for i, field in enumerate(fields, 1):
-        current_answer = results["responses"][field]["answer"]
+        current_answer = session.responses[field]["answer"]
         if isinstance(current_answer, list):
             print(f"{i}. {field}:")
             for item in current_answer:
@@ -260,7 +398,7 @@ def edit_answer(results):
         try:
             choice = input("\nEnter the number of the field to edit (or 0 to cancel): ").strip()
             if choice == '0':
-                return
+                return None
             
             choice_idx = int(choice) - 1
             if 0 <= choice_idx < len(fields):
@@ -272,186 +410,544 @@ def edit_answer(results):
             print("Please enter a valid number.")
     
     # Edit the selected field
-    current_data = results["responses"][field_to_edit]
+    current_answer = session.responses[field_to_edit]["answer"]
     print(f"\nCurrent answer for '{field_to_edit}':")
-    if isinstance(current_data["answer"], list):
-        for i, item in enumerate(current_data["answer"], 1):
-            print(f"{i}. {item}")
-        
-        # Handle Key Features editing
-        print("\nOptions:")
-        print("1. Add new feature")
-        print("2. Edit existing feature")
-        print("3. Delete feature")
-        edit_choice = input("Enter your choice (1-3): ").strip()
-        
-        if edit_choice == '1':
-            feature = input("Enter new feature: ").strip()
-            current_data["answer"].append(feature)
-        
-        elif edit_choice == '2':
-            idx = int(input("Enter feature number to edit: ").strip()) - 1
-            if 0 <= idx < len(current_data["answer"]):
-                new_feature = input("Enter new feature: ").strip()
-                current_data["answer"][idx] = new_feature
-        
-        elif edit_choice == '3':
-            idx = int(input("Enter feature number to delete: ").strip()) - 1
-            if 0 <= idx < len(current_data["answer"]):
-                del current_data["answer"][idx]
-    
-    else:
-        print(current_data["answer"])
-        new_answer = input("\nEnter new answer: ").strip()
-        current_data["answer"] = new_answer
-    
+    try:
+        if isinstance(current_answer, list):
+            for i, item in enumerate(current_answer, 1):
+                print(f"{i}. {item}")
+
+            # Handle Key Features editing
+            print("\nOptions:")
+            print("1. Add new feature")
+            print("2. Edit existing feature")
+            print("3. Delete feature")
+            edit_choice = input("Enter your choice (1-3): ").strip()
+
+            if edit_choice == '1':
+                session.add_item(field_to_edit, input("Enter new feature: ").strip())
+            elif edit_choice == '2':
+                idx = int(input("Enter feature number to edit: ").strip()) - 1
+                if 0 <= idx < len(current_answer):
+                    session.replace_item(field_to_edit, idx, input("Enter new feature: ").strip())
+            elif edit_choice == '3':
+                idx = int(input("Enter feature number to delete: ").strip()) - 1
+                if 0 <= idx < len(current_answer):
+                    session.delete_item(field_to_edit, idx)
+        else:
+            print(current_answer)
+            session.edit(field_to_edit, input("\nEnter new answer: ").strip())
+    except ValueError:
+        print("Please enter a valid number.")
+        return None
+
     # Save changes
-    save_progress(results)
+    save_progress(session)
     print(f"\nSuccessfully updated {field_to_edit}")
+    return field_to_edit
+
+# Keys that hold a filled-in markdown form inside a JSONL record
+MARKDOWN_KEYS = ('content', 'markdown', 'body')
+# Keys used to name the output file of a batch record
+ID_KEYS = ('id', 'request_id', 'submission_id')
+
+# Per-worker state for batch mode, set once by _init_batch_worker
+_batch_state = {}
+
+def build_results(answers, questions, model=None):
+    """Build a results document from raw answers, matching the layout an interactive session saves."""
+    results = new_document()
+    results["metadata"]["model"] = model or NO_MODEL
+    for field, question in questions.items():
+        results["responses"][field] = {
+            "question": question,
+            "answer": normalize_answer(field, answers.get(field))
+        }
+    return results
+
+def parse_submission(raw):
+    """Turn one raw submission (markdown text or JSON object) into a field -> answer dict."""
+    if isinstance(raw, str):
+        return extract_fields(raw)
+    if "responses" in raw and isinstance(raw["responses"], dict):
+        # Already in the saved form layout
+        return {field: entry.get("answer") if isinstance(entry, dict) else entry
+                for field, entry in raw["responses"].items()}
+    for key in MARKDOWN_KEYS:
+        if isinstance(raw.get(key), str):
+            return extract_fields(raw[key])
+    return raw
+
+def _init_batch_worker(questions, output_dir, model):
+    """Initialise a batch worker process with the parsed template."""
+    from log_setup import configure_worker_logging
+    from stage_timing import reset as reset_timings
+
+    # Workers only report problems; per-form INFO lines would swamp the log
+    configure_worker_logging(logging.WARNING)
+    reset_timings()
+    _batch_state["questions"] = questions
+    _batch_state["output_dir"] = output_dir
+    _batch_state["model"] = model
+
+def _safe_name(name):
+    """Return a filesystem-safe version of a submission id."""
+    return "".join(c if c.isalnum() or c in '-_.' else "_" for c in str(name))
+
+def _process_batch_chunk(chunk):
+    """Process a chunk of (source_id, kind, payload) items and write one JSON file per form."""
+    from form_schema import validate_document
+
+    questions = _batch_state["questions"]
+    output_dir = _batch_state["output_dir"]
+    model = _batch_state["model"]
+    outcomes = []
+    for source_id, kind, payload in chunk:
+        try:
+            if kind == 'line':
+                raw = json.loads(payload)
+                for key in ID_KEYS:
+                    if key in raw:
+                        source_id = raw[key]
+                        break
+            elif payload.endswith('.json'):
+                with open(payload, 'r') as file:
+                    raw = json.load(file)
+            else:
+                raw = extract_fields_from_file(payload)
+            answers = parse_submission(raw)
+            if not isinstance(answers, dict) or not any(field in answers for field in questions):
+                raise ValueError("no field of the form template found in the submission")
+            results = build_results(answers, questions, model)
+            errors = validate_document(results)
+            if errors:
+                raise ValueError(f"does not match schema.json: {'; '.join(errors)}")
+            output_file = os.path.join(output_dir, f"{_safe_name(source_id)}.json")
+            with open(output_file, 'w') as f:
+                json.dump(results, f, indent=4)
+            outcomes.append((source_id, None))
+        except Exception as e:
+            outcomes.append((source_id, str(e)))
+    return outcomes
+
+def iter_batch_items(source):
+    """Yield (source_id, kind, payload) items from a directory of forms or a JSONL file."""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(('.md', '.json')):
+                yield os.path.splitext(name)[0], 'file', os.path.join(source, name)
+    else:
+        stream = sys.stdin if source == '-' else open(source, 'r')
+        try:
+            for line_number, line in enumerate(stream, 1):
+                if line.strip():
+                    yield f"line_{line_number}", 'line', line
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+def _chunked(items, size):
+    """Group an iterable into lists of at most size items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
-def format_title_answer(answer):
-    """Format the title answer with 'Project Title: ' prefix if not present."""
-    if not answer.startswith("Project Title:"):
-        return f"Project Title: {answer}"
-    return answer
+def batch_process(source, output_dir, template='day1form.md', workers=None,
+                  chunk_size=64, model=None):
+    """Fill forms non-interactively from a directory or JSONL stream using a process pool."""
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    from stage_timing import call_and_drain, merge
+
+    logger.info("Starting batch processing of %s into %s", source, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    questions = load_form_template(template)["questions"]
+    workers = workers or os.cpu_count() or 1
+
+    processed = 0
+    failures = []
+    start = time.perf_counter()
+    last_report = start
+
+    def collect(done):
+        nonlocal processed
+        for future in done:
+            outcomes, timings = future.result()
+            merge(timings)
+            for source_id, error in outcomes:
+                processed += 1
+                if error:
+                    failures.append((source_id, error))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(questions, output_dir, model)) as executor:
+        pending = set()
+        # Keep a bounded number of chunks in flight so huge streams are never fully buffered
+        for chunk in _chunked(iter_batch_items(source), chunk_size):
+            if len(pending) >= workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            # Workers send back the stage timings of each chunk with its outcomes
+            pending.add(executor.submit(call_and_drain, _process_batch_chunk, chunk))
+
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                print(f"Processed {processed} forms ({processed / (now - start):.1f} forms/s)")
+                last_report = now
+
+        collect(pending)
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    for source_id, error in failures:
+        logger.error("Failed to process %s: %s", source_id, error)
+    logger.info("Batch complete: %s forms, %s failures, %.2fs, %.1f forms/s",
+                processed, len(failures), elapsed, rate)
+    print(f"\nBatch complete: {processed - len(failures)} forms written to {output_dir}, "
+          f"{len(failures)} failed ({rate:.1f} forms/s using {workers} workers)")
+    return processed, failures
+
+def batch_main(argv):
+    """Entry point for `process_form.py --batch`."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='process_form.py --batch',
+        description="Fill forms non-interactively from a directory of .md/.json files "
+                    "or a JSONL stream ('-' for stdin)."
+    )
+    parser.add_argument('source', help="directory or JSONL file of raw answers")
+    parser.add_argument('--out', default='batch_output', help="directory for the filled forms")
+    parser.add_argument('--template', default='day1form.md', help="form template to fill")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=64, help="forms per worker task")
+    parser.add_argument('--model', default=None, help="model name to record in metadata")
+    # Handled by the entry point for every mode; declared here so they show up in --help
+    parser.add_argument('--timings', metavar='FILE', help="write stage timings at exit (.prom for Prometheus, else JSON)")
+    parser.add_argument('--profile', metavar='FILE', nargs='?', const=PROFILE_FILE,
+                        help=f"run under cProfile and write the stats (default {PROFILE_FILE})")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    _, failures = batch_process(args.source, args.out, template=args.template,
+                                workers=args.workers, chunk_size=args.chunk_size,
+                                model=args.model)
+    sys.exit(1 if failures else 0)
+
+def pick_submission(store):
+    """Pick a submission from the store; returns (form id, journal source, document)."""
+    from submission_store import prompt_for_submission
+
+    form_id = prompt_for_submission(store)
+    if form_id is None:
+        return None, None, None
+    logger.info("User selected submission %s", form_id)
+    return form_id, f"{store.db_path}#{form_id}", store.get(form_id)
+
+def recover_session(questions, store=None, fsync=None):
+    """Offer to resume a session that ended without saving; returns its FormSession or None."""
+    journals = unfinished_sessions()
+    if not journals:
+        return None
+    print("\nFound unfinished sessions that were never saved:")
+    for i, (document, info) in enumerate(journals, 1):
+        title = document["responses"].get("Project Title", {}).get("answer") or "(untitled)"
+        print(f"{i}. Started {info['created']} - {len(document['responses'])} answers - {title}")
+    while True:
+        choice = input("\nEnter a number to recover, 'discard' to delete them, "
+                       "or press Enter to skip: ").strip().lower()
+        if not choice:
+            return None
+        if choice == 'discard':
+            for _, info in journals:
+                os.remove(info["path"])
+            logger.info("Discarded %s unfinished sessions", len(journals))
+            return None
+        try:
+            choice_idx = int(choice) - 1
+        except ValueError:
+            print("Please enter a valid number.")
+            continue
+        if 0 <= choice_idx < len(journals):
+            options = {"fsync": fsync} if fsync else {}
+            session = FormSession.resume(journals[choice_idx][1]["path"], questions, store=store, **options)
+            print("\nRecovered unsaved progress...")
+            return session
+        print("Invalid selection. Please try again.")
+
+def get_option(name, default=None):
+    """Return the value following a command line option, e.g. --suggest MODEL."""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv) and not sys.argv[idx + 1].startswith('--'):
+            return sys.argv[idx + 1]
+    return default
+
+def select_model(base_url=None, default='llama3.2:latest'):
+    """Let the user pick an Ollama model from the cached model catalogue."""
+    from model_catalogue import get_models
+
+    logger.info("Starting model selection process")
+    try:
+        models = get_models(base_url)
+    except Exception as e:
+        logger.error("Could not list Ollama models: %s", e)
+        models = []
+    if not models:
+        logger.info("No model list available, using default model (%s)", default)
+        return default
+
+    print("\nAvailable AI models:")
+    for i, model in enumerate(models, 1):
+        print(f"{i}. {model}")
+    while True:
+        choice = input(f"\nSelect a model number (or press Enter for default '{default}'): ").strip()
+        if not choice:
+            logger.info("User selected default model (%s)", default)
+            return default
+        try:
+            choice_idx = int(choice) - 1
+            if 0 <= choice_idx < len(models):
+                logger.info("User selected model: %s", models[choice_idx])
+                return models[choice_idx]
+            print("Invalid selection. Please try again.")
+        except ValueError:
+            print("Please enter a valid number.")
+
+def start_suggestions(model, base_url=None, use_cache=True, reuse_context=False):
+    """Start the suggestion engine and warm up the model; returns None if Ollama is unavailable."""
+    from suggestions import SuggestionPrefetcher
+
+    logger.info("Starting AI suggestions with model %s", model)
+    try:
+        prefetcher = SuggestionPrefetcher(model, base_url=base_url, use_cache=use_cache,
+                                          reuse_context=reuse_context)
+        # Load the model while the user is still choosing a file and reading the first question
+        prefetcher.warm_up()
+        return prefetcher
+    except Exception as e:
+        logger.error("Could not start AI suggestions: %s", e)
+        print("\nAI suggestions are unavailable; continuing without them.")
+        return None
+
+def show_suggestion(prefetcher, field):
+    """Print a field's AI suggestion token by token; Ctrl+C skips the rest of it."""
+    stream = prefetcher.stream(field)
+    if stream is None:
+        return
+    prefetcher.prioritize(field)
+    print("\033[1;32mAI suggestion (Ctrl+C to skip): ", end="", flush=True)
+    try:
+        for token in stream.follow():
+            print(token, end="", flush=True)
+        if stream.error:
+            print("[unavailable]", end="")
+    except KeyboardInterrupt:
+        stream.cancel()
+        logger.info("User cancelled suggestion for %s", field)
+        print(" [skipped]", end="")
+    print("\033[0m")
+
+USAGE = """usage: python process_form.py [--edit] [options]
+       python process_form.py --batch SOURCE [--out DIR] [...]   (see --batch --help)
+
+Fill in the day1form.md form interactively, one question at a time.
+
+options:
+  --edit                 edit one answer of a saved form (must come first)
+  --suggest [MODEL]      stream AI suggestions from a local Ollama model
+  --ollama-url URL       Ollama server to use (default http://localhost:11434)
+  --no-cache             do not reuse cached suggestions
+  --context-reuse        share one model context across fields, fetched one at a time
+  --store [DB]           keep submissions in a SQLite store (default submissions.sqlite3)
+  --fsync POLICY         journal fsync policy: always, interval (default) or never
+  --timings FILE         write stage timings at exit (.prom for Prometheus, else JSON)
+  --profile [FILE]       run under cProfile and write the stats (default process_form.prof)
+  -h, --help             show this help and exit
+"""
+
+def ask(session, field, question, prefetcher=None):
+    """Ask one question until it is answered; returns False if the user chose EXIT."""
+    # Display previous answer if it exists
+    print(f"\n{question}")
+    prev_answer = session.previous_answer(field)
+    if isinstance(prev_answer, list):
+        print("\033[1;34m\033[1mPrevious answer:")
+        for item in prev_answer:
+            print(f"- {item}")
+        print("\033[0m")
+        print("\nOptions: [save/edit/exit/return]")
+    elif prev_answer is not None:
+        print(f"\033[1;34m\033[1mPrevious answer: {prev_answer}\033[0m")
+        print("\nOptions: [save/edit/exit/return]")
+
+    # Stream the AI suggestion as its tokens arrive
+    if prefetcher:
+        show_suggestion(prefetcher, field)
+
+    if session.is_list(field):
+        features = []
+        while True:
+            feature = input("Enter feature (or 'done' to finish): ").strip()
+            if feature.lower() == 'done':
+                break
+            if feature.upper() == 'SAVE':
+                save_progress(session)
+                continue
+            if feature.upper() == 'EXIT':
+                return False
+            if feature:
+                features.append(feature)
+                # Journal every item so a crash mid-list loses nothing
+                session.answer(field, features)
+        session.answer(field, features)
+        return True
+
+    while True:
+        user_answer = input("Your answer: ").strip()
+        command = user_answer.upper()
+        if command == 'SAVE':
+            save_progress(session)
+        elif command == 'EDIT':
+            edit_answer(session)
+        elif command == 'EXIT':
+            return False
+        elif command == 'RETURN':
+            # Keep the previous answer and continue to next question
+            try:
+                session.keep(field)
+                return True
+            except KeyError:
+                print("There is no previous answer to keep.")
+        else:
+            session.answer(field, user_answer)
+            return True
+        # After SAVE or EDIT the same question is asked again
+        print(f"\n{question}")
+
+def edit_main(store=None, fsync=None):
+    """Edit one answer of a saved form (`--edit`) and write it back where it came from."""
+    if store:
+        form_id, source, existing_data = pick_submission(store)
+    else:
+        form_id = None
+        source = prompt_for_json_file()
+        existing_data = load_json(source)
+    if not existing_data:
+        print("No existing data found to edit.")
+        sys.exit(1)
+
+    options = {"fsync": fsync} if fsync else {}
+    session = FormSession.start({}, existing_data, source=source, store=store, form_id=form_id,
+                                **options)
+    try:
+        edited_field = edit_answer(session)
+        if edited_field and not store and is_sample_file(source):
+            # The shipped sample stays as it is; the edited copy goes to a new timestamped file
+            print(f"\n{source} is the bundled sample and is not overwritten.")
+            save_progress(session, exit_save=True)
+        elif edited_field:
+            # With a store only the edited field's row is rewritten
+            target = session.save_edit(edited_field)
+            print(f"\nChanges written to {f'submission {target}' if store else target}")
+        else:
+            session.discard()
+    finally:
+        session.close()
+    sys.exit(0)
 
 def main():
+    if '-h' in sys.argv or ('--help' in sys.argv and '--batch' not in sys.argv):
+        print(USAGE)
+        return
+    if len(sys.argv) > 1 and sys.argv[1].lower() == '--batch':
+        batch_main(sys.argv[2:])
+    setup_logging()
+
     logger.info("Starting form processing")
+    prefetcher = None
+    session = None
+    store = None
     try:
         print_instructions()
+
+        # Start AI suggestions early so the model loads while the user picks a file (--suggest [MODEL])
+        suggest_model = None
+        if '--suggest' in sys.argv:
+            base_url = get_option('--ollama-url')
+            suggest_model = get_option('--suggest') or select_model(base_url)
+            prefetcher = start_suggestions(suggest_model, base_url=base_url,
+                                           use_cache='--no-cache' not in sys.argv,
+                                           reuse_context='--context-reuse' in sys.argv)
         
+        fsync = get_option('--fsync')
+
+        # Keep submissions in SQLite instead of JSON files (--store [DB])
+        if '--store' in sys.argv:
+            from submission_store import DEFAULT_STORE_PATH, SubmissionStore
+            store = SubmissionStore(get_option('--store', DEFAULT_STORE_PATH))
+
         # Handle command line argument for edit mode
         if len(sys.argv) > 1 and sys.argv[1].lower() == '--edit':
-            json_file = prompt_for_json_file()
-            existing_data = load_json(json_file)
-            if existing_data:
-                edit_answer(existing_data)
-                sys.exit(0)
+            edit_main(store, fsync)
+
+        # Load the parsed form template (fields and questions)
+        logger.info("Loading form template")
+        questions = load_form_template('day1form.md')["questions"]
+        options = {"fsync": fsync} if fsync else {}
+
+        # Resume a session that crashed or was closed without saving, else pick a file
+        session = recover_session(questions, store, fsync)
+        if session:
+            session.set_model(suggest_model)
+        else:
+            if store:
+                form_id, source, existing_data = pick_submission(store)
             else:
-                print("No existing data found to edit.")
-                sys.exit(1)
-        
-        # Prompt for JSON file to load
-        json_file = prompt_for_json_file()
-        existing_data = load_json(json_file)
-        if existing_data:
-            print("\nFound existing progress. Would you like to:")
-            print("1. Continue from where you left off")
-            print("2. Start fresh")
-            choice = input("\nEnter your choice (1/2): ").strip()
-            if choice == '1':
-                results = existing_data
-                print("\nLoading previous progress...")
-                logger.info("Continuing with existing progress")
+                form_id = None
+                source = prompt_for_json_file()
+                existing_data = load_json(source)
+            if existing_data:
+                print("\nFound existing progress. Would you like to:")
+                print("1. Continue from where you left off")
+                print("2. Start fresh")
+                choice = input("\nEnter your choice (1/2): ").strip()
+                if choice == '1':
+                    print("\nLoading previous progress...")
+                    check_schema(existing_data, source)
+                    logger.info("Continuing with existing progress")
+                    session = FormSession.start(questions, existing_data, source=source, store=store,
+                                                form_id=form_id, model=suggest_model, **options)
+                else:
+                    # Previous answers are still shown, and RETURN keeps them
+                    logger.info("Starting fresh despite existing progress")
+                    session = FormSession.start(questions, previous=existing_data["responses"],
+                                                store=store, model=suggest_model, **options)
             else:
-                results = {
-                    "metadata": {
-                        "timestamp": datetime.now().isoformat()
-                    },
-                    "responses": {}
-                }
-                logger.info("Starting fresh despite existing progress")
-        else:
-            results = {
-                "metadata": {
-                    "timestamp": datetime.now().isoformat()
-                },
-                "responses": {}
-            }
-            logger.info("Starting fresh - no existing progress found")
-        
-        # Read markdown file
-        logger.info("Reading markdown file")
-        content = read_markdown_file('day1form.md')
-        
-        # Extract fields
-        logger.info("Extracting fields from content")
-        fields = extract_fields(content)
-        
-        # Generate questions
-        logger.info("Generating questions")
-        questions = generate_questions(fields)
+                logger.info("Starting fresh - no existing progress found")
+                session = FormSession.start(questions, store=store, model=suggest_model, **options)
+
+        # Fire AI suggestion requests for every field up front
+        if prefetcher:
+            answers = {field: entry["answer"] for field, entry in session.responses.items()}
+            prefetcher.start(questions, answers)
         
         # Process each field
         logger.info("Processing fields and getting user input")
         for field, question in questions.items():
-            # Display previous answer if it exists
-            if existing_data and field in existing_data["responses"]:
-                prev_answer = existing_data["responses"][field]["answer"]
-                if isinstance(prev_answer, list):
-                    print(f"\n{question}")
-                    print("\033[1;34m\033[1mPrevious answer:")
-                    for item in prev_answer:
-                        print(f"- {item}")
-                    print("\033[0m")
-                    print("\nOptions: [save/edit/exit/return]")
-                else:
-                    print(f"\n{question}")
-                    print(f"\033[1;34m\033[1mPrevious answer: {prev_answer}\033[0m")
-                    print("\nOptions: [save/edit/exit/return]")
-            else:
-                print(f"\n{question}")
-            
-            if field == "Key Features":
-                features = []
-                while True:
-                    feature = input("Enter feature (or 'done' to finish): ").strip()
-                    if feature.lower() == 'done':
-                        break
-                    if feature.upper() == 'SAVE':
-                        save_progress(results)
-                        continue
-                    if feature.upper() == 'EXIT':
-                        print("\nSaving progress before exit...")
-                        save_progress(results, exit_save=True)
-                        print("Goodbye!")
-                        sys.exit(0)
-                    if feature:
-                        features.append(feature)
-                
-                results["responses"][field] = {
-                    "question": question,
-                    "answer": features
-                }
-            else:
-                user_answer = input("Your answer: ").strip()
-                
-                if user_answer.upper() == 'SAVE':
-                    save_progress(results)
-                    continue
-                elif user_answer.upper() == 'EDIT':
-                    edit_answer(results)
-                    continue
-                elif user_answer.upper() == 'EXIT':
-                    print("\nSaving progress before exit...")
-                    save_progress(results, exit_save=True)
-                    print("Goodbye!")
-                    sys.exit(0)
-                elif user_answer.upper() == 'RETURN':
-                    # Keep the previous answer and continue to next question
-                    results["responses"][field] = {
-                        "question": question,
-                        "answer": prev_answer
-                    }
-                    continue
-                elif user_answer:
-                    final_answer = user_answer
-                    if field == "Project Title":
-                        final_answer = format_title_answer(final_answer)
-                    
-                    results["responses"][field] = {
-                        "question": question,
-                        "answer": final_answer
-                    }
-                else:
-                    results["responses"][field] = {
-                        "question": question,
-                        "answer": user_answer
-                    }
+            if not ask(session, field, question, prefetcher):
+                print("\nSaving progress before exit...")
+                save_progress(session, exit_save=True)
+                print("Goodbye!")
+                sys.exit(0)
         
         # Final save with prompt
         logger.info("Form processing complete - prompting for save location")
-        save_progress(results, prompt_save=True)
+        save_progress(session, prompt_save=True)
         print("\nForm processing complete!")
         
     except KeyboardInterrupt:
@@ -459,10 +955,18 @@ def main():
         print("\nProcess interrupted by user")
         sys.exit(1)
     except Exception as e:
-        logger.error(f"Error in main process: {str(e)}")
-        logger.error(f"Stack trace: {traceback.format_exc()}")
+        logger.error("Error in main process: %s", e, exc_info=True)
         print(f"\nAn error occurred: {str(e)}")
         sys.exit(1)
+    finally:
+        if prefetcher:
+            prefetcher.close()
+        if session:
+            # An unfinished session stays on disk and is offered for recovery next time
+            session.close()
+        if store:
+            store.close()
 
 if __name__ == "__main__":
-    main()
+    profile_path = get_option('--profile', PROFILE_FILE) if '--profile' in sys.argv else None
+    run_instrumented(main, get_option('--timings'), profile_path)
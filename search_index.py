@@ -0,0 +1,375 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from submission_store import document_title
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = '.search_index.sqlite3'
+DEFAULT_BATCH_SIZE = 1000
+# Answers of fields the index has no column for are searchable here
+OTHER_COLUMN = 'other'
+# Stemmed, case- and accent-insensitive words
+TOKENIZER = 'porter unicode61 remove_diacritics 2'
+
+# "a phrase", a word, or a word* prefix
+_QUERY_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+class SearchIndexError(Exception):
+    """Raised for unusable queries and indexes."""
+
+def answer_text(answer):
+    """Return the searchable text of an answer (list answers are joined one item per line)."""
+    if isinstance(answer, list):
+        return "\n".join(str(item) for item in answer)
+    return "" if answer is None else str(answer)
+
+def build_match(query, columns=None, any_terms=False):
+    """Turn a user query into an FTS5 MATCH expression.
+
+    Words are matched individually (all of them, or any with any_terms),
+    "quoted text" as a phrase and word* as a prefix. columns restricts the
+    match to those index columns.
+    """
+    terms = []
+    for phrase, word in _QUERY_TERM_RE.findall(query):
+        text = phrase if phrase else word
+        prefix = not phrase and text.endswith('*') and len(text) > 1
+        text = text.rstrip('*') if prefix else text
+        if not text.strip():
+            continue
+        # Quoting every term keeps FTS5 operators and punctuation in user input literal
+        terms.append('"' + text.replace('"', '""') + '"' + (' *' if prefix else ''))
+    if not terms:
+        raise SearchIndexError("Empty search query")
+    expression = (" OR " if any_terms else " AND ").join(terms)
+    if columns:
+        return f"{{{' '.join(columns)}}} : ({expression})"
+    return expression
+
+class SearchIndex:
+    """On-disk inverted index of submission answers, with field-scoped BM25 ranking.
+
+    Built on an SQLite FTS5 table holding one row per submission and one
+    column per form field, so a field-scoped query is a column filter inside
+    the index and ranking is BM25 over just those columns. docs maps each
+    row to its source (a JSON file path, or "db#id" for the submission
+    store) and the version it was indexed at (mtime/size or revision), which
+    is what lets sync_directory() and sync_store() reindex only what changed.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, fields=None):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                source TEXT NOT NULL UNIQUE,
+                version TEXT,
+                title TEXT
+            );
+            CREATE TABLE IF NOT EXISTS fields (
+                name TEXT PRIMARY KEY COLLATE NOCASE,
+                col TEXT NOT NULL,
+                position INTEGER NOT NULL
+            );
+        """)
+        self._columns = {name: col for name, col in
+                         self._db.execute("SELECT name, col FROM fields ORDER BY position")}
+        if not self._columns:
+            self._create(fields if fields is not None else _template_fields())
+        self._column_order = list(self._columns.values()) + [OTHER_COLUMN]
+
+    def _create(self, fields):
+        """Create the FTS5 table with a column per field (named f0, f1, ... since field names have spaces)."""
+        columns = {field: f"f{position}" for position, field in enumerate(fields)}
+        try:
+            with self._db:
+                self._db.execute(f"CREATE VIRTUAL TABLE answers USING fts5("
+                                 f"{', '.join(list(columns.values()) + [OTHER_COLUMN])}, "
+                                 f"tokenize='{TOKENIZER}')")
+                self._db.executemany("INSERT INTO fields VALUES (?, ?, ?)",
+                                     [(field, col, i) for i, (field, col) in enumerate(columns.items())])
+        except sqlite3.OperationalError as e:
+            raise SearchIndexError(f"Could not create the search index (SQLite needs FTS5): {e}") from e
+        self._columns = columns
+        logger.info("Created search index %s with %s field columns", self.path, len(columns))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @property
+    def fields(self):
+        """The form fields that have their own column (and so can scope a query)."""
+        return list(self._columns)
+
+    def _row(self, document):
+        """Return the column values of a document, in table order."""
+        values = dict.fromkeys(self._column_order, "")
+        other = []
+        for field, entry in document.get('responses', {}).items():
+            text = answer_text(entry.get('answer') if isinstance(entry, dict) else entry)
+            col = self._columns.get(field)
+            if col is None:
+                # Columns are fixed when the index is created; unknown fields stay searchable
+                other.append(f"{field}: {text}")
+            else:
+                values[col] = text
+        values[OTHER_COLUMN] = "\n".join(other)
+        return [values[col] for col in self._column_order]
+
+    def _add(self, source, document, version):
+        row = self._db.execute("SELECT id FROM docs WHERE source = ?", (source,)).fetchone()
+        if row:
+            doc_id = row[0]
+            self._db.execute("DELETE FROM answers WHERE rowid = ?", (doc_id,))
+            self._db.execute("UPDATE docs SET version = ?, title = ? WHERE id = ?",
+                             (version, document_title(document), doc_id))
+        else:
+            doc_id = self._db.execute("INSERT INTO docs (source, version, title) VALUES (?, ?, ?)",
+                                      (source, version, document_title(document))).lastrowid
+        placeholders = ", ".join("?" * (len(self._column_order) + 1))
+        self._db.execute(f"INSERT INTO answers (rowid, {', '.join(self._column_order)}) "
+                         f"VALUES ({placeholders})", [doc_id] + self._row(document))
+
+    def add(self, source, document, version=None):
+        """Index (or reindex) one submission."""
+        with self._db:
+            self._add(source, document, version)
+
+    def add_many(self, items, batch_size=DEFAULT_BATCH_SIZE):
+        """Index (source, document, version) items, committing every batch_size; returns the count."""
+        count = 0
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                count += self._add_batch(batch)
+                batch = []
+        if batch:
+            count += self._add_batch(batch)
+        return count
+
+    def _add_batch(self, batch):
+        with self._db:
+            for source, document, version in batch:
+                self._add(source, document, version)
+        return len(batch)
+
+    def remove(self, sources):
+        """Drop submissions from the index."""
+        with self._db:
+            for source in sources:
+                row = self._db.execute("SELECT id FROM docs WHERE source = ?", (source,)).fetchone()
+                if row:
+                    self._db.execute("DELETE FROM answers WHERE rowid = ?", (row[0],))
+                    self._db.execute("DELETE FROM docs WHERE id = ?", (row[0],))
+
+    def versions(self):
+        """Return {source: indexed version} for every indexed submission."""
+        return dict(self._db.execute("SELECT source, version FROM docs"))
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def optimize(self):
+        """Merge the index segments; worth running after a large build."""
+        with self._db:
+            self._db.execute("INSERT INTO answers (answers) VALUES ('optimize')")
+
+    def search(self, query, fields=None, limit=10, any_terms=False):
+        """Return the best matches for a query, best first.
+
+        fields limits the search to those form fields (names are matched
+        case-insensitively; 'other' covers fields without a column). Each
+        result has source, title, score (higher is better) and a snippet of
+        the best matching answer with the matched words in [brackets].
+        """
+        columns = None
+        if fields:
+            lookup = {name.lower(): col for name, col in self._columns.items()}
+            lookup[OTHER_COLUMN] = OTHER_COLUMN
+            unknown = [field for field in fields if field.lower() not in lookup]
+            if unknown:
+                raise SearchIndexError(f"Unknown field(s) {', '.join(unknown)}; "
+                                       f"indexed fields are {', '.join(self.fields)}")
+            columns = [lookup[field.lower()] for field in fields]
+        match = build_match(query, columns, any_terms)
+        try:
+            # Rank first (ORDER BY rank is bm25), then build snippets for the top rows only
+            rows = self._db.execute("SELECT rowid, rank FROM answers WHERE answers MATCH ? "
+                                    "ORDER BY rank LIMIT ?", (match, limit)).fetchall()
+            if not rows:
+                return []
+            ids = [row[0] for row in rows]
+            placeholders = ", ".join("?" * len(ids))
+            snippets = dict(self._db.execute(
+                f"SELECT rowid, snippet(answers, -1, '[', ']', '...', 12) FROM answers "
+                f"WHERE answers MATCH ? AND rowid IN ({placeholders})", [match] + ids))
+        except sqlite3.OperationalError as e:
+            raise SearchIndexError(f"Invalid query {query!r}: {e}") from e
+        docs = {doc_id: (source, title) for doc_id, source, title in self._db.execute(
+            f"SELECT id, source, title FROM docs WHERE id IN ({placeholders})", ids)}
+        return [{"source": docs[doc_id][0], "title": docs[doc_id][1], "score": -rank,
+                 "snippet": snippets.get(doc_id, "")}
+                for doc_id, rank in rows if doc_id in docs]
+
+    def sync_directory(self, directory='.'):
+        """Bring the index up to date with the submission JSON files in a directory.
+
+        Files are matched to the index by mtime and size, so only new and
+        changed files are read. Returns (indexed, removed) counts.
+        """
+        from file_manifest import list_submissions
+
+        directory = os.path.normpath(directory)
+        indexed_versions = self.versions()
+        present = set()
+        changed = []
+        for name, entry in list_submissions(directory):
+            source = os.path.normpath(os.path.join(directory, name))
+            present.add(source)
+            version = f"{entry['mtime_ns']}:{entry['size']}"
+            if indexed_versions.get(source) != version:
+                changed.append((source, version))
+
+        def load(items):
+            for source, version in items:
+                try:
+                    with open(source, 'r') as f:
+                        yield source, json.load(f), version
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning("Could not index %s: %s", source, e)
+
+        indexed = self.add_many(load(changed))
+        removed = [source for source in indexed_versions
+                   if '#' not in source and (os.path.dirname(source) or '.') == directory
+                   and source not in present]
+        self.remove(removed)
+        return indexed, len(removed)
+
+    def sync_store(self, store):
+        """Bring the index up to date with a submission store, by revision; returns (indexed, removed)."""
+        prefix = f"{store.db_path}#"
+        indexed_versions = self.versions()
+        revisions = store.revisions()
+        changed = [(form_id, str(revision)) for form_id, revision in revisions.items()
+                   if indexed_versions.get(f"{prefix}{form_id}") != str(revision)]
+        indexed = self.add_many((f"{prefix}{form_id}", store.get(form_id), version)
+                                for form_id, version in changed)
+        removed = [source for source in indexed_versions
+                   if source.startswith(prefix) and int(source[len(prefix):]) not in revisions]
+        self.remove(removed)
+        return indexed, len(removed)
+
+def _template_fields(template='day1form.md'):
+    from process_form import load_form_template
+
+    return list(load_form_template(template)["questions"])
+
+def file_version(path):
+    """Return the version the index records for a JSON file (its mtime and size)."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+def index_saved(source, document, version=None, index_path=DEFAULT_INDEX_PATH):
+    """Update an existing index with a just-saved submission; does nothing if no index was built.
+
+    Failures are logged rather than raised, so indexing never gets in the
+    way of saving.
+    """
+    if not os.path.exists(index_path):
+        return False
+    try:
+        if version is None and '#' not in source:
+            source = os.path.normpath(source)
+            version = file_version(source)
+        with SearchIndex(index_path) as index:
+            index.add(source, document, version)
+        logger.info("Indexed %s for search", source)
+        return True
+    except (OSError, sqlite3.Error, SearchIndexError) as e:
+        logger.warning("Could not update search index %s: %s", index_path, e)
+        return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search across stored submissions.")
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help="index database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_cmd = commands.add_parser('build', help="index new and changed submissions")
+    build_cmd.add_argument('--dir', action='append', help="directory of submission JSON files "
+                                                          "(repeatable; default: current directory)")
+    build_cmd.add_argument('--store', help="also index this SQLite submission store")
+    build_cmd.add_argument('--template', default='day1form.md', help="form whose fields get their own column")
+    build_cmd.add_argument('--rebuild', action='store_true', help="start from an empty index")
+
+    search_cmd = commands.add_parser('search', help="ranked search of the answers")
+    search_cmd.add_argument('query', help='words, "a phrase" or prefix*')
+    search_cmd.add_argument('--field', action='append', help="only search this field (repeatable)")
+    search_cmd.add_argument('--any', action='store_true', help="match any word instead of all of them")
+    search_cmd.add_argument('--limit', type=int, default=10)
+
+    commands.add_parser('fields', help="list the fields a search can be scoped to")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.command != 'build' and not os.path.exists(args.index):
+        parser.error(f"{args.index} does not exist yet; run the build command first")
+    if args.command == 'build' and args.rebuild:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.index + suffix):
+                os.remove(args.index + suffix)
+
+    try:
+        fields = _template_fields(args.template) if args.command == 'build' else None
+        with SearchIndex(args.index, fields) as index:
+            if args.command == 'build':
+                start = time.perf_counter()
+                indexed = removed = 0
+                for directory in args.dir or ['.']:
+                    added, dropped = index.sync_directory(directory)
+                    indexed, removed = indexed + added, removed + dropped
+                if args.store:
+                    from submission_store import SubmissionStore
+
+                    with SubmissionStore(args.store) as store:
+                        added, dropped = index.sync_store(store)
+                    indexed, removed = indexed + added, removed + dropped
+                if indexed > DEFAULT_BATCH_SIZE:
+                    index.optimize()
+                print(f"Indexed {indexed} submissions, removed {removed}, in "
+                      f"{time.perf_counter() - start:.2f}s ({index.count()} in the index)")
+            elif args.command == 'search':
+                start = time.perf_counter()
+                results = index.search(args.query, args.field, args.limit, args.any)
+                elapsed = (time.perf_counter() - start) * 1000
+                for result in results:
+                    print(f"{result['score']:7.2f}  {result['source']}  {result['title'] or '(untitled)'}")
+                    print(f"         {' '.join(result['snippet'].split())}")
+                print(f"\n{len(results)} results in {elapsed:.1f} ms")
+            else:
+                for field in index.fields + [OTHER_COLUMN]:
+                    print(field)
+    except SearchIndexError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,213 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond parsing up to model calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_NAME = 'form_stage_duration_seconds'
+
+_lock = threading.Lock()
+_stages = {}
+
+class _Histogram:
+    """Count, sum, min, max and bucket counts of one stage's latencies."""
+
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKETS) + 1)  # the last one is +Inf
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self):
+        return {"count": self.count, "total": self.total, "min": self.min, "max": self.max,
+                "buckets": list(self.buckets)}
+
+def observe(stage, seconds):
+    """Record one latency sample for a stage."""
+    with _lock:
+        histogram = _stages.get(stage)
+        if histogram is None:
+            histogram = _stages[stage] = _Histogram()
+        histogram.observe(seconds)
+
+class timed:
+    """Time a block or function as a stage: `with timed('load_json'):` or `@timed('load_json')`.
+
+    Time is recorded even when the block raises, so failures show up in the counts too.
+    """
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - start)
+
+        return wrapper
+
+def snapshot():
+    """Return {stage: histogram dict} for everything recorded so far."""
+    with _lock:
+        return {stage: histogram.to_dict() for stage, histogram in _stages.items()}
+
+def drain():
+    """Return a snapshot and reset the recorded stages; used to ship worker timings to the parent."""
+    global _stages
+    with _lock:
+        stages, _stages = _stages, {}
+    return {stage: histogram.to_dict() for stage, histogram in stages.items()}
+
+def reset():
+    """Forget everything recorded so far (e.g. what a forked worker inherited from its parent)."""
+    drain()
+
+def merge(stages):
+    """Add a snapshot (e.g. from a worker process) into the recorded stages."""
+    with _lock:
+        for stage, data in stages.items():
+            histogram = _stages.get(stage)
+            if histogram is None:
+                histogram = _stages[stage] = _Histogram()
+            histogram.count += data["count"]
+            histogram.total += data["total"]
+            for bound in ("min", "max"):
+                theirs, ours = data[bound], getattr(histogram, bound)
+                if theirs is not None:
+                    pick = min if bound == "min" else max
+                    setattr(histogram, bound, theirs if ours is None else pick(ours, theirs))
+            histogram.buckets = [a + b for a, b in zip(histogram.buckets, data["buckets"])]
+
+def call_and_drain(func, *args):
+    """Worker helper: return (func(*args), the timings it recorded)."""
+    return func(*args), drain()
+
+def _quantile(data, q):
+    """Estimate a quantile as the upper bound of the bucket holding it."""
+    if not data["count"]:
+        return None
+    rank = q * data["count"]
+    seen = 0
+    for bound, count in zip(BUCKETS, data["buckets"]):
+        seen += count
+        if seen >= rank:
+            return min(bound, data["max"])
+    return data["max"]
+
+def format_json(stages):
+    """Render a snapshot as a JSON report."""
+    report = {"generated": datetime.now().isoformat(), "pid": os.getpid(),
+              "buckets": list(BUCKETS), "stages": {}}
+    for stage, data in sorted(stages.items()):
+        report["stages"][stage] = dict(
+            data,
+            mean=data["total"] / data["count"] if data["count"] else None,
+            p50=_quantile(data, 0.5), p95=_quantile(data, 0.95), p99=_quantile(data, 0.99))
+    return json.dumps(report, indent=2) + "\n"
+
+def format_prometheus(stages):
+    """Render a snapshot in the Prometheus text exposition format (for the node_exporter textfile collector)."""
+    lines = [f"# HELP {METRIC_NAME} Time spent in each form processing stage.",
+             f"# TYPE {METRIC_NAME} histogram"]
+    for stage, data in sorted(stages.items()):
+        label = stage.replace('\\', '\\\\').replace('"', '\\"')
+        cumulative = 0
+        for bound, count in zip(BUCKETS, data["buckets"]):
+            cumulative += count
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="+Inf"}} {data["count"]}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{label}"}} {data["total"]}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{label}"}} {data["count"]}')
+    return "\n".join(lines) + "\n"
+
+def format_summary(stages):
+    """Render a snapshot as a short human-readable table."""
+    lines = [f"{'stage':<24} {'count':>7} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+    for stage, data in sorted(stages.items(), key=lambda item: -item[1]["total"]):
+        if not data["count"]:
+            continue
+        mean = data["total"] / data["count"]
+        lines.append(f"{stage:<24} {data['count']:>7} {data['total']:>9.3f} {mean * 1000:>9.2f} "
+                     f"{_quantile(data, 0.95) * 1000:>9.2f} {data['max'] * 1000:>9.2f}")
+    return "\n".join(lines)
+
+def write_report(path):
+    """Write the recorded timings to path: Prometheus text for .prom files, JSON otherwise.
+
+    The file is replaced atomically so a collector never reads a partial report.
+    """
+    stages = snapshot()
+    text = format_prometheus(stages) if path.endswith('.prom') else format_json(stages)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error("Could not write timing report %s: %s", path, e)
+        return False
+    if stages:
+        logger.info("Stage timings:\n%s", format_summary(stages))
+    logger.info("Timing report written to %s", path)
+    return True
+
+def run_instrumented(func, timings_path=None, profile_path=None):
+    """Run func(), then write a timing report and, with profile_path, cProfile stats.
+
+    Both are written even when func exits through sys.exit() or an exception.
+    They are written on the way out of func rather than at exit, while the
+    logging pipeline (stopped by an atexit handler) still records their lines.
+    """
+    profiler = None
+    if profile_path:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        return func()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            logger.info("Profile written to %s (view with: python -m pstats %s)", profile_path, profile_path)
+        if timings_path:
+            write_report(timings_path)
@@ -0,0 +1,526 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from json_patch import apply_patch, make_patch, pointer, unescape
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = 'submissions.sqlite3'
+DEFAULT_BATCH_SIZE = 1000
+# A full copy of a submission is kept at least every this many revisions
+SNAPSHOT_INTERVAL = 32
+# Patches larger than this are checked against the size of a full copy
+SNAPSHOT_PATCH_BYTES = 4096
+
+def document_title(document):
+    """Return a document's project title without the "Project Title: " prefix, or None."""
+    try:
+        title = document['responses']['Project Title']['answer']
+    except (KeyError, TypeError):
+        return None
+    if not isinstance(title, str):
+        return None
+    if title.startswith("Project Title: "):
+        title = title[15:]
+    return title.strip() or None
+
+def stored_form(document):
+    """Return a document in the shape the store keeps and get() returns: metadata plus question/answer entries."""
+    return {
+        "metadata": document.get('metadata', {}),
+        "responses": {field: {"question": entry.get('question'), "answer": entry.get('answer')}
+                      for field, entry in document.get('responses', {}).items()}
+    }
+
+class SubmissionStore:
+    """SQLite store of filled-in forms.
+
+    forms holds one row per submission (indexed by title, model and
+    timestamp), responses one row per answered field, and revisions the
+    history of changes. get() and export return the same JSON shape
+    process_form.py writes, so either side can be used interchangeably.
+
+    The latest version is always in forms/responses. Each revision after
+    the first is stored as a JSON Patch against the one before ('patch'),
+    so an edit costs the size of the edit; every SNAPSHOT_INTERVAL
+    revisions a full copy ('document') bounds how many patches
+    document_at() has to replay.
+    """
+
+    def __init__(self, db_path=DEFAULT_STORE_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS forms (
+                id INTEGER PRIMARY KEY,
+                title TEXT COLLATE NOCASE,
+                model TEXT,
+                timestamp TEXT,
+                source TEXT,
+                metadata TEXT NOT NULL,
+                revision INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS responses (
+                form_id INTEGER NOT NULL REFERENCES forms (id) ON DELETE CASCADE,
+                field TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                question TEXT,
+                answer TEXT NOT NULL,
+                PRIMARY KEY (form_id, field)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS revisions (
+                form_id INTEGER NOT NULL REFERENCES forms (id) ON DELETE CASCADE,
+                revision INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (form_id, revision)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_forms_title ON forms (title);
+            CREATE INDEX IF NOT EXISTS idx_forms_model ON forms (model);
+            CREATE INDEX IF NOT EXISTS idx_forms_timestamp ON forms (timestamp);
+        """)
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database."""
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+    def _form_row(self, document, source, now):
+        metadata = document.get('metadata', {})
+        return (document_title(document), metadata.get('model'), metadata.get('timestamp'),
+                source, json.dumps(metadata), now, now)
+
+    @staticmethod
+    def _response_rows(form_id, document):
+        return [(form_id, field, position, entry.get('question'), json.dumps(entry.get('answer')))
+                for position, (field, entry) in enumerate(document.get('responses', {}).items())]
+
+    def _insert(self, document, source, now):
+        cursor = self._db.execute(
+            "INSERT INTO forms (title, model, timestamp, source, metadata, revision, created, updated) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?, ?)",
+            self._form_row(document, source, now)
+        )
+        form_id = cursor.lastrowid
+        self._db.executemany("INSERT INTO responses VALUES (?, ?, ?, ?, ?)",
+                             self._response_rows(form_id, document))
+        self._db.execute("INSERT INTO revisions VALUES (?, 1, 'document', ?, ?)",
+                         (form_id, json.dumps(stored_form(document)), now))
+        return form_id
+
+    def save(self, document, form_id=None, source=None):
+        """Insert a document, or replace submission form_id with it; returns the form id.
+
+        Replacing stores only the difference as the new revision and
+        rewrites only the response rows that changed; saving an unchanged
+        document adds no revision.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            if form_id is None:
+                form_id = self._insert(document, source, now)
+                logger.info("Stored submission %s", form_id)
+                return form_id
+            revision = self._next_revision(form_id)
+            document = stored_form(document)
+            patch = make_patch(self._document(form_id), document)
+            if not patch:
+                logger.info("Submission %s is unchanged", form_id)
+                return form_id
+            title, model, timestamp, _, metadata, _, _ = self._form_row(document, source, now)
+            self._db.execute(
+                "UPDATE forms SET title = ?, model = ?, timestamp = ?, metadata = ?, revision = ?, "
+                "updated = ? WHERE id = ?",
+                (title, model, timestamp, metadata, revision, now, form_id)
+            )
+            self._write_responses(form_id, document, patch)
+            self._add_revision(form_id, revision, patch, now, document)
+        logger.info("Updated submission %s (revision %s, %s changes)", form_id, revision, len(patch))
+        return form_id
+
+    def _write_responses(self, form_id, document, patch):
+        """Bring the response rows in line with document, touching only the fields patch changes."""
+        prefix = pointer('responses') + '/'
+        paths = [op["path"] for op in patch if not op["path"].startswith('/metadata/')]
+        if not all(path.startswith(prefix) for path in paths):
+            # The responses (or the whole document) were replaced as a whole, e.g. reordered
+            self._db.execute("DELETE FROM responses WHERE form_id = ?", (form_id,))
+            self._db.executemany("INSERT INTO responses VALUES (?, ?, ?, ?, ?)",
+                                 self._response_rows(form_id, document))
+            return
+        responses = document['responses']
+        for field in dict.fromkeys(unescape(path[len(prefix):].split('/')[0]) for path in paths):
+            if field in responses:
+                self._set_response(form_id, field, responses[field])
+            else:
+                self._db.execute("DELETE FROM responses WHERE form_id = ? AND field = ?", (form_id, field))
+
+    def _set_response(self, form_id, field, entry):
+        """Update one field's row, appending it after the others if it is new."""
+        answer = json.dumps(entry.get('answer'))
+        updated = self._db.execute(
+            "UPDATE responses SET question = ?, answer = ? WHERE form_id = ? AND field = ?",
+            (entry.get('question'), answer, form_id, field)
+        ).rowcount
+        if not updated:
+            self._db.execute(
+                "INSERT INTO responses SELECT ?, ?, COALESCE(MAX(position) + 1, 0), ?, ? "
+                "FROM responses WHERE form_id = ?",
+                (form_id, field, entry.get('question'), answer, form_id)
+            )
+
+    def _add_revision(self, form_id, revision, patch, now, document=None):
+        """Store a revision as a patch, or as a full copy when a snapshot is due.
+
+        A snapshot is due SNAPSHOT_INTERVAL revisions after the last one, or
+        when the patch would be no smaller than the document itself.
+        """
+        data = json.dumps(patch)
+        last = self._db.execute(
+            "SELECT MAX(revision) FROM revisions WHERE form_id = ? AND kind = 'document'", (form_id,)
+        ).fetchone()[0] or 0
+        snapshot = None
+        if revision - last >= SNAPSHOT_INTERVAL or len(data) > SNAPSHOT_PATCH_BYTES:
+            snapshot = json.dumps(document if document is not None else self._document(form_id))
+        if snapshot is not None and (revision - last >= SNAPSHOT_INTERVAL or len(snapshot) <= len(data)):
+            self._db.execute("INSERT INTO revisions VALUES (?, ?, 'document', ?, ?)",
+                             (form_id, revision, snapshot, now))
+        else:
+            self._db.execute("INSERT INTO revisions VALUES (?, ?, 'patch', ?, ?)",
+                             (form_id, revision, data, now))
+
+    def _next_revision(self, form_id):
+        row = self._db.execute("SELECT revision FROM forms WHERE id = ?", (form_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No submission with id {form_id}")
+        return row[0] + 1
+
+    def update_field(self, form_id, field, entry):
+        """Set one field's {"question", "answer"} entry; touches only that field's row.
+
+        The revision records only what changed in the entry, e.g. the one
+        Key Features item that was replaced. Returns the submission's revision.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            revision = self._next_revision(form_id)
+            row = self._db.execute("SELECT question, answer FROM responses WHERE form_id = ? AND field = ?",
+                                   (form_id, field)).fetchone()
+            path = pointer('responses', field)
+            entry = {"question": entry.get('question'), "answer": entry.get('answer')}
+            if row is None:
+                patch = [{"op": "add", "path": path, "value": entry}]
+            else:
+                patch = make_patch({"question": row[0], "answer": json.loads(row[1])}, entry, path)
+                if not patch:
+                    return revision - 1
+            self._set_response(form_id, field, entry)
+            columns = "revision = ?, updated = ?"
+            params = [revision, now]
+            if field == 'Project Title':
+                columns += ", title = ?"
+                params.append(document_title({"responses": {field: entry}}))
+            self._db.execute(f"UPDATE forms SET {columns} WHERE id = ?", params + [form_id])
+            self._add_revision(form_id, revision, patch, now)
+        logger.info("Updated %s of submission %s (revision %s)", field, form_id, revision)
+        return revision
+
+    def bulk_insert(self, documents, sources=None, batch_size=DEFAULT_BATCH_SIZE):
+        """Insert many documents, one transaction per batch; returns the new form ids."""
+        sources = sources or [None] * len(documents)
+        form_ids = []
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(documents), batch_size):
+                with self._db:
+                    for document, source in zip(documents[start:start + batch_size],
+                                                sources[start:start + batch_size]):
+                        form_ids.append(self._insert(document, source, now))
+        logger.info("Bulk inserted %s submissions", len(form_ids))
+        return form_ids
+
+    def get(self, form_id):
+        """Return a submission in the JSON document shape, or None if there is none."""
+        with self._lock:
+            return self._document(form_id)
+
+    def _document(self, form_id):
+        row = self._db.execute("SELECT metadata FROM forms WHERE id = ?", (form_id,)).fetchone()
+        if row is None:
+            return None
+        responses = self._db.execute(
+            "SELECT field, question, answer FROM responses WHERE form_id = ? ORDER BY position",
+            (form_id,)
+        ).fetchall()
+        return {
+            "metadata": json.loads(row[0]),
+            "responses": {field: {"question": question, "answer": json.loads(answer)}
+                          for field, question, answer in responses}
+        }
+
+    def document_at(self, form_id, revision=None):
+        """Return a submission as it was at a revision (default: the latest).
+
+        Starts from the nearest full copy at or before the revision and
+        applies the patches after it, fewer than SNAPSHOT_INTERVAL of them.
+        Raises KeyError for an unknown submission or revision.
+        """
+        with self._lock:
+            if revision is None:
+                document = self._document(form_id)
+                if document is None:
+                    raise KeyError(f"No submission with id {form_id}")
+                return document
+            snapshot = self._db.execute(
+                "SELECT revision, data FROM revisions WHERE form_id = ? AND revision <= ? AND kind = 'document' "
+                "ORDER BY revision DESC LIMIT 1", (form_id, revision)
+            ).fetchone()
+            if snapshot is None:
+                raise KeyError(f"Submission {form_id} has no revision {revision}")
+            rows = self._db.execute(
+                "SELECT revision, data FROM revisions "
+                "WHERE form_id = ? AND revision > ? AND revision <= ? ORDER BY revision",
+                (form_id, snapshot[0], revision)
+            ).fetchall()
+        if (rows[-1][0] if rows else snapshot[0]) != revision:
+            raise KeyError(f"Submission {form_id} has no revision {revision}")
+        document = json.loads(snapshot[1])
+        for _, data in rows:
+            document = apply_patch(document, json.loads(data))
+        return document
+
+    def history(self, form_id):
+        """Return a submission's revisions, oldest first: revision, kind, created, size in bytes, changes."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT revision, kind, data, created FROM revisions WHERE form_id = ? ORDER BY revision",
+                (form_id,)
+            ).fetchall()
+        if not rows:
+            raise KeyError(f"No submission with id {form_id}")
+        return [{"revision": revision, "kind": kind, "created": created, "size": len(data),
+                 "changes": None if kind == 'document' else len(json.loads(data))}
+                for revision, kind, data, created in rows]
+
+    def diff(self, form_id, from_revision, to_revision=None):
+        """Return the JSON Patch from one revision of a submission to another (default: the latest)."""
+        return make_patch(self.document_at(form_id, from_revision), self.document_at(form_id, to_revision))
+
+    def rollback(self, form_id, revision):
+        """Make a submission what it was at an earlier revision; returns the new revision.
+
+        The rollback is a revision like any other, so nothing is lost and it
+        can itself be rolled back.
+        """
+        self.save(self.document_at(form_id, revision), form_id)
+        return self.revisions([form_id])[form_id]
+
+    def find(self, title=None, model=None, since=None, until=None, limit=50):
+        """Return summaries of matching submissions, newest first.
+
+        title matches as a case-insensitive prefix; since/until bound the
+        metadata timestamp (ISO strings). Every filter uses an index.
+        """
+        clauses, params = [], []
+        if title:
+            clauses.append("title >= ? AND title < ?")
+            params.extend([title, title + '\uffff'])
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = (f"SELECT id, title, model, timestamp, source, revision FROM forms {where} "
+                 f"ORDER BY timestamp DESC LIMIT ?")
+        with self._lock:
+            rows = self._db.execute(query, params + [limit]).fetchall()
+        return [dict(zip(("id", "title", "model", "timestamp", "source", "revision"), row))
+                for row in rows]
+
+    def count(self):
+        """Return the number of stored submissions."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM forms").fetchone()[0]
+
+    def ids(self):
+        """Return every submission id."""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT id FROM forms ORDER BY id")]
+
+    def revisions(self, ids=None):
+        """Return {form id: revision} for every submission, or for the given ids."""
+        with self._lock:
+            if ids is None:
+                rows = self._db.execute("SELECT id, revision FROM forms")
+            else:
+                ids = list(ids)
+                placeholders = ", ".join("?" * len(ids))
+                rows = self._db.execute(f"SELECT id, revision FROM forms WHERE id IN ({placeholders})", ids)
+            return dict(rows.fetchall())
+
+    def import_json(self, paths, batch_size=DEFAULT_BATCH_SIZE):
+        """Import response JSON files; returns (imported count, [(path, error)])."""
+        documents, sources, failures = [], [], []
+        for path in paths:
+            try:
+                with open(path, 'r') as f:
+                    document = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                failures.append((path, str(e)))
+                continue
+            if not isinstance(document, dict) or not isinstance(document.get('responses'), dict):
+                failures.append((path, "not a form response document"))
+                continue
+            documents.append(document)
+            sources.append(path)
+        self.bulk_insert(documents, sources, batch_size)
+        return len(documents), failures
+
+    def export_json(self, form_id, output_file):
+        """Write one submission to a JSON file in the process_form.py format."""
+        document = self.get(form_id)
+        if document is None:
+            raise KeyError(f"No submission with id {form_id}")
+        with open(output_file, 'w') as f:
+            json.dump(document, f, indent=4)
+        return output_file
+
+def prompt_for_submission(store, limit=20):
+    """Let the user search the store by title and pick a submission; returns its id or None."""
+    while True:
+        title = input("\nSearch submissions by title (or press Enter for the most recent): ").strip()
+        rows = store.find(title=title or None, limit=limit)
+        if not rows:
+            print("No matching submissions found.")
+            if not title:
+                return None
+            continue
+        for i, row in enumerate(rows, 1):
+            print(f"{i}. {row['title'] or '(untitled)'} - {row['model'] or 'no model'} - {row['timestamp']}")
+        choice = input("\nSelect a submission number (or press Enter to search again, 0 for none): ").strip()
+        if choice == '0':
+            return None
+        if not choice:
+            continue
+        try:
+            choice_idx = int(choice) - 1
+        except ValueError:
+            print("Please enter a valid number.")
+            continue
+        if 0 <= choice_idx < len(rows):
+            return rows[choice_idx]["id"]
+        print("Invalid selection. Please try again.")
+
+def revision_command(store, args):
+    """Run the history, show, diff or rollback command."""
+    if args.command == 'history':
+        for entry in store.history(args.id):
+            created = datetime.fromtimestamp(entry["created"]).isoformat(' ', 'seconds')
+            changes = entry["changes"]
+            kind = "full copy" if changes is None else f"{changes} change{'' if changes == 1 else 's'}"
+            print(f"{entry['revision']:>6}  {created}  {kind:<12}  {entry['size']:>8} bytes")
+    elif args.command == 'show':
+        print(json.dumps(store.document_at(args.id, args.revision), indent=4))
+    elif args.command == 'diff':
+        for op in store.diff(args.id, args.from_revision, args.to_revision):
+            print(json.dumps(op))
+    else:
+        revision = store.rollback(args.id, args.revision)
+        print(f"Submission {args.id} restored to revision {args.revision} as revision {revision}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the SQLite submission store.")
+    parser.add_argument('--db', default=DEFAULT_STORE_PATH, help="store database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_cmd = commands.add_parser('import', help="import response JSON files")
+    import_cmd.add_argument('patterns', nargs='+', help="JSON files, globs or directories")
+
+    export_cmd = commands.add_parser('export', help="export submissions as JSON files")
+    export_cmd.add_argument('ids', nargs='*', type=int, help="submission ids (default: all)")
+    export_cmd.add_argument('--out', default='.', help="output directory")
+
+    find_cmd = commands.add_parser('find', help="list matching submissions")
+    find_cmd.add_argument('--title', help="title prefix (case-insensitive)")
+    find_cmd.add_argument('--model')
+    find_cmd.add_argument('--since', help="ISO timestamp lower bound")
+    find_cmd.add_argument('--until', help="ISO timestamp upper bound")
+    find_cmd.add_argument('--limit', type=int, default=50)
+
+    history_cmd = commands.add_parser('history', help="list the revisions of a submission")
+    history_cmd.add_argument('id', type=int)
+
+    show_cmd = commands.add_parser('show', help="print a submission as JSON, at any revision")
+    show_cmd.add_argument('id', type=int)
+    show_cmd.add_argument('--revision', type=int, help="revision to rebuild (default: the latest)")
+
+    diff_cmd = commands.add_parser('diff', help="print the changes between two revisions as JSON Patch ops")
+    diff_cmd.add_argument('id', type=int)
+    diff_cmd.add_argument('from_revision', type=int)
+    diff_cmd.add_argument('to_revision', type=int, nargs='?', help="default: the latest")
+
+    rollback_cmd = commands.add_parser('rollback', help="restore a submission to an earlier revision")
+    rollback_cmd.add_argument('id', type=int)
+    rollback_cmd.add_argument('revision', type=int)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    with SubmissionStore(args.db) as store:
+        if args.command == 'import':
+            paths = []
+            for pattern in args.patterns:
+                if os.path.isdir(pattern):
+                    pattern = os.path.join(pattern, '*.json')
+                paths.extend(sorted(glob.glob(pattern)))
+            start = time.perf_counter()
+            imported, failures = store.import_json(paths)
+            print(f"Imported {imported} submissions in {time.perf_counter() - start:.2f}s, "
+                  f"{len(failures)} skipped")
+            for path, error in failures:
+                print(f"  {path}: {error}")
+        elif args.command == 'export':
+            os.makedirs(args.out, exist_ok=True)
+            for form_id in args.ids or store.ids():
+                print(store.export_json(form_id, os.path.join(args.out, f"submission_{form_id}.json")))
+        elif args.command in ('history', 'show', 'diff', 'rollback'):
+            try:
+                revision_command(store, args)
+            except KeyError as e:
+                print(e.args[0])
+                sys.exit(1)
+        else:
+            for row in store.find(args.title, args.model, args.since, args.until, args.limit):
+                print(f"{row['id']:>6}  {row['timestamp'] or '-':<26}  {row['model'] or '-':<20}  "
+                      f"{row['title'] or '(untitled)'}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = '.suggestion_cache.sqlite3'
+DEFAULT_TTL = 7 * 24 * 3600  # one week
+DEFAULT_MEMORY_ENTRIES = 1024
+DEFAULT_DISK_ENTRIES = 100000
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so trivially different prompts share a cache entry."""
+    return " ".join(prompt.split())
+
+def cache_key(model, prompt, options=None):
+    """Return the cache key for a (model, prompt, generation options) triple."""
+    raw = json.dumps([model, normalize_prompt(prompt), options or {}], sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class SuggestionCache:
+    """Two-tier cache of model suggestions: an in-process LRU in front of a SQLite store.
+
+    Entries expire after `ttl` seconds. Each tier evicts its least recently
+    used entries once it holds more than its maximum. With bypass=True every
+    lookup misses and nothing is stored.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL,
+                 max_memory_entries=DEFAULT_MEMORY_ENTRIES,
+                 max_disk_entries=DEFAULT_DISK_ENTRIES, bypass=False):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.bypass = bypass
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._db = None
+        if not bypass:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS suggestions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_suggestions_last_used "
+                             "ON suggestions (last_used)")
+            self._db.commit()
+
+    def get(self, model, prompt, options=None):
+        """Return the cached suggestion, or None on a miss."""
+        if self.bypass:
+            self.misses += 1
+            return None
+        key = cache_key(model, prompt, options)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, created = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                del self._memory[key]
+
+            row = self._db.execute("SELECT response, created FROM suggestions WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is not None and now - row[1] <= self.ttl:
+                self._db.execute("UPDATE suggestions SET last_used = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, model, prompt, response, options=None):
+        """Store a suggestion in both tiers."""
+        if self.bypass:
+            return
+        key = cache_key(model, prompt, options)
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO suggestions (key, model, response, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            self._db.commit()
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= 100:
+                self._evict_disk(now)
+
+    def _remember(self, key, response, created):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_disk(self, now):
+        """Drop expired rows, then the least recently used rows over the size limit."""
+        self._puts_since_evict = 0
+        cursor = self._db.execute("DELETE FROM suggestions WHERE created < ?", (now - self.ttl,))
+        self.evictions += cursor.rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM suggestions").fetchone()[0]
+        if count > self.max_disk_entries:
+            cursor = self._db.execute(
+                "DELETE FROM suggestions WHERE key IN "
+                "(SELECT key FROM suggestions ORDER BY last_used LIMIT ?)",
+                (count - self.max_disk_entries,)
+            )
+            self.evictions += cursor.rowcount
+        self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory)
+        }
+
+    def close(self):
+        """Apply pending evictions and close the SQLite store."""
+        if self._db is not None:
+            with self._lock:
+                self._evict_disk(time.time())
+                self._db.close()
+                self._db = None
@@ -0,0 +1,378 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import aclosing
+
+from llm_scheduler import LLMScheduler, NonRetryableError, PRIORITY_INTERACTIVE, PRIORITY_PREFETCH
+from ollama_client import DEFAULT_KEEP_ALIVE, AsyncOllamaClient, OllamaError
+from stage_timing import observe
+from suggestion_cache import SuggestionCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of suggestion requests in flight for one form
+DEFAULT_CONCURRENCY = 4
+
+def format_answer(answer):
+    """Render a stored answer (string or list of items) as prompt text."""
+    if isinstance(answer, list):
+        return "; ".join(str(item) for item in answer)
+    return str(answer)
+
+def build_question_prompt(field, question, answers):
+    """Build the part of a prompt that asks about one field."""
+    lines = [f"Question ({field}): {question}"]
+    current = answers.get(field)
+    if current:
+        lines.append(f"Their current answer: {format_answer(current)}")
+        lines.append("Suggest an improved, concise answer.")
+    else:
+        lines.append("Suggest a concise, high-quality answer.")
+    return "\n".join(lines)
+
+def build_prompt(field, question, answers):
+    """Build the suggestion prompt for one field from the answers given so far."""
+    lines = ["You are helping someone fill out a hackathon project idea submission form."]
+    background = [(name, format_answer(answer)) for name, answer in answers.items()
+                  if name != field and answer]
+    if background:
+        lines.append("Their answers so far:")
+        lines.extend(f"- {name}: {text}" for name, text in background)
+    lines.append(build_question_prompt(field, question, answers))
+    return "\n".join(lines)
+
+class ContextChain:
+    """Carries the model context returned by /api/generate from one field to the next.
+
+    The first request sends the full prompt with the project background; later
+    requests send only their question plus the previous context, so the model
+    does not re-process the background for every field.
+    """
+
+    def __init__(self):
+        self.context = None
+
+class SuggestionStream:
+    """The tokens of one field's suggestion, filled in by the background loop.
+
+    The UI thread reads them with follow() while they are still arriving.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.metrics = None
+        self.future = None
+        self.key = None
+        self._condition = threading.Condition()
+
+    def append(self, token):
+        with self._condition:
+            # Tokens arriving after the stream finished (e.g. cancelled) are dropped
+            if self.done:
+                return
+            self.tokens.append(token)
+            self._condition.notify_all()
+
+    def finish(self, error=None):
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    def text(self):
+        return "".join(self.tokens).strip()
+
+    def wait(self, timeout=None):
+        """Wait until the stream is complete; returns True if it is."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.done, timeout)
+
+    def follow(self, poll_interval=0.1):
+        """Yield tokens as they arrive until the stream is complete.
+
+        Waits in short intervals so Ctrl+C in the terminal is handled promptly.
+        """
+        index = 0
+        while True:
+            with self._condition:
+                while index == len(self.tokens) and not self.done:
+                    self._condition.wait(poll_interval)
+                pending = self.tokens[index:]
+                finished = self.done
+            for token in pending:
+                yield token
+            index += len(pending)
+            if finished and index == len(self.tokens):
+                return
+
+    def cancel(self):
+        """Stop generating this suggestion.
+
+        Cancelling the request makes the scheduler cancel the generation
+        (if no other request shares it), which closes its stream and the
+        pooled connection it was using, so the model stops too.
+        """
+        if self.future is not None and self.future.cancel() and not self.done:
+            # Cancelled before it started (still waiting its turn), so _run never finishes it
+            self.finish(error="cancelled")
+
+class SuggestionEngine:
+    """Fetches AI suggestions for form fields, many at once, through an LLMScheduler.
+
+    Suggestions are streamed token by token; time-to-first-token, tokens per
+    second and total latency are logged for every field and kept in `metrics`.
+    """
+
+    def __init__(self, client, model, concurrency=DEFAULT_CONCURRENCY, cache=None, options=None,
+                 scheduler=None, deadline=None):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.options = options
+        self.deadline = deadline
+        self.keep_alive = DEFAULT_KEEP_ALIVE
+        self.metrics = {}
+        self.scheduler = scheduler or LLMScheduler(workers=concurrency)
+
+    async def warm_up(self):
+        """Preload the model ahead of the first suggestion, at interactive priority."""
+        return await self.scheduler.submit(
+            f"warm-up:{self.model}",
+            lambda: self.client.warm_up(self.model, keep_alive=self.keep_alive),
+            priority=PRIORITY_INTERACTIVE
+        )
+
+    def request_key(self, field, question, answers):
+        """Return the scheduler/cache key of a field's suggestion request."""
+        return cache_key(self.model, build_prompt(field, question, answers), self.options)
+
+    async def stream(self, field, question, answers, on_token, priority=PRIORITY_PREFETCH, chain=None):
+        """Generate one field's suggestion, passing each token to on_token; returns the text.
+
+        With a ContextChain, only the field's question is sent when a context
+        from an earlier field is available, and the chain is advanced.
+        """
+        prompt = build_prompt(field, question, answers)
+        if self.cache is not None:
+            cached = self.cache.get(self.model, prompt, self.options)
+            if cached is not None:
+                logger.info("Using cached suggestion for %s", field)
+                on_token(cached)
+                return cached
+
+        context = chain.context if chain is not None else None
+        send_prompt = build_question_prompt(field, question, answers) if context else prompt
+        delivered = []
+
+        def forward(token):
+            delivered.append(token)
+            on_token(token)
+
+        # Keyed by the full logical prompt: an incremental request with context asks the same thing
+        result = await self.scheduler.submit(
+            cache_key(self.model, prompt, self.options),
+            lambda: self._generate(field, send_prompt, forward, context),
+            priority=priority, deadline=self.deadline
+        )
+        suggestion = result["text"]
+        if chain is not None and result["context"]:
+            chain.context = result["context"]
+        if not delivered and suggestion:
+            # Shared the result of an identical request already in flight
+            on_token(suggestion)
+        if self.cache is not None and suggestion:
+            self.cache.put(self.model, prompt, suggestion, self.options)
+        return suggestion
+
+    async def _generate(self, field, prompt, on_token, context=None):
+        """Stream one generation from the model; runs inside a scheduler worker.
+
+        Returns the suggestion text and the context the model returned with it.
+        """
+        tokens = []
+        final = {}
+        first_token_at = None
+        start = time.perf_counter()
+        logger.info("Requesting suggestion from Ollama AI for %s", field)
+        try:
+            async with aclosing(self.client.generate_stream(self.model, prompt, self.options,
+                                                            keep_alive=self.keep_alive,
+                                                            context=context)) as chunks:
+                async for chunk in chunks:
+                    token = chunk.get('response', '')
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        tokens.append(token)
+                        on_token(token)
+                    if chunk.get('done'):
+                        final = chunk
+        except OllamaError as e:
+            if tokens:
+                # Retrying would repeat tokens the user has already seen
+                raise NonRetryableError(str(e)) from e
+            raise
+        end = time.perf_counter()
+        observe("llm_generate", end - start)
+        if first_token_at is not None:
+            observe("llm_first_token", first_token_at - start)
+        self.metrics[field] = self._record_metrics(field, start, first_token_at, end, final, len(tokens))
+        return {"text": "".join(tokens).strip(), "context": final.get('context')}
+
+    def _record_metrics(self, field, start, first_token_at, end, final, token_count):
+        """Log and return the latency metrics of one streamed suggestion."""
+        eval_count = final.get('eval_count', token_count)
+        generation_time = end - first_token_at if first_token_at else 0.0
+        metrics = {
+            "time_to_first_token": first_token_at - start if first_token_at else None,
+            "tokens_per_second": eval_count / generation_time if generation_time > 0 else None,
+            "total_latency": end - start,
+            "eval_count": eval_count,
+            "prompt_eval_count": final.get('prompt_eval_count')
+        }
+        ttft = metrics["time_to_first_token"]
+        rate = metrics["tokens_per_second"]
+        logger.info("Suggestion metrics for %s: ttft=%ss, tokens/s=%s, total=%.3fs, tokens=%s",
+                    field, ttft if ttft is None else round(ttft, 3), rate if rate is None else round(rate, 1),
+                    metrics['total_latency'], eval_count)
+        return metrics
+
+    async def suggest(self, field, question, answers):
+        """Return the suggestion text for one field, from the cache when possible."""
+        return await self.stream(field, question, answers, lambda token: None)
+
+    async def suggest_all(self, questions, answers):
+        """Fire suggestion requests for every field at once; returns field -> text or exception."""
+        fields = list(questions)
+        results = await asyncio.gather(
+            *(self.suggest(field, questions[field], answers) for field in fields),
+            return_exceptions=True
+        )
+        return dict(zip(fields, results))
+
+class SuggestionPrefetcher:
+    """Runs a SuggestionEngine on a background event loop so the terminal UI never blocks.
+
+    start() requests suggestions for every field at once, at most concurrency
+    at a time; stream() gives the UI a field's tokens as they arrive, and
+    result() its finished text. With reuse_context (opt-in) the fields run one
+    after another in form order instead, each sending only its question plus
+    the context returned for the field before it: fewer prompt tokens, but
+    no parallelism, and prioritize() cannot move a later field ahead.
+    """
+
+    def __init__(self, model, base_url=None, concurrency=DEFAULT_CONCURRENCY, use_cache=True,
+                 reuse_context=False):
+        self.model = model
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.reuse_context = reuse_context
+        self.cache = SuggestionCache(bypass=not use_cache)
+        self._streams = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._client = None
+        self._engine = None
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+
+    async def _setup(self):
+        self._client = AsyncOllamaClient(self.base_url, max_connections=self.concurrency)
+        self._engine = SuggestionEngine(self._client, self.model, self.concurrency, cache=self.cache)
+
+    async def _run(self, stream, question, answers, chain=None):
+        try:
+            await self._engine.stream(stream.field, question, answers, stream.append, chain=chain)
+            stream.metrics = self._engine.metrics.get(stream.field)
+            stream.finish()
+        except asyncio.CancelledError:
+            logger.info("Suggestion for %s cancelled", stream.field)
+            stream.finish(error="cancelled")
+            raise
+        except Exception as e:
+            logger.warning("Suggestion for %s failed: %s", stream.field, e)
+            stream.finish(error=str(e))
+
+    def warm_up(self):
+        """Start loading the model in the background; returns immediately."""
+        future = asyncio.run_coroutine_threadsafe(self._engine.warm_up(), self._loop)
+        future.add_done_callback(self._log_warm_up)
+
+    def _log_warm_up(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("Model warm-up failed: %s", future.exception())
+
+    async def _run_after(self, previous, stream, question, answers, chain):
+        """Run one field of a context chain once the field before it has finished."""
+        if previous is not None:
+            # Cancelling the previous field (Ctrl+C) moves the chain on rather than stopping it
+            await asyncio.wait([asyncio.wrap_future(previous)])
+        await self._run(stream, question, answers, chain)
+
+    def start(self, questions, answers):
+        """Request suggestions for every field in questions without waiting for them.
+
+        With reuse_context, fields are fetched in form order sharing one model
+        context; otherwise all requests are fired at once.
+        """
+        answers = dict(answers)
+        streams = []
+        for field, question in questions.items():
+            stream = SuggestionStream(field)
+            stream.key = self._engine.request_key(field, question, answers)
+            self._streams[field] = stream
+            streams.append(stream)
+
+        if self.reuse_context:
+            chain = ContextChain()
+            previous = None
+            for stream in streams:
+                stream.future = asyncio.run_coroutine_threadsafe(
+                    self._run_after(previous, stream, questions[stream.field], answers, chain),
+                    self._loop)
+                previous = stream.future
+        else:
+            for stream in streams:
+                stream.future = asyncio.run_coroutine_threadsafe(
+                    self._run(stream, questions[stream.field], answers), self._loop)
+        logger.info("Prefetching suggestions for %s fields with %s", len(questions), self.model)
+
+    def stream(self, field):
+        """Return the SuggestionStream for a field, or None if none was requested."""
+        return self._streams.get(field)
+
+    def prioritize(self, field):
+        """Move a field's queued request ahead of the remaining prefetches (the user is on it)."""
+        stream = self._streams.get(field)
+        if stream is not None and not stream.done:
+            asyncio.run_coroutine_threadsafe(
+                self._engine.scheduler.promote(stream.key, PRIORITY_INTERACTIVE), self._loop)
+
+    def result(self, field, timeout=0):
+        """Return the suggestion for a field, or None if it is unavailable or not ready."""
+        stream = self._streams.get(field)
+        if stream is None or not stream.wait(timeout) or stream.error:
+            return None
+        return stream.text() or None
+
+    async def _shutdown(self):
+        logger.info("LLM scheduler stats: %s", self._engine.scheduler.stats())
+        await self._engine.scheduler.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._client.close()
+
+    def close(self):
+        """Cancel outstanding requests and stop the background loop."""
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        logger.info("Suggestion cache stats: %s", self.cache.stats())
+        self.cache.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
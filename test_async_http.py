@@ -0,0 +1,201 @@
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+from async_http import (ConnectionPool, HTTPError, encode_chunk, encode_chunked_head, encode_response,
+                        read_request, request, stream_lines)
+
+def run(test):
+    asyncio.run(test())
+
+async def serve(respond):
+    """Start a local server calling respond(writer, method, path, body) for each request.
+
+    Returns the server and a ConnectionPool for it. respond returns False to
+    stop reading that connection.
+    """
+    async def handle(reader, writer):
+        try:
+            while (incoming := await read_request(reader)) is not None:
+                method, path, _, body = incoming
+                if await respond(writer, method, path, body) is False:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, ConnectionPool(f"http://127.0.0.1:{port}", max_connections=1)
+
+async def shut(server, pool):
+    await pool.close()
+    server.close()
+    await server.wait_closed()
+
+async def stream(writer, chunks, delay=0):
+    writer.write(encode_chunked_head(200))
+    for chunk in chunks:
+        writer.write(encode_chunk(chunk))
+        await writer.drain()
+        await asyncio.sleep(delay)
+    writer.write(encode_chunk(b''))
+    await writer.drain()
+
+def test_chunked_body_is_joined_and_the_connection_reused():
+    async def test():
+        async def respond(writer, method, path, body):
+            # A chunk extension and a trailer, both of which the client has to skip
+            writer.write(encode_chunked_head(200) + b'5;name=value\r\n{"a":\r\n'
+                         + encode_chunk(b' 1}') + b'0\r\nX-Trailer: yes\r\n\r\n')
+            await writer.drain()
+
+        server, pool = await serve(respond)
+        assert await request(pool, 'POST', '/api/generate', {"prompt": "x"}) == (200, b'{"a": 1}')
+        assert await request(pool, 'GET', '/api/tags') == (200, b'{"a": 1}')
+        assert (pool.opened, pool.reused) == (1, 1)
+        await shut(server, pool)
+    run(test)
+
+def test_stream_lines_splits_lines_across_chunk_boundaries():
+    async def test():
+        async def respond(writer, method, path, body):
+            await stream(writer, [b'{"response": "He', b'llo"}\n{"response": " there"}\n\n{"do',
+                                  b'ne": true}'])
+
+        server, pool = await serve(respond)
+        async with aclosing(stream_lines(pool, 'POST', '/api/generate', {})) as lines:
+            assert [line async for line in lines] == [
+                b'{"response": "Hello"}', b'{"response": " there"}', b'{"done": true}']
+        assert len(pool._idle) == 1
+        await shut(server, pool)
+    run(test)
+
+def test_error_status_raises_and_keeps_the_connection():
+    async def test():
+        async def respond(writer, method, path, body):
+            writer.write(encode_response(404, {"error": "model not found"}))
+            await writer.drain()
+
+        server, pool = await serve(respond)
+        with pytest.raises(HTTPError) as raised:
+            async with aclosing(stream_lines(pool, 'POST', '/api/generate', {})) as lines:
+                async for _ in lines:
+                    pass
+        assert raised.value.status == 404
+        assert await request(pool, 'GET', '/api/tags') == (404, b'{"error": "model not found"}')
+        assert pool.reused == 1
+        await shut(server, pool)
+    run(test)
+
+def test_close_delimited_body_is_read_to_the_end_and_not_reused():
+    async def test():
+        async def respond(writer, method, path, body):
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{"version": "0.5"}')
+            await writer.drain()
+            return False
+
+        server, pool = await serve(respond)
+        assert await request(pool, 'GET', '/api/version') == (200, b'{"version": "0.5"}')
+        assert pool._idle == []
+        assert await request(pool, 'GET', '/api/version') == (200, b'{"version": "0.5"}')
+        assert (pool.opened, pool.reused) == (2, 0)
+        await shut(server, pool)
+    run(test)
+
+def test_server_closing_an_idle_keep_alive_connection():
+    async def test():
+        async def respond(writer, method, path, body):
+            # Announces keep-alive, then closes anyway, like an idle timeout on the server
+            writer.write(encode_response(200, {"path": path}))
+            await writer.drain()
+            return False
+
+        server, pool = await serve(respond)
+        assert await request(pool, 'GET', '/first') == (200, b'{"path": "/first"}')
+        await asyncio.sleep(0.05)
+        assert await request(pool, 'GET', '/second') == (200, b'{"path": "/second"}')
+        assert (pool.opened, pool.reused) == (2, 0)
+        await shut(server, pool)
+    run(test)
+
+def test_server_closing_a_reused_connection_as_the_request_arrives():
+    async def test():
+        seen = []
+
+        async def respond(writer, method, path, body):
+            seen.append(path)
+            if len(seen) == 2:
+                # The idle connection times out just as the next request reaches it
+                return False
+            writer.write(encode_response(200, {"path": path}))
+            await writer.drain()
+
+        server, pool = await serve(respond)
+        assert await request(pool, 'GET', '/first') == (200, b'{"path": "/first"}')
+        assert await request(pool, 'GET', '/second') == (200, b'{"path": "/second"}')
+        assert seen == ['/first', '/second', '/second']
+        assert (pool.opened, pool.reused) == (2, 1)
+        await shut(server, pool)
+    run(test)
+
+def test_fresh_connection_closed_without_a_response_is_an_error():
+    async def test():
+        async def respond(writer, method, path, body):
+            return False
+
+        server, pool = await serve(respond)
+        with pytest.raises(ConnectionError):
+            await request(pool, 'POST', '/api/generate', {})
+        assert pool.opened == 1
+        await shut(server, pool)
+    run(test)
+
+def test_request_timeout_releases_the_connection_slot():
+    async def test():
+        async def respond(writer, method, path, body):
+            if path == '/slow':
+                await asyncio.sleep(10)
+            writer.write(encode_response(200, {"path": path}))
+            await writer.drain()
+
+        server, pool = await serve(respond)
+        with pytest.raises(asyncio.TimeoutError):
+            await request(pool, 'GET', '/slow', timeout=0.05)
+        # The pool has a single slot: it was given back, and the timed-out connection not reused
+        assert await request(pool, 'GET', '/fast', timeout=1) == (200, b'{"path": "/fast"}')
+        assert (pool.opened, pool.reused) == (2, 0)
+        await shut(server, pool)
+    run(test)
+
+def test_stream_read_timeout_between_chunks():
+    async def test():
+        async def respond(writer, method, path, body):
+            await stream(writer, [b'{"response": "a"}\n', b'{"response": "b"}\n'], delay=10)
+
+        server, pool = await serve(respond)
+        received = []
+        with pytest.raises(asyncio.TimeoutError):
+            async with aclosing(stream_lines(pool, 'POST', '/api/generate', {}, read_timeout=0.05)) as lines:
+                async for line in lines:
+                    received.append(line)
+        assert received == [b'{"response": "a"}']
+        assert pool._idle == []
+        await shut(server, pool)
+    run(test)
+
+def test_stream_read_timeout_waiting_for_the_head():
+    async def test():
+        async def respond(writer, method, path, body):
+            await asyncio.sleep(10)
+
+        server, pool = await serve(respond)
+        with pytest.raises(asyncio.TimeoutError):
+            async with aclosing(stream_lines(pool, 'POST', '/api/generate', {}, read_timeout=0.05)) as lines:
+                async for _ in lines:
+                    pass
+        assert pool._idle == []
+        await shut(server, pool)
+    run(test)
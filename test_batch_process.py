@@ -0,0 +1,24 @@
+import json
+import os
+import shutil
+
+from process_form import batch_process
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def test_batch_counts_records_without_form_fields_as_failures(tmp_path):
+    template = tmp_path / 'day1form.md'
+    shutil.copy(os.path.join(HERE, 'day1form.md'), template)
+    source = tmp_path / 'intake.jsonl'
+    source.write_text(
+        json.dumps({"id": "good", "Project Title": "Form helper", "Concept Summary": "Fills in forms."}) + "\n"
+        + json.dumps({"id": "unrelated", "request_id": "x", "title": "Not a form", "body": 42}) + "\n"
+    )
+    output_dir = tmp_path / 'out'
+
+    processed, failures = batch_process(str(source), str(output_dir), template=str(template), workers=1)
+
+    assert processed == 2
+    assert [source_id for source_id, _ in failures] == ["unrelated"]
+    assert "no field of the form template" in failures[0][1]
+    assert sorted(os.listdir(output_dir)) == ["good.json"]
@@ -0,0 +1,89 @@
+import json
+import os
+
+from form_journal import FSYNC_NEVER, FormJournal, find_journals, replay
+
+QUESTIONS = {"Project Title": "What is the title of your project?",
+             "Concept Summary": "What is the main concept of your project?"}
+
+def start(directory, session, title="Form helper", **options):
+    document = {"metadata": {"model": "llama3.2:latest"}, "responses": {}}
+    journal = FormJournal.create(document, str(directory), source="draft.json", session=session,
+                                 fsync=FSYNC_NEVER, **options)
+    journal.record("Project Title", {"question": QUESTIONS["Project Title"], "answer": title})
+    return journal
+
+def test_replay_ignores_a_record_torn_mid_line(tmp_path):
+    journal = start(tmp_path, "torn")
+    journal.set_metadata("timestamp", "2024-01-04T10:30:00")
+    journal.close()
+    intact = os.path.getsize(journal.path)
+    with open(journal.path, 'ab') as f:
+        line = json.dumps({"op": "set", "field": "Concept Summary",
+                           "entry": {"question": QUESTIONS["Concept Summary"], "answer": "Fills in forms."}})
+        f.write(line[:len(line) // 2].encode('utf-8'))
+
+    document, info, valid_bytes = replay(journal.path)
+    assert valid_bytes == intact
+    assert info["records"] == 3
+    assert info["session"] == "torn" and info["source"] == "draft.json"
+    assert document == {"metadata": {"model": "llama3.2:latest", "timestamp": "2024-01-04T10:30:00"},
+                        "responses": {"Project Title": {"question": QUESTIONS["Project Title"],
+                                                        "answer": "Form helper"}}}
+
+    # Resuming drops the torn tail, so the next record starts on a line of its own
+    resumed = FormJournal.open(journal.path, fsync=FSYNC_NEVER)
+    assert os.path.getsize(journal.path) == intact
+    resumed.record("Concept Summary", {"question": QUESTIONS["Concept Summary"], "answer": "Fills in forms."})
+    resumed.close()
+    document, info, valid_bytes = replay(journal.path)
+    assert valid_bytes == os.path.getsize(journal.path)
+    assert info["records"] == 4
+    assert document == resumed.document
+    assert list(document["responses"]) == ["Project Title", "Concept Summary"]
+
+def test_replay_stops_at_a_corrupt_record(tmp_path):
+    journal = start(tmp_path, "corrupt")
+    journal.close()
+    with open(journal.path, 'ab') as f:
+        f.write(b'{"op": "set", "fie\n')
+    document, info, valid_bytes = replay(journal.path)
+    assert info["records"] == 2
+    assert document["responses"]["Project Title"]["answer"] == "Form helper"
+
+def test_compact_writes_the_journaled_document(tmp_path):
+    journal = start(tmp_path, "compact", buffered=True)
+    journal.record("Concept Summary", {"question": QUESTIONS["Concept Summary"], "answer": "Fills in forms."})
+    journal.record("Project Title", {"question": QUESTIONS["Project Title"], "answer": "Form filler"})
+    journal.set_metadata("timestamp", "2024-01-04T10:30:00")
+    assert journal.pending == 4
+    expected = json.loads(json.dumps(journal.document))
+
+    output = tmp_path / 'response.json'
+    journal.compact(str(output))
+    assert json.loads(output.read_text()) == expected
+    assert not os.path.exists(journal.path)
+    assert not os.path.exists(f"{output}.tmp")
+    assert find_journals(str(tmp_path)) == []
+
+def test_journals_are_listed_newest_first_and_resume_picks_the_newest(tmp_path, monkeypatch):
+    for age, session in enumerate(("newest", "middle", "oldest")):
+        journal = start(tmp_path / '.journal', session, title=f"{session} draft")
+        journal.close()
+        mtime = 1_700_000_000 - age * 60
+        os.utime(journal.path, (mtime, mtime))
+
+    journals = find_journals(str(tmp_path / '.journal'))
+    assert [info["session"] for _, info in journals] == ["newest", "middle", "oldest"]
+    assert journals[0][0]["responses"]["Project Title"]["answer"] == "newest draft"
+
+    from process_form import recover_session
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt: "1")
+    session = recover_session(QUESTIONS)
+    assert session.session_id == "newest"
+    assert session.responses["Project Title"]["answer"] == "newest draft"
+    session.journal.close()
+
+def test_find_journals_without_a_journal_directory(tmp_path):
+    assert find_journals(str(tmp_path / 'missing')) == []
@@ -0,0 +1,83 @@
+import copy
+import json
+
+import pytest
+
+from json_patch import PatchError, apply_patch, make_patch, pointer, unescape
+
+def round_trip(old, new):
+    patch = make_patch(old, new)
+    result = apply_patch(copy.deepcopy(old), json.loads(json.dumps(patch)))
+    # Compare the serialized form so key order and types count too
+    assert json.dumps(result) == json.dumps(new)
+    return patch
+
+@pytest.mark.parametrize("old, new", [
+    ({"a": 1, "b": [1, 2, 3]}, {"a": 1, "b": [1, 2, 3]}),
+    ({"a": 1}, {"a": 2, "c": {"d": None}}),
+    ({"a": 1, "b": 2}, {"b": 2}),
+    ([1, 2, 3, 4, 5], [1, 2, 9, 4, 5]),
+    ([1, 2, 3], [0, 1, 2, 3, 4]),
+    ([1, 2, 3, 4, 5], [1, 5]),
+    ([{"x": [1, 2]}, "y"], [{"x": [1, 3]}, "y", "z"]),
+    ({"a": [1, 2]}, {"a": "now a string"}),
+    ([], {}),
+    ("old", "new"),
+])
+def test_round_trip(old, new):
+    round_trip(old, new)
+
+def test_unchanged_document_gives_an_empty_patch():
+    document = {"responses": {"Key Features": {"answer": ["x", "y"]}}}
+    assert make_patch(document, copy.deepcopy(document)) == []
+
+def test_list_items_compare_by_type():
+    assert round_trip([True, 1], [1, True]) != []
+    assert round_trip([1], [True]) == [{"op": "replace", "path": "/0", "value": True}]
+    assert round_trip([0, 1.0], [False, 1]) != []
+    assert round_trip({"a": [1]}, {"a": [1.0]}) != []
+
+def test_edited_item_is_one_replace():
+    old = {"responses": {"Key Features": {"answer": ["a", "b", "c"]}}}
+    new = {"responses": {"Key Features": {"answer": ["a", "B", "c"]}}}
+    assert round_trip(old, new) == [{"op": "replace", "path": "/responses/Key Features/answer/1", "value": "B"}]
+
+def test_reordered_keys_replace_the_whole_dict():
+    old = {"outer": {"a": 1, "b": 2, "c": 3}}
+    new = {"outer": {"c": 3, "a": 1, "b": 2}}
+    assert round_trip(old, new) == [{"op": "replace", "path": "/outer", "value": new["outer"]}]
+
+def test_added_keys_keep_their_position():
+    round_trip({"a": 1, "b": 2}, {"a": 1, "b": 2, "c": 3})
+    round_trip({"a": 1, "b": 2}, {"new": 0, "a": 1, "b": 2})
+
+def test_pointer_escaping():
+    assert pointer('a/b', 'c~d', 2) == '/a~1b/c~0d/2'
+    assert pointer('~1') == '/~01'
+    assert unescape('~01') == '~1'
+    old = {"a/b": {"c~d": 1, "~1": [1]}}
+    new = {"a/b": {"c~d": 2, "~1": [1, 2]}}
+    assert round_trip(old, new) == [
+        {"op": "replace", "path": "/a~1b/c~0d", "value": 2},
+        {"op": "add", "path": "/a~1b/~01/1", "value": 2},
+    ]
+
+def test_patch_values_are_copies():
+    new = {"a": {"b": [1]}}
+    patch = make_patch({}, new)
+    new["a"]["b"].append(2)
+    assert apply_patch({}, patch) == {"a": {"b": [1]}}
+
+def test_bad_patches_raise_patch_error():
+    with pytest.raises(PatchError):
+        apply_patch({"a": 1}, [{"op": "remove", "path": "/b"}])
+    with pytest.raises(PatchError):
+        apply_patch({"a": [1]}, [{"op": "replace", "path": "/a/5", "value": 0}])
+    with pytest.raises(PatchError):
+        apply_patch({"a": [1]}, [{"op": "add", "path": "/a/x", "value": 0}])
+    with pytest.raises(PatchError):
+        apply_patch({"a": 1}, [{"op": "add", "path": "/a/b", "value": 0}])
+    with pytest.raises(PatchError):
+        apply_patch({}, [{"op": "remove", "path": ""}])
+    with pytest.raises(PatchError):
+        apply_patch({}, [{"op": "add", "path": "a", "value": 0}])
@@ -0,0 +1,209 @@
+import asyncio
+
+import pytest
+
+from llm_scheduler import (PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, CircuitBreaker, CircuitOpenError,
+                           DeadlineExceededError, LLMScheduler, NonRetryableError, QueueFullError)
+
+class FakeModel:
+    """Stands in for the Ollama client: records calls, and each call can be held or made to fail."""
+
+    def __init__(self):
+        self.calls = []
+        self.cancelled = []
+        self.gates = {}
+        self.failures = {}
+
+    def hold(self, prompt):
+        self.gates[prompt] = asyncio.Event()
+        return self.gates[prompt]
+
+    def fail(self, prompt, times, error=RuntimeError):
+        self.failures[prompt] = [error(f"{prompt} failed")] * times
+
+    async def generate(self, prompt):
+        self.calls.append(prompt)
+        try:
+            if prompt in self.gates:
+                await self.gates[prompt].wait()
+        except asyncio.CancelledError:
+            self.cancelled.append(prompt)
+            raise
+        if self.failures.get(prompt):
+            raise self.failures[prompt].pop()
+        return f"answer to {prompt}"
+
+async def settle():
+    """Let every ready task run until the loop is idle."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+def run(test):
+    asyncio.run(test())
+
+def submit(scheduler, model, prompt, **options):
+    return asyncio.create_task(scheduler.submit(prompt, lambda: model.generate(prompt), **options))
+
+def test_interactive_requests_run_before_queued_prefetches():
+    async def test():
+        model, scheduler = FakeModel(), LLMScheduler(workers=1)
+        gate = model.hold("busy")
+        tasks = [submit(scheduler, model, "busy")]
+        await settle()
+        tasks += [submit(scheduler, model, "prefetch 1"), submit(scheduler, model, "prefetch 2"),
+                  submit(scheduler, model, "current field", priority=PRIORITY_INTERACTIVE)]
+        await settle()
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert model.calls == ["busy", "current field", "prefetch 1", "prefetch 2"]
+        await scheduler.close()
+    run(test)
+
+def test_promote_moves_a_queued_request_ahead():
+    async def test():
+        model, scheduler = FakeModel(), LLMScheduler(workers=1)
+        gate = model.hold("busy")
+        tasks = [submit(scheduler, model, prompt) for prompt in ("busy", "first", "second")]
+        await settle()
+        assert await scheduler.promote("second", PRIORITY_INTERACTIVE)
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert model.calls == ["busy", "second", "first"]
+        await scheduler.close()
+    run(test)
+
+def test_identical_in_flight_requests_share_one_call():
+    async def test():
+        model, scheduler = FakeModel(), LLMScheduler(workers=2)
+        gate = model.hold("same prompt")
+        tasks = [submit(scheduler, model, "same prompt") for _ in range(3)]
+        await settle()
+        gate.set()
+        assert await asyncio.gather(*tasks) == ["answer to same prompt"] * 3
+        assert model.calls == ["same prompt"]
+        assert scheduler.stats()["deduplicated"] == 2
+        await scheduler.close()
+    run(test)
+
+def test_deadline_expiry_fails_the_request_and_stops_the_call():
+    async def test():
+        model, scheduler = FakeModel(), LLMScheduler(workers=1)
+        model.hold("slow")
+        with pytest.raises(DeadlineExceededError):
+            await scheduler.submit("slow", lambda: model.generate("slow"), deadline=0.05)
+        await settle()
+        assert model.cancelled == ["slow"]
+        assert scheduler.stats()["running"] == 0
+        await scheduler.close()
+    run(test)
+
+def test_failures_are_retried_with_backoff():
+    async def test():
+        model = FakeModel()
+        scheduler = LLMScheduler(workers=1, max_retries=2, backoff_base=0.001)
+        model.fail("flaky", times=2)
+        assert await scheduler.submit("flaky", lambda: model.generate("flaky")) == "answer to flaky"
+        assert model.calls == ["flaky"] * 3
+        assert scheduler.stats()["retries"] == 2
+        await scheduler.close()
+    run(test)
+
+def test_giving_up_after_the_last_retry_and_on_non_retryable_errors():
+    async def test():
+        model = FakeModel()
+        scheduler = LLMScheduler(workers=1, max_retries=1, backoff_base=0.001)
+        model.fail("broken", times=5)
+        with pytest.raises(RuntimeError):
+            await scheduler.submit("broken", lambda: model.generate("broken"))
+        assert model.calls == ["broken"] * 2
+
+        model.fail("half streamed", times=5, error=NonRetryableError)
+        with pytest.raises(NonRetryableError):
+            await scheduler.submit("half streamed", lambda: model.generate("half streamed"))
+        assert model.calls.count("half streamed") == 1
+        await scheduler.close()
+    run(test)
+
+def test_circuit_breaker_opens_after_repeated_failures_and_recovers():
+    async def test():
+        model = FakeModel()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        scheduler = LLMScheduler(workers=1, max_retries=0, breaker=breaker)
+        for prompt in ("a", "b"):
+            model.fail(prompt, times=1)
+            with pytest.raises(RuntimeError):
+                await scheduler.submit(prompt, lambda prompt=prompt: model.generate(prompt))
+        with pytest.raises(CircuitOpenError):
+            await scheduler.submit("c", lambda: model.generate("c"))
+        assert model.calls == ["a", "b"]
+        assert breaker.state == 'open'
+
+        await asyncio.sleep(0.06)
+        # One trial request goes through once the pause is over, and closes the breaker again
+        assert await scheduler.submit("d", lambda: model.generate("d")) == "answer to d"
+        assert breaker.state == 'closed'
+        await scheduler.close()
+    run(test)
+
+def test_queue_full_is_rejected():
+    async def test():
+        model, scheduler = FakeModel(), LLMScheduler(workers=1, max_queue=1)
+        model.hold("busy")
+        model.hold("queued")
+        tasks = [submit(scheduler, model, "busy")]
+        await settle()
+        tasks.append(submit(scheduler, model, "queued"))
+        await settle()
+        with pytest.raises(QueueFullError):
+            await scheduler.submit("one too many", lambda: model.generate("one too many"))
+        await scheduler.close()
+        # Closing releases the running and the queued request at once
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    run(test)
+
+def test_running_call_is_cancelled_when_its_only_waiter_leaves():
+    async def test():
+        model, scheduler = FakeModel(), LLMScheduler(workers=1)
+        model.hold("abandoned")
+        task = submit(scheduler, model, "abandoned")
+        await settle()
+        task.cancel()
+        await settle()
+        assert model.cancelled == ["abandoned"]
+        # The worker is free again
+        assert await scheduler.submit("next", lambda: model.generate("next")) == "answer to next"
+        assert scheduler.stats()["abandoned"] == 1
+        await scheduler.close()
+    run(test)
+
+def test_queued_job_is_dropped_when_its_only_waiter_leaves():
+    async def test():
+        model, scheduler = FakeModel(), LLMScheduler(workers=1)
+        gate = model.hold("busy")
+        busy = submit(scheduler, model, "busy")
+        queued = submit(scheduler, model, "never needed", priority=PRIORITY_PREFETCH)
+        await settle()
+        queued.cancel()
+        await settle()
+        assert scheduler.stats()["queue_depth"] == 0
+        gate.set()
+        await busy
+        await settle()
+        assert model.calls == ["busy"]
+        await scheduler.close()
+    run(test)
+
+def test_shared_call_keeps_running_while_another_waiter_remains():
+    async def test():
+        model, scheduler = FakeModel(), LLMScheduler(workers=1)
+        gate = model.hold("shared")
+        first, second = submit(scheduler, model, "shared"), submit(scheduler, model, "shared")
+        await settle()
+        first.cancel()
+        await settle()
+        assert model.cancelled == []
+        gate.set()
+        assert await second == "answer to shared"
+        await scheduler.close()
+    run(test)
@@ -0,0 +1,19 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from near_duplicates import EmbeddingStore, HashingVectorizer
+
+def test_hashing_vectorizer_without_words():
+    vectors = HashingVectorizer(dim=32).embed(['!!!', ''])
+    assert vectors.shape == (2, 32)
+    assert vectors.dtype == np.float32
+    assert not vectors.any()
+
+def test_incremental_embed_of_punctuation_only_text(tmp_path):
+    store = EmbeddingStore(HashingVectorizer(dim=32), str(tmp_path))
+    store.embed(['An offline form editor with shared drafts'])
+    matrix, embedded = store.embed(['An offline form editor with shared drafts', '...'])
+    assert embedded == 1
+    assert matrix.shape == (2, 32)
+    assert not matrix[1].any()
@@ -1,6 +1,12 @@
 import requests
 import sys
+import json
+import math
+import time
+import asyncio
+import argparse
 import logging
+from contextlib import aclosing
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,7 +20,7 @@ def test_ollama_connection():
             logger.info("Successfully connected to Ollama API")
             return True
         else:
-            logger.error(f"Failed to connect to Ollama API. Status code: {response.status_code}")
+            logger.error("Failed to connect to Ollama API. Status code: %s", response.status_code)
             return False
     except requests.exceptions.ConnectionError:
         logger.error("Could not connect to Ollama API. Is Ollama running?")
@@ -35,12 +41,167 @@ def test_llama2_model():
             logger.info("llama2 model is available and responding")
             return True
         else:
-            logger.error(f"llama2 model test failed. Status code: {response.status_code}")
+            logger.error("llama2 model test failed. Status code: %s", response.status_code)
             return False
     except requests.exceptions.ConnectionError:
         logger.error("Could not connect to Ollama API while testing llama2 model")
         return False
 
+def percentile(values, pct):
+    """Return the nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(latencies):
+    """Return p50/p95/p99/mean/max of a list of latencies, in seconds."""
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies),
+        "max": max(latencies)
+    }
+
+def build_prompt_set(template='day1form.md'):
+    """Build benchmark prompts from the questions generated for the form template."""
+    from process_form import load_form_template
+    from suggestions import build_prompt
+
+    questions = load_form_template(template)["questions"]
+    return [build_prompt(field, question, {}) for field, question in questions.items()]
+
+async def _timed_request(client, model, prompt, stream):
+    """Run one generation; returns (latency, time to first token, token count)."""
+    start = time.perf_counter()
+    if not stream:
+        response = await client.generate(model, prompt)
+        return time.perf_counter() - start, None, response.get('eval_count', 0)
+    first_token = None
+    tokens = 0
+    async with aclosing(client.generate_stream(model, prompt)) as chunks:
+        async for chunk in chunks:
+            if chunk.get('response'):
+                tokens += 1
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+    return time.perf_counter() - start, first_token, tokens
+
+async def run_load(base_url, model, prompts, concurrency, total_requests, stream=True, timeout=120.0):
+    """Send total_requests generations with `concurrency` in flight and measure them."""
+    from ollama_client import AsyncOllamaClient
+
+    latencies, first_tokens, errors = [], [], {}
+    tokens = 0
+    limit = asyncio.Semaphore(concurrency)
+
+    async with AsyncOllamaClient(base_url, max_connections=concurrency, timeout=timeout) as client:
+        async def one(i):
+            nonlocal tokens
+            async with limit:
+                try:
+                    latency, first_token, count = await _timed_request(
+                        client, model, prompts[i % len(prompts)], stream)
+                except Exception as e:
+                    key = type(e).__name__ + ": " + str(e)[:80]
+                    errors[key] = errors.get(key, 0) + 1
+                    return
+                latencies.append(latency)
+                tokens += count
+                if first_token is not None:
+                    first_tokens.append(first_token)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total_requests)))
+        elapsed = time.perf_counter() - start
+
+    error_count = sum(errors.values())
+    return {
+        "model": model,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "stream": stream,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": total_requests / elapsed if elapsed > 0 else None,
+        "tokens_per_second": tokens / elapsed if elapsed > 0 else None,
+        "error_rate": error_count / total_requests if total_requests else 0.0,
+        "errors": errors,
+        "latency": summarize(latencies),
+        "time_to_first_token": summarize(first_tokens)
+    }
+
+def run_benchmark(args, base_url):
+    """Run every model x concurrency combination and return the JSON report."""
+    prompts = build_prompt_set(args.template)
+    report = {
+        "base_url": base_url,
+        "prompts": len(prompts),
+        "started": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "runs": []
+    }
+    for model in args.models:
+        for concurrency in args.concurrency:
+            logger.info("Benchmarking %s at concurrency %s (%s requests)", model, concurrency, args.requests)
+            report["runs"].append(asyncio.run(run_load(
+                base_url, model, prompts, concurrency, args.requests,
+                stream=not args.no_stream, timeout=args.timeout)))
+    return report
+
+def benchmark_main(argv):
+    """Entry point for `test_ollama.py --bench`."""
+    parser = argparse.ArgumentParser(
+        prog='test_ollama.py --bench',
+        description="Load-test an Ollama server (or the bundled stub) with prompts built from the form."
+    )
+    parser.add_argument('--url', default=None, help="Ollama URL (default: OLLAMA_HOST or localhost:11434)")
+    parser.add_argument('--models', nargs='+', default=['llama3.2:latest'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=50, help="requests per model and concurrency level")
+    parser.add_argument('--template', default='day1form.md', help="form template the prompts are built from")
+    parser.add_argument('--no-stream', action='store_true', help="use non-streaming generations")
+    parser.add_argument('--timeout', type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument('--output', default=None, help="write the JSON report here instead of stdout")
+    stub = parser.add_argument_group('bundled stub server (no real Ollama needed)')
+    stub.add_argument('--stub', action='store_true', help="benchmark against a local Ollama stub")
+    stub.add_argument('--stub-latency', type=float, default=0.05)
+    stub.add_argument('--stub-jitter', type=float, default=0.01)
+    stub.add_argument('--stub-prompt-tps', type=float, default=2000.0)
+    stub.add_argument('--stub-tps', type=float, default=200.0)
+    stub.add_argument('--stub-max-parallel', type=int, default=0)
+    stub.add_argument('--stub-error-rate', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        from ollama_stub import StubServerThread
+
+        with StubServerThread(models=args.models, latency=args.stub_latency,
+                              jitter=args.stub_jitter,
+                              prompt_tokens_per_second=args.stub_prompt_tps,
+                              tokens_per_second=args.stub_tps,
+                              max_parallel=args.stub_max_parallel,
+                              error_rate=args.stub_error_rate, seed=0) as server:
+            report = run_benchmark(args, server.url)
+            report["stub"] = True
+    else:
+        from ollama_client import default_base_url
+
+        report = run_benchmark(args, args.url or default_base_url())
+        report["stub"] = False
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        logger.info("Benchmark report written to %s", args.output)
+    else:
+        print(output)
+    failed = any(run["error_rate"] > 0 for run in report["runs"])
+    sys.exit(1 if failed else 0)
+
 def main():
     """Run Ollama connectivity tests."""
     print("Testing Ollama setup...")
@@ -59,4 +220,6 @@ def main():
     print("\nSUCCESS: Ollama is properly configured and ready to use")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        benchmark_main(sys.argv[2:])
     main()
@@ -0,0 +1,80 @@
+import copy
+import json
+import os
+
+import pytest
+
+from submission_store import SNAPSHOT_INTERVAL, SubmissionStore, stored_form
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture
+def store(tmp_path):
+    with SubmissionStore(str(tmp_path / 'store.db')) as store:
+        yield store
+
+@pytest.fixture
+def document():
+    with open(os.path.join(HERE, 'test_data.json')) as f:
+        return stored_form(json.load(f))
+
+def edit(store, form_id, document, step):
+    """Make one edit, alternating between update_field() and save(); returns the new version."""
+    document = copy.deepcopy(document)
+    if step % 2:
+        entry = document['responses']['Key Features']
+        entry['answer'] = entry['answer'] + [f"Feature {step}"]
+        store.update_field(form_id, 'Key Features', entry)
+    else:
+        document['responses']['Concept Summary']['answer'] = f"Summary, draft {step}"
+        document['metadata']['timestamp'] = f"2024-01-04T10:{step:02d}:00.000Z"
+        store.save(document, form_id)
+    return document
+
+def test_every_revision_rebuilds_across_snapshots(store, document):
+    form_id = store.save(document)
+    versions = {1: document}
+    for step in range(2, SNAPSHOT_INTERVAL * 2 + 3):
+        versions[step] = edit(store, form_id, versions[step - 1], step)
+        assert store.revisions()[form_id] == step
+
+    history = store.history(form_id)
+    snapshots = [entry["revision"] for entry in history if entry["kind"] == 'document']
+    assert snapshots == [1, SNAPSHOT_INTERVAL + 1, SNAPSHOT_INTERVAL * 2 + 1]
+    assert all(entry["changes"] for entry in history if entry["kind"] == 'patch')
+    for revision, version in versions.items():
+        assert json.dumps(store.document_at(form_id, revision)) == json.dumps(version)
+    assert store.document_at(form_id) == store.get(form_id) == versions[max(versions)]
+
+def test_unknown_revisions_raise_key_error(store, document):
+    form_id = store.save(document)
+    edit(store, form_id, document, 1)
+    for revision in (0, 3):
+        with pytest.raises(KeyError):
+            store.document_at(form_id, revision)
+    with pytest.raises(KeyError):
+        store.document_at(form_id + 1)
+    with pytest.raises(KeyError):
+        store.history(form_id + 1)
+
+def test_rollback_is_a_new_revision(store, document):
+    form_id = store.save(document)
+    versions = {1: document}
+    for step in range(2, SNAPSHOT_INTERVAL + 6):
+        versions[step] = edit(store, form_id, versions[step - 1], step)
+    latest = max(versions)
+
+    assert store.rollback(form_id, 3) == latest + 1
+    assert store.get(form_id) == versions[3]
+    assert store.diff(form_id, 3) == []
+    # Nothing was lost: the rolled-back revisions still rebuild, and the rollback can be undone
+    assert store.document_at(form_id, latest) == versions[latest]
+    assert store.rollback(form_id, latest) == latest + 2
+    assert store.get(form_id) == versions[latest]
+    assert store.find(title="AI-Enhanced")[0]["revision"] == latest + 2
+
+def test_saving_an_unchanged_document_adds_no_revision(store, document):
+    form_id = store.save(document)
+    store.save(copy.deepcopy(document), form_id)
+    assert store.revisions()[form_id] == 1
+    assert len(store.history(form_id)) == 1